@@ -1,9 +1,253 @@
-from django.contrib import admin
-from .models import Role, User, Album, Genre, Song, Playlist
-
-admin.site.register(Role)
-admin.site.register(User)
-admin.site.register(Album)
-admin.site.register(Genre)
-admin.site.register(Song)
-admin.site.register(Playlist)
+from datetime import timedelta
+
+from django import forms
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Min, Q, Value
+from django.db.models.functions import Concat, Lower
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .fingerprints import merge_songs
+from .models import Role, User, Album, Genre, Song, Playlist, Job
+from .profiling import slow_log, get_setting
+from .streaming import batched
+from .sync import record_changes
+
+# Dưới ngưỡng này COUNT(*) vẫn đủ nhanh và chính xác
+ESTIMATE_THRESHOLD = 10000
+
+
+# ======= ĐẾM ƯỚC LƯỢNG =======
+
+def estimated_count(model):
+    """Số dòng ước lượng của cả bảng, không quét bảng; None nếu không ước lượng được."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] > 0 else None
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+    # SQLite không lưu số dòng; MAX(pk) lệch khi có dòng bị xoá (trang cuối rỗng) nên đếm thật
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Changelist không lọc / không search trên bảng lớn: dùng số ước lượng thay vì COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_count(self.object_list.model)
+            if estimate is not None and estimate > ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+def prefix_filter(fields, term):
+    """Tìm theo tiền tố không phân biệt hoa thường: lower(field) >= lower(x) AND < lower(x) + U+10FFFF,
+    dùng được index Lower(field) khai báo trong models.
+
+    LIKE 'x%' / icontains không dùng được index thường trên SQLite và Postgres. Từ khoá cũng được
+    lower() phía database để hai vế luôn cùng một cách chuẩn hoá (lower() của SQLite chỉ đổi ASCII).
+    """
+    low = Lower(Value(term))
+    query = Q()
+    for field in fields:
+        query |= Q(GreaterThanOrEqual(Lower(field), low), LessThan(Lower(field), Concat(low, Value('\U0010ffff'))))
+    return query
+
+
+class CatalogAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False   # bỏ COUNT(*) thứ hai trên toàn bảng khi đang lọc
+    list_per_page = 50
+
+    def get_search_results(self, request, queryset, search_term):
+        prefixed = [field[1:] for field in self.get_search_fields(request) if field.startswith('^')]
+        term = search_term.strip()
+        if not term or len(prefixed) != len(self.get_search_fields(request)):
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(prefix_filter(prefixed, term)), False
+
+
+# ======= CATALOG =======
+
+@admin.register(Role)
+class RoleAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name']
+
+
+@admin.register(User)
+class UserAdmin(CatalogAdmin):
+    list_display = ['id', 'username', 'fullname', 'role', 'is_staff', 'is_active']
+    list_select_related = ['role']
+    list_filter = ['role', 'is_staff']
+    search_fields = ['^username', '^fullname']
+    ordering = ['username']
+
+    def get_queryset(self, request):
+        # __str__ đọc role.name: autocomplete / change form không query thêm mỗi dòng
+        return super().get_queryset(request).select_related('role')
+
+
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name']
+    search_fields = ['^name']
+    ordering = ['name']
+
+
+@admin.register(Album)
+class AlbumAdmin(CatalogAdmin):
+    list_display = ['id', 'title', 'creator', 'releaseDate']
+    list_select_related = ['creator__role']
+    search_fields = ['^title']
+    ordering = ['title']
+    autocomplete_fields = ['creator']
+
+
+class ReassignGenreForm(forms.Form):
+    genre = forms.ModelChoiceField(queryset=Genre.objects.order_by('name'))
+    replace = forms.BooleanField(required=False, initial=True, help_text='Bỏ các genre hiện có của bài hát')
+
+
+@admin.register(Song)
+class SongAdmin(CatalogAdmin):
+    list_display = ['id', 'title', 'duration', 'play_count']
+    search_fields = ['^title']
+    list_filter = ['genre']
+    autocomplete_fields = ['genre', 'albums', 'artists']
+    actions = ['reassign_genre', 'merge_duplicates']
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name == 'artists':
+            kwargs['queryset'] = User.objects.select_related('role')
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+    @admin.action(description='Đổi genre')
+    def reassign_genre(self, request, queryset):
+        form = ReassignGenreForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            count = reassign_genre(queryset, form.cleaned_data['genre'], replace=form.cleaned_data['replace'])
+            self.message_user(request, f'Đã đổi genre cho {count} bài hát.')
+            return None
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Đổi genre',
+            'form': form,
+            # "Chọn tất cả" trên changelist: gửi lại cờ select_across thay vì liệt kê mọi id
+            'select_across': request.POST.get('select_across') == '1',
+            'ids': request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME),
+            'count': queryset.count(),
+            'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
+            'opts': self.model._meta,
+        }
+        return TemplateResponse(request, 'admin/api/song/reassign_genre.html', context)
+
+    @admin.action(description='Gộp bài trùng (giữ bài có id nhỏ nhất)')
+    def merge_duplicates(self, request, queryset):
+        ids = sorted(queryset.values_list('id', flat=True))
+        if len(ids) < 2:
+            self.message_user(request, 'Chọn ít nhất hai bài hát.', messages.WARNING)
+            return
+        with transaction.atomic():
+            merge_songs(ids[0], ids[1:])
+        self.message_user(request, f'Đã gộp {len(ids) - 1} bài vào #{ids[0]}.')
+
+
+@transaction.atomic
+def reassign_genre(songs, genre, replace=True, batch_size=1000):
+    """Set-based: xoá bằng subquery, thêm theo lô; không đưa cả tập id vào một câu lệnh (giới hạn biến của SQLite)."""
+    through = Song.genre.through
+    if replace:
+        through.objects.filter(song_id__in=songs.order_by().values('id')).exclude(genre=genre).delete()
+    count = 0
+    for song_ids in batched(songs.order_by().values_list('id', flat=True).iterator(chunk_size=batch_size), batch_size):
+        through.objects.bulk_create([through(song_id=pk, genre=genre) for pk in song_ids], ignore_conflicts=True)
+        # bulk_create không bắn signal nên tự ghi change log cho /api/sync/
+        record_changes('songs', song_ids)
+        count += len(song_ids)
+    return count
+
+
+@admin.register(Playlist)
+class PlaylistAdmin(CatalogAdmin):
+    list_display = ['id', 'name', 'user', 'createAt']
+    list_select_related = ['user__role']
+    search_fields = ['^name']
+    autocomplete_fields = ['user']
+    # Playlist có thể có hàng nghìn bài: nhập id thay vì render danh sách
+    raw_id_fields = ['songs']
+
+
+@admin.register(Job)
+class JobAdmin(CatalogAdmin):
+    list_display = ['id', 'task', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'createAt', 'finishedAt']
+    list_filter = ['status', 'task']
+    search_fields = ['key']
+    ordering = ['-id']
+    readonly_fields = ['locked_by', 'locked_at', 'last_error', 'createAt', 'finishedAt']
+    actions = ['retry_now']
+
+    @admin.action(description='Chạy lại ngay')
+    def retry_now(self, request, queryset):
+        count = 0
+        for job_id in queryset.exclude(status=Job.RUNNING).values_list('id', flat=True):
+            try:
+                with transaction.atomic():
+                    count += Job.objects.filter(pk=job_id).update(
+                        status=Job.QUEUED, run_at=timezone.now(), attempts=0, finishedAt=None,
+                    )
+            except IntegrityError:
+                pass  # đã có job cùng key đang chờ
+        self.message_user(request, f'{count} job được xếp lại.')
+
+
+@admin.site.admin_view
+def slow_requests_view(request):
+    if request.method == 'POST' and 'clear' in request.POST:
+        slow_log.clear()
+        return redirect(request.path)
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Slow requests',
+        'entries': slow_log.entries(),
+        'threshold_ms': get_setting('SLOW_REQUEST_THRESHOLD') * 1000,
+        'capacity': get_setting('SLOW_LOG_SIZE'),
+    }
+    return TemplateResponse(request, 'admin/api/slow_requests.html', context)
+
+
+@admin.site.admin_view
+def jobs_dashboard_view(request):
+    now = timezone.now()
+    counts = {}
+    for row in Job.objects.values('task', 'status').annotate(n=Count('id')):
+        counts.setdefault(row['task'], dict.fromkeys([status for status, _ in Job.STATUSES], 0))[row['status']] = row['n']
+    oldest = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Background jobs',
+        'statuses': [label for _, label in Job.STATUSES],
+        'rows': [(task, [by_status[status] for status, _ in Job.STATUSES]) for task, by_status in sorted(counts.items())],
+        'due': Job.objects.filter(status=Job.QUEUED, run_at__lte=now).count(),
+        'oldest_seconds': int((now - oldest).total_seconds()) if oldest else None,
+        'done_last_hour': Job.objects.filter(status=Job.SUCCEEDED, finishedAt__gte=now - timedelta(hours=1)).count(),
+        'recent_failures': Job.objects.filter(status=Job.FAILED).order_by('-finishedAt')[:20],
+    }
+    return TemplateResponse(request, 'admin/api/jobs_dashboard.html', context)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from . import fragments, library, realtime, sync, tasks
+        sync.connect_signals()
+        library.connect_signals()
+        realtime.connect_signals()
+        fragments.connect_signals()
+        tasks.connect_signals()
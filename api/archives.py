@@ -0,0 +1,257 @@
+import hashlib
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from rest_framework import status
+from rest_framework.response import Response
+
+from .fast_serializers import serialize_songs_mini
+from .models import Song
+from .renderers import dumps
+
+DEFAULTS = {
+    'CHUNK_SIZE': 64 * 1024,
+    'MAX_PER_USER': 2,       # số download đang chạy cùng lúc của một user / IP
+    'RETRY_AFTER': 30,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_DOWNLOADS', {}).get(name, DEFAULTS[name])
+
+
+# ======= ZIP (store, không nén) =======
+
+ZIP64_LIMIT = 0xFFFFFFFF
+UTF8_NAMES = 0x0800
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(max(timestamp, 315532800))   # ZIP không biểu diễn được trước 1980
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def file_crc(path, size, mtime_ns):
+    """CRC32 của file, cache theo (đường dẫn, size, mtime): header ZIP cần CRC trước phần dữ liệu."""
+    key = 'zip-crc:' + hashlib.sha1(f'{path}:{size}:{mtime_ns}'.encode()).hexdigest()
+    crc = cache.get(key)
+    if crc is None:
+        crc = 0
+        with open(path, 'rb') as f:
+            while block := f.read(1024 * 1024):
+                crc = zlib.crc32(block, crc)
+        cache.set(key, crc, None)
+    return crc
+
+
+class Archive:
+    """Bố cục ZIP hoàn toàn xác định từ danh sách entry: tính được tổng size và offset của mọi byte
+    trước khi đọc file, nên trả được Range bất kỳ mà chỉ đọc đúng phần cần.
+
+    entries: [(tên, bytes | đường dẫn file, size, crc, mtime)].
+    """
+
+    def __init__(self, entries):
+        self.parts = []     # (offset, length, bytes | đường dẫn file)
+        central = []
+        offset = 0
+
+        def add(data, length=None):
+            nonlocal offset
+            length = len(data) if length is None else length
+            if length:
+                self.parts.append((offset, length, data))
+            offset += length
+
+        for name, source, size, crc, mtime in entries:
+            name = name.encode()
+            dos_time, dos_date = _dos_datetime(mtime)
+            large = size >= ZIP64_LIMIT
+            header_offset = offset
+            extra = struct.pack('<HHQQ', 1, 16, size, size) if large else b''
+            stored = ZIP64_LIMIT if large else size
+            version = 45 if large or header_offset >= ZIP64_LIMIT else 20
+            add(struct.pack('<IHHHHHIIIHH', 0x04034b50, version, UTF8_NAMES, 0, dos_time, dos_date,
+                            crc, stored, stored, len(name), len(extra)) + name + extra)
+            add(source, size)
+
+            central_extra = struct.pack('<QQ', size, size) if large else b''
+            if header_offset >= ZIP64_LIMIT:
+                central_extra += struct.pack('<Q', header_offset)
+            if central_extra:
+                central_extra = struct.pack('<HH', 1, len(central_extra)) + central_extra
+            central.append(struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, version, version, UTF8_NAMES, 0, dos_time, dos_date,
+                crc, stored, stored, len(name), len(central_extra), 0, 0, 0, 0,
+                min(header_offset, ZIP64_LIMIT),
+            ) + name + central_extra)
+
+        central = b''.join(central)
+        count, central_offset = len(entries), offset
+        add(central)
+        end = b''
+        if count >= 0xFFFF or len(central) >= ZIP64_LIMIT or central_offset >= ZIP64_LIMIT:
+            end += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, len(central), central_offset)
+            end += struct.pack('<IIQI', 0x07064b50, 0, offset, 1)
+        end += struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                           min(len(central), ZIP64_LIMIT), min(central_offset, ZIP64_LIMIT), 0)
+        add(end)
+        self.size = offset
+
+    def iter_range(self, start=0, stop=None):
+        """Các chunk bytes [start, stop); file đọc từng CHUNK_SIZE nên bộ nhớ không phụ thuộc kích thước."""
+        stop = self.size if stop is None else stop
+        chunk_size = get_setting('CHUNK_SIZE')
+        for offset, length, source in self.parts:
+            if offset + length <= start or offset >= stop:
+                continue
+            begin, end = max(start, offset) - offset, min(stop, offset + length) - offset
+            if isinstance(source, bytes):
+                yield source[begin:end]
+                continue
+            with open(source, 'rb') as f:
+                f.seek(begin)
+                remaining = end - begin
+                while remaining > 0:
+                    block = f.read(min(chunk_size, remaining))
+                    if not block:
+                        raise OSError(f'{source} changed while streaming')
+                    remaining -= len(block)
+                    yield block
+
+
+# ======= PLAYLIST / ALBUM =======
+
+_UNSAFE = re.compile(r'[\x00-\x1f\\/:*?"<>|]+')
+
+
+def _file_name(index, width, title, path):
+    title = _UNSAFE.sub('_', title).strip(' .') or 'track'
+    return f'{index:0{width}d} - {title[:100]}{os.path.splitext(path)[1].lower()}'
+
+
+def build_archive(kind, obj, name, song_ids):
+    """Archive cho playlist / album: các file audio theo thứ tự, cùng manifest.json mô tả từng track."""
+    songs = {song.id: song for song in Song.objects.filter(id__in=song_ids).only('id', 'title', 'url')}
+    details = {song['id']: song for song in serialize_songs_mini(Song.objects.filter(id__in=song_ids))}
+    width = max(2, len(str(len(song_ids))))
+
+    entries, tracks, missing, latest = [], [], [], 0
+    for index, song_id in enumerate(song_ids, 1):
+        song = songs.get(song_id)
+        try:
+            stat = os.stat(song.url.path) if song is not None and song.url else None
+        except OSError:
+            stat = None
+        if stat is None:
+            missing.append(song_id)
+            continue
+        path = song.url.path
+        file_name = _file_name(index, width, song.title, path)
+        entries.append((file_name, path, stat.st_size, file_crc(path, stat.st_size, stat.st_mtime_ns), stat.st_mtime))
+        tracks.append({**details[song_id], 'file': file_name, 'position': index, 'size': stat.st_size})
+        latest = max(latest, stat.st_mtime)
+
+    manifest = dumps({'type': kind, 'id': obj.pk, 'name': name, 'tracks': tracks, 'missing': missing})
+    entries.insert(0, ('manifest.json', manifest, len(manifest), zlib.crc32(manifest), latest))
+    etag = hashlib.sha1(repr([entry[:1] + entry[2:] for entry in entries]).encode()).hexdigest()
+    return Archive(entries), f'"{etag}"'
+
+
+# ======= GIỚI HẠN DOWNLOAD ĐỒNG THỜI =======
+
+class DownloadSlots:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+
+    def acquire(self, key):
+        with self.lock:
+            if self.active.get(key, 0) >= get_setting('MAX_PER_USER'):
+                return False
+            self.active[key] = self.active.get(key, 0) + 1
+            return True
+
+    def release(self, key):
+        with self.lock:
+            self.active[key] -= 1
+            if not self.active[key]:
+                del self.active[key]
+
+
+slots = DownloadSlots()
+
+
+class _SlotStream:
+    """Trả slot khi response đóng (xong, client ngắt, hoặc chưa đọc byte nào)."""
+
+    def __init__(self, chunks, key):
+        self.chunks, self.key, self.closed = chunks, key, False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.chunks.close()
+            slots.release(self.key)
+
+
+def parse_range(header, size):
+    """'bytes=a-b' -> (start, stop); None nếu không có / nhiều range (trả cả file); ValueError nếu ngoài file."""
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, stop = max(size - int(last), 0), size
+    else:
+        start, stop = int(first), min(int(last) + 1, size) if last else size
+    if start >= stop:
+        raise ValueError(header)
+    return start, stop
+
+
+def download_response(request, kind, obj, name, song_ids):
+    user = request.user
+    key = f'user-{user.pk}' if user.is_authenticated else f'ip-{request.META.get("REMOTE_ADDR")}'
+    # Giữ slot trước khi tính CRC: request sẽ bị 429 thì không đọc file nào
+    if not slots.acquire(key):
+        response = Response({'error': 'Too many downloads in progress'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = get_setting('RETRY_AFTER')
+        return response
+
+    try:
+        archive, etag = build_archive(kind, obj, name, song_ids)
+        byte_range = None
+        if request.headers.get('If-Range', etag) == etag:
+            byte_range = parse_range(request.headers.get('Range'), archive.size)
+    except ValueError:
+        slots.release(key)
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{archive.size}'
+        return response
+    except BaseException:
+        slots.release(key)
+        raise
+
+    start, stop = byte_range or (0, archive.size)
+    response = StreamingHttpResponse(_SlotStream(archive.iter_range(start, stop), key), content_type='application/zip')
+    if byte_range:
+        response.status_code = status.HTTP_206_PARTIAL_CONTENT
+        response['Content-Range'] = f'bytes {start}-{stop - 1}/{archive.size}'
+    response['Content-Length'] = stop - start
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = content_disposition_header(True, f'{name}.zip')
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import ARTIST_ROLE_ID, User, Song, Album, ArtistFollow, ArtistStats, ArtistDailyPlays
+
+TOP_SONGS = 10
+
+
+def _aggregates(artist_ids=None):
+    """Mỗi chỉ số là một câu GROUP BY trên toàn bộ artist, không lặp theo từng artist."""
+    links = Song.artists.through.objects.all()
+    albums = Album.objects.all()
+    follows = ArtistFollow.objects.all()
+    if artist_ids is not None:
+        links = links.filter(user_id__in=artist_ids)
+        albums = albums.filter(creator_id__in=artist_ids)
+        follows = follows.filter(artist_id__in=artist_ids)
+
+    songs = {
+        row['user_id']: row
+        for row in links.values('user_id').annotate(plays=Sum('song__play_count'), songs=Count('song_id'))
+    }
+    album_counts = dict(albums.values('creator_id').annotate(n=Count('id')).values_list('creator_id', 'n'))
+    follower_counts = dict(follows.values('artist_id').annotate(n=Count('id')).values_list('artist_id', 'n'))
+
+    ranked = links.annotate(rank=Window(
+        RowNumber(), partition_by=[F('user_id')], order_by=[F('song__play_count').desc(), F('song_id').asc()],
+    )).filter(rank__lte=TOP_SONGS).order_by('user_id', 'rank').values_list('user_id', 'song_id')
+    top_songs = {}
+    for artist_id, song_id in ranked:
+        top_songs.setdefault(artist_id, []).append(song_id)
+
+    return songs, album_counts, follower_counts, top_songs
+
+
+@transaction.atomic
+def build_artist_stats(artist_ids=None, log=None):
+    """Tính lại thống kê; chỉ ghi những artist có số liệu thay đổi và cộng dồn lượt nghe mới vào ngày hôm nay."""
+    log = log or (lambda message: None)
+    artists = User.objects.filter(role_id=ARTIST_ROLE_ID)
+    if artist_ids is not None:
+        artists = artists.filter(id__in=artist_ids)
+    ids = list(artists.values_list('id', flat=True))
+    songs, album_counts, follower_counts, top_songs = _aggregates(artist_ids)
+    existing = {stats.artist_id: stats for stats in ArtistStats.objects.filter(artist_id__in=ids)}
+
+    today = timezone.localdate()
+    changed, deltas = [], {}
+    for artist_id in ids:
+        row = songs.get(artist_id, {})
+        stats = ArtistStats(
+            artist_id=artist_id,
+            total_plays=row.get('plays') or 0,
+            song_count=row.get('songs') or 0,
+            album_count=album_counts.get(artist_id, 0),
+            follower_count=follower_counts.get(artist_id, 0),
+            top_songs=top_songs.get(artist_id, []),
+        )
+        previous = existing.get(artist_id)
+        fields = ('total_plays', 'song_count', 'album_count', 'follower_count', 'top_songs')
+        if previous and all(getattr(previous, field) == getattr(stats, field) for field in fields):
+            continue
+        changed.append(stats)
+        # Lần đầu tính thì chưa có mốc so sánh: không dồn toàn bộ lịch sử vào hôm nay
+        if previous and stats.total_plays != previous.total_plays:
+            deltas[artist_id] = stats.total_plays - previous.total_plays
+
+    ArtistStats.objects.bulk_create(
+        changed, batch_size=500, update_conflicts=True, unique_fields=['artist'],
+        update_fields=['total_plays', 'song_count', 'album_count', 'follower_count', 'top_songs', 'computedAt'],
+    )
+    ArtistDailyPlays.objects.bulk_create(
+        [ArtistDailyPlays(artist_id=artist_id, date=today, plays=0) for artist_id in deltas], ignore_conflicts=True,
+    )
+    for artist_id, delta in deltas.items():
+        ArtistDailyPlays.objects.filter(artist_id=artist_id, date=today).update(plays=F('plays') + delta)
+
+    log(f'{len(changed)} / {len(ids)} artists changed')
+    return len(changed)
@@ -0,0 +1,186 @@
+import logging
+import subprocess
+import wave
+
+import numpy as np
+from django.conf import settings
+from scipy import signal
+
+from .fingerprints import fingerprint_vector, index_fingerprint
+from .models import Song, Waveform
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'FFMPEG': 'ffmpeg',
+    'SAMPLE_RATE': 22050,        # file không phải WAV PCM được decode về stereo ở tần số này
+    'WAVEFORM_POINTS': 1000,     # số cặp (min, max) int8 => 2 KB mỗi bài
+    'TARGET_LOUDNESS': -14.0,    # LUFS mà gain đưa bài về
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_AUDIO', {}).get(name, DEFAULTS[name])
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+# ======= DECODE =======
+
+def _decode_wav(path):
+    with wave.open(path, 'rb') as f:
+        width, channels, rate = f.getsampwidth(), f.getnchannels(), f.getframerate()
+        raw = f.readframes(f.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width in (2, 4):
+        dtype = np.int16 if width == 2 else np.int32
+        samples = np.frombuffer(raw, dtype=f'<i{width}').astype(np.float32) / np.iinfo(dtype).max
+    else:
+        raise AudioDecodeError(f'unsupported sample width: {width}')
+    return samples.reshape(-1, channels), rate
+
+
+def decode(path):
+    """Đọc cả file thành PCM float32 trong [-1, 1], shape (frames, channels); trả về (samples, sample_rate).
+
+    WAV PCM giữ nguyên kênh và sample rate gốc; file khác qua ffmpeg về stereo ở SAMPLE_RATE.
+    """
+    if str(path).lower().endswith('.wav'):
+        try:
+            return _decode_wav(path)
+        except (wave.Error, EOFError, AudioDecodeError):
+            pass  # WAV nén hoặc 24-bit: để ffmpeg lo
+
+    rate = get_setting('SAMPLE_RATE')
+    command = [get_setting('FFMPEG'), '-v', 'error', '-i', str(path), '-f', 'f32le', '-ac', '2', '-ar', str(rate), '-']
+    try:
+        result = subprocess.run(command, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise AudioDecodeError('ffmpeg is not installed')
+    except subprocess.CalledProcessError as exc:
+        raise AudioDecodeError(exc.stderr.decode(errors='replace').strip() or 'ffmpeg failed')
+    samples = np.frombuffer(result.stdout, dtype='<f4').reshape(-1, 2)
+    if np.array_equal(samples[:, 0], samples[:, 1]):
+        samples = samples[:, :1]   # file mono bị -ac 2 nhân đôi: đo như một kênh, không cộng thêm 3 dB
+    return samples, rate
+
+
+def downmix(samples):
+    """Mono cho waveform / fingerprint (không dùng cho loudness: BS.1770 cộng năng lượng từng kênh)."""
+    return samples.mean(axis=1)
+
+
+# ======= ANALYSES =======
+
+def waveform_peaks(samples, points):
+    """Chia thành `points` đoạn bằng nhau, lấy min/max mỗi đoạn, lượng tử hoá int8: [min0, max0, min1, max1, ...]."""
+    if not len(samples):
+        return b''
+    size = -(-len(samples) // points)
+    frames = np.pad(samples, (0, size * points - len(samples))).reshape(points, size)
+    peaks = np.stack([frames.min(axis=1), frames.max(axis=1)], axis=1)
+    return np.clip(np.round(peaks * 127), -127, 127).astype(np.int8).tobytes()
+
+
+def k_weighting(samples, rate, axis=-1):
+    """Bộ lọc K của ITU-R BS.1770 (high shelf + high pass), hệ số suy ra cho sample rate bất kỳ."""
+    K = np.tan(np.pi * 1681.974450955533 / rate)
+    Q = 0.7071752369554196
+    Vh = 10 ** (3.999843853973347 / 20)
+    Vb = Vh ** 0.4996667741545416
+    a0 = 1 + K / Q + K * K
+    shelf_b = [(Vh + Vb * K / Q + K * K) / a0, 2 * (K * K - Vh) / a0, (Vh - Vb * K / Q + K * K) / a0]
+    shelf_a = [1, 2 * (K * K - 1) / a0, (1 - K / Q + K * K) / a0]
+
+    K = np.tan(np.pi * 38.13547087602444 / rate)
+    Q = 0.5003270373238773
+    a0 = 1 + K / Q + K * K
+    high_pass_a = [1, 2 * (K * K - 1) / a0, (1 - K / Q + K * K) / a0]
+
+    return signal.lfilter([1, -2, 1], high_pass_a, signal.lfilter(shelf_b, shelf_a, samples, axis=axis), axis=axis)
+
+
+def integrated_loudness(samples, rate):
+    """Loudness tích phân (LUFS) theo BS.1770-4: block 400 ms chồng 75%, gate tuyệt đối -70 và tương đối -10 LU.
+
+    samples: (frames, channels); năng lượng K-weighted của các kênh được cộng lại, trọng số 1.0 cho mọi kênh
+    (đúng với mono / stereo; file nhiều kênh hơn không phân biệt surround và LFE).
+    """
+    size, step = int(0.4 * rate), int(0.1 * rate)
+    if len(samples) < size:
+        return None
+    power = (k_weighting(samples, rate, axis=0) ** 2).sum(axis=1)
+    energy = np.concatenate([[0.0], np.cumsum(power)])
+    starts = np.arange(0, len(samples) - size + 1, step)
+    blocks = (energy[starts + size] - energy[starts]) / size
+
+    with np.errstate(divide='ignore'):
+        block_loudness = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[block_loudness > -70]
+    if not len(gated):
+        return None
+    relative = -0.691 + 10 * np.log10(gated.mean()) - 10
+    gated = blocks[block_loudness > max(relative, -70)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def loudness_stats(samples, rate):
+    """(loudness LUFS, sample peak dBFS, gain dB); gain không đẩy peak vượt 0 dBFS.
+
+    Peak là biên độ lớn nhất trên mọi kênh. File qua ffmpeg đã được resample về SAMPLE_RATE nên peak
+    giữa các sample gốc có thể thấp hơn thật một chút; WAV PCM được đo ở sample rate gốc.
+    """
+    loudness = integrated_loudness(samples, rate)
+    amplitude = float(np.abs(samples).max()) if samples.size else 0.0
+    peak = 20 * np.log10(amplitude) if amplitude > 0 else None
+    if loudness is None or peak is None:
+        return None, None, None
+    gain = min(get_setting('TARGET_LOUDNESS') - loudness, -peak)
+    return round(loudness, 2), round(float(peak), 2), round(gain, 2)
+
+
+def analyze_file(path):
+    """Decode một lần rồi chạy mọi phân tích; chạy được trong process pool (chỉ nhận / trả dữ liệu thuần)."""
+    samples, rate = decode(path)
+    mono = downmix(samples)
+    points = get_setting('WAVEFORM_POINTS')
+    loudness, peak, gain = loudness_stats(samples, rate)
+    return {
+        'waveform': waveform_peaks(mono, points),
+        'points': points,
+        'loudness': loudness,
+        'peak': peak,
+        'gain': gain,
+        'fingerprint': fingerprint_vector(mono, rate),
+    }
+
+
+def save_analysis(song_id, result):
+    from .sync import record_changes
+
+    Waveform.objects.update_or_create(
+        song_id=song_id, defaults={'peaks': result['waveform'], 'points': result['points']},
+    )
+    Song.objects.filter(id=song_id).update(loudness=result['loudness'], peak=result['peak'], gain=result['gain'])
+    record_changes('songs', [song_id])  # update() không bắn signal
+
+    if result['fingerprint'] is not None:
+        duplicate_of = index_fingerprint(song_id, result['fingerprint'])
+        if duplicate_of:
+            logger.warning('song %s looks like a duplicate of song %s', song_id, duplicate_of)
+
+
+def analyze_song(song):
+    """Gọi ở bước ingest (upload / sửa file); lỗi decode chỉ ghi log, không làm hỏng upload."""
+    if not song.url:
+        return False
+    try:
+        result = analyze_file(song.url.path)
+    except (AudioDecodeError, OSError) as exc:
+        logger.warning('audio analysis failed for song %s: %s', song.pk, exc)
+        return False
+    save_analysis(song.pk, result)
+    return True
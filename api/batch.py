@@ -0,0 +1,117 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.http import Http404, HttpRequest, QueryDict, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_REQUESTS': 20,
+    'WORKERS': 1,        # > 1: chạy sub-request song song trong thread pool (mỗi thread một kết nối DB)
+    'PREFIX': '/api/',
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_BATCH', {}).get(name, DEFAULTS[name])
+
+
+class BatchError(Exception):
+    pass
+
+
+def parse_requests(data):
+    """Chấp nhận {"requests": [...]} hoặc list; mỗi phần tử là path hoặc {"id", "path"}."""
+    items = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise BatchError('requests must be a non-empty list')
+    if len(items) > get_setting('MAX_REQUESTS'):
+        raise BatchError(f'at most {get_setting("MAX_REQUESTS")} requests per batch')
+
+    parsed = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {'path': item}
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise BatchError(f'requests[{index}] must be a path or an object with "path"')
+        if item.get('method', 'GET').upper() != 'GET':
+            raise BatchError(f'requests[{index}]: only GET is supported')
+        parsed.append((item.get('id', index), item['path']))
+    return parsed
+
+
+def _sub_request(request, path, query):
+    """Sub-request dùng lại META (header) của request gốc và user đã xác thực — không decode JWT lại."""
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {**request.META, 'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query}
+    sub.META.pop('CONTENT_LENGTH', None)
+    sub.GET = QueryDict(query)
+    sub.COOKIES = request.COOKIES
+    sub.user = request.user
+    # Cơ chế force auth của DRF: Request.__init__ dùng ForcedAuthentication nếu có hai thuộc tính này
+    sub._force_auth_user = request.user if request.user.is_authenticated else None
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def _body(response):
+    if isinstance(response, Response):
+        return response.data
+    if isinstance(response, StreamingHttpResponse):
+        # Không đọc nội dung nhưng vẫn phải đóng: stream có thể đang giữ tài nguyên (file, slot download)
+        response.close()
+        return {'error': 'streaming responses are not supported in a batch'}
+    if response.get('Content-Type', '').startswith('application/json') and response.content:
+        return json.loads(response.content)
+    return {'error': f'unsupported content type: {response.get("Content-Type")}'}
+
+
+def execute(request, item_id, target):
+    url = urlsplit(target)
+    prefix = get_setting('PREFIX')
+    if not url.path.startswith(prefix) or url.path.rstrip('/') == f'{prefix}batch':
+        return {'id': item_id, 'status': 400, 'body': {'error': f'path must start with {prefix}'}}
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        return {'id': item_id, 'status': 404, 'body': {'error': 'Not found'}}
+
+    sub = _sub_request(request, url.path, url.query)
+    # metrics / throttle nhận route theo resolver_match: sub-request trả đúng cost của route đó
+    sub.resolver_match = match
+    # Lỗi của một sub-request chỉ hỏng phần tử đó, các phần tử khác vẫn trả kết quả
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+        return {'id': item_id, 'status': response.status_code, 'body': _body(response)}
+    except Http404:
+        return {'id': item_id, 'status': 404, 'body': {'error': 'Not found'}}
+    except PermissionDenied:
+        return {'id': item_id, 'status': 403, 'body': {'error': 'Permission denied'}}
+    except Exception:
+        logger.exception('batch sub-request %s failed', url.path)
+        return {'id': item_id, 'status': 500, 'body': {'error': 'Internal server error'}}
+
+
+def _execute_in_thread(request, item_id, target):
+    try:
+        return execute(request, item_id, target)
+    finally:
+        connections.close_all()
+
+
+def execute_batch(request, items):
+    workers = min(get_setting('WORKERS'), len(items))
+    if workers <= 1:
+        return [execute(request, item_id, target) for item_id, target in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_execute_in_thread, request, item_id, target) for item_id, target in items]
+        return [future.result() for future in futures]
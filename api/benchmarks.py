@@ -0,0 +1,192 @@
+import statistics
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .management.commands.seed_catalog import SEED_PASSWORD
+from .models import ARTIST_ROLE_ID, User, Genre, Song, Album, Playlist
+from .profiling import QueryRecorder
+
+
+def _cases(client, auth):
+    song = Song.objects.order_by('id').first()
+    album = Album.objects.order_by('id').first()
+    playlist = Playlist.objects.order_by('id').first()
+    artist = User.objects.filter(role__id=ARTIST_ROLE_ID).order_by('id').first()
+    listener = User.objects.exclude(role__id=ARTIST_ROLE_ID).order_by('id').first()
+    genre = Genre.objects.order_by('id').first()
+
+    cases = {
+        'songs-list': lambda: client.get('/api/songs/'),
+        'songs-search': lambda: client.get('/api/songs/', {'search': genre.name if genre else 'love'}),
+        'albums-list': lambda: client.get('/api/albums/'),
+        'playlists-list': lambda: client.get('/api/playlists/'),
+        'artists-list': lambda: client.get('/api/artists/'),
+        'genres-list': lambda: client.get('/api/genres/'),
+        'landing-page': lambda: client.get('/api/landing-page/'),
+    }
+    if song:
+        cases['songs-detail'] = lambda: client.get(f'/api/songs/{song.id}/')
+        cases['songs-increase-play'] = lambda: client.post(f'/api/songs/{song.id}/increase-play/')
+    if album:
+        cases['albums-detail'] = lambda: client.get(f'/api/albums/{album.id}/')
+    if playlist:
+        cases['playlists-detail'] = lambda: client.get(f'/api/playlists/{playlist.id}/')
+    if artist:
+        cases['artists-detail'] = lambda: client.get(f'/api/artists/{artist.id}/')
+    if listener:
+        token = str(RefreshToken.for_user(listener).access_token)
+        cases['auth-login'] = lambda: client.post(
+            '/api/auth/login/', {'username': listener.username, 'password': SEED_PASSWORD}
+        )
+        cases['auth-me'] = lambda: auth.get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {token}')
+    return cases
+
+
+def run_benchmarks(repeat=5, warmup=1, only=None):
+    """Chạy mọi endpoint trong api/urls.py, trả về latency / số query / bộ nhớ đỉnh."""
+    # Gọi lặp lại cùng một endpoint sẽ chạm throttle (login, increase-play)
+    with override_settings(API_THROTTLE={**getattr(settings, 'API_THROTTLE', {}), 'ENABLED': False}):
+        return _run(repeat, warmup, only)
+
+
+def _run(repeat, warmup, only):
+    client, auth = Client(), Client()
+    results = {}
+    for name, call in sorted(_cases(client, auth).items()):
+        if only and name not in only:
+            continue
+        for _ in range(warmup):
+            call()
+
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = call()
+            latencies.append(time.perf_counter() - start)
+
+        recorder = QueryRecorder()
+        with recorder.record():
+            call()
+
+        tracemalloc.start()
+        try:
+            call()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        latencies.sort()
+        results[name] = {
+            'status': response.status_code,
+            'latency_ms': {
+                'min': round(latencies[0] * 1000, 3),
+                'p50': round(statistics.median(latencies) * 1000, 3),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3),
+                'max': round(latencies[-1] * 1000, 3),
+            },
+            'queries': len(recorder.queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'response_bytes': len(response.content),
+        }
+    return results
+
+
+def compare(previous, current):
+    """So sánh hai lần chạy, trả về các dòng mô tả thay đổi p50 / query / bộ nhớ."""
+    lines = []
+    for name in sorted(set(previous) | set(current)):
+        old, new = previous.get(name), current.get(name)
+        if old is None or new is None:
+            lines.append(f'{name}: {"added" if old is None else "removed"}')
+            continue
+        lines.append(
+            f'{name}: p50 {old["latency_ms"]["p50"]} -> {new["latency_ms"]["p50"]} ms '
+            f'({_delta(old["latency_ms"]["p50"], new["latency_ms"]["p50"])}), '
+            f'queries {old["queries"]} -> {new["queries"]}, '
+            f'memory {old["peak_memory_kb"]} -> {new["peak_memory_kb"]} KB'
+        )
+    return lines
+
+
+def _delta(old, new):
+    if not old:
+        return 'n/a'
+    return f'{(new - old) / old * 100:+.1f}%'
+
+
+# ======= LOGIN STORM =======
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+    return {
+        'p50': round(statistics.median(latencies) * 1000, 3),
+        'p99': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+        'count': len(latencies),
+    }
+
+
+def _probe(path, probes):
+    client, latencies = Client(), []
+    for _ in range(probes):
+        start = time.perf_counter()
+        client.get(path)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _storm(usernames, stop, logins):
+    client = Client()
+    try:
+        index = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.post('/api/auth/login/', {'username': usernames[index % len(usernames)], 'password': SEED_PASSWORD})
+            logins.append((time.perf_counter() - start, response.status_code))
+            index += 1
+    finally:
+        connections.close_all()
+
+
+def login_storm(threads=8, probes=200, path='/api/songs/', workers=None):
+    """p50 / p99 của `path` khi không tải và khi `threads` thread login liên tục (cache login tắt).
+
+    workers=0: hash ngay trên thread của request như trước; None: dùng API_PASSWORDS hiện tại.
+    """
+    usernames = list(User.objects.exclude(role__id=ARTIST_ROLE_ID).values_list('username', flat=True))
+    password_settings = {**getattr(settings, 'API_PASSWORDS', {}), 'LOGIN_CACHE_TIMEOUT': 0}
+    if workers is not None:
+        password_settings['WORKERS'] = workers
+
+    with override_settings(API_THROTTLE={**getattr(settings, 'API_THROTTLE', {}), 'ENABLED': False},
+                           API_PASSWORDS=password_settings):
+        _probe(path, 5)
+        baseline = _probe(path, probes)
+
+        stop, logins = threading.Event(), []
+        pool = [threading.Thread(target=_storm, args=(usernames, stop, logins)) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        try:
+            time.sleep(0.5)
+            started = time.perf_counter()
+            during = _probe(path, probes)
+            elapsed = time.perf_counter() - started
+        finally:
+            stop.set()
+            for thread in pool:
+                thread.join()
+
+    return {
+        'baseline_ms': _percentiles(baseline),
+        'storm_ms': _percentiles(during),
+        'login_ms': _percentiles([latency for latency, _ in logins]),
+        'logins_per_s': round(len(logins) / elapsed, 1) if elapsed else None,
+        'login_statuses': {status: sum(1 for _, code in logins if code == status) for status in {code for _, code in logins}},
+    }
+
@@ -0,0 +1,186 @@
+from django.db.models import QuerySet
+from django.db.models.manager import BaseManager
+from rest_framework import serializers
+
+from .fragments import FRAGMENTS, fragments
+from .library import mark_liked, request_user
+from .metrics import TimedRepresentationMixin
+from .models import Song
+
+SONG_COLUMNS = ('id', 'title', 'duration', 'url', 'thumbnail', 'play_count', 'loudness', 'peak', 'gain')
+CHUNK_SIZE = 900  # SQLite giới hạn số tham số trong một câu query
+
+
+def _file_name(name):
+    # Giống FileField(use_url=False): file rỗng -> None, còn lại trả về name
+    return name or None
+
+
+def _instances(songs):
+    """list object nếu đã có sẵn (list, hoặc queryset / quan hệ đã prefetch), ngược lại None."""
+    if isinstance(songs, BaseManager):
+        songs = songs.all()
+    if isinstance(songs, QuerySet) and songs._result_cache is None:
+        return None
+    return list(songs)
+
+
+def song_rows(songs):
+    """Trả về tuple theo SONG_COLUMNS, lấy thẳng bằng values_list nếu là queryset chưa được đọc."""
+    instances = _instances(songs)
+    if instances is None:
+        if isinstance(songs, BaseManager):
+            songs = songs.all()
+        return list(songs.values_list(*SONG_COLUMNS))
+    songs = instances
+    return [
+        (song.id, song.title, song.duration, song.url.name, song.thumbnail.name, song.play_count,
+         song.loudness, song.peak, song.gain)
+        for song in songs
+    ]
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _load_fragments(name, pks):
+    model, columns = FRAGMENTS[name]
+    keys = ('id',) + columns
+    loaded = {}
+    for chunk in _chunks(pks):
+        for row in model.objects.filter(pk__in=chunk).values_list('id', *columns):
+            loaded[row[0]] = dict(zip(keys, row))
+    return loaded
+
+
+def _related(name, field, song_ids):
+    """Gom quan hệ M2M của các bài hát thành {song_id: [dict, ...]}.
+
+    Bảng trung gian chỉ đọc cặp id; dict của artist / album / genre lấy từ fragment cache,
+    chỉ phần miss mới query bảng đích.
+    """
+    through = field.remote_field.through
+    target_id = f'{field.m2m_reverse_field_name()}_id'
+
+    pairs = []
+    for chunk in _chunks(song_ids):
+        pairs.extend(
+            through.objects.filter(song_id__in=chunk)
+            .order_by('song_id', target_id)
+            .values_list('song_id', target_id)
+        )
+    objects = fragments.get_many(name, [pk for _, pk in pairs], lambda pks: _load_fragments(name, pks))
+
+    related = {}
+    for song_id, pk in pairs:
+        if pk in objects:
+            related.setdefault(song_id, []).append(objects[pk])
+    return related
+
+
+def related_genres(song_ids):
+    return _related('genre', Song.genre.field, song_ids)
+
+
+def related_albums(song_ids):
+    return _related('album', Song.albums.field, song_ids)
+
+
+def related_artists(song_ids):
+    return _related('artist', Song.artists.field, song_ids)
+
+
+def prefetched_artists(songs):
+    """{song_id: [artist dict]} khi mọi bài đã prefetch 'artists' (stream album / playlist), ngược lại None."""
+    instances = _instances(songs)
+    if instances is None or not all('artists' in getattr(song, '_prefetched_objects_cache', {}) for song in instances):
+        return None
+    _, columns = FRAGMENTS['artist']
+    return {
+        song.id: [
+            {'id': artist.id, **{column: getattr(artist, column) for column in columns}}
+            for artist in sorted(song.artists.all(), key=lambda artist: artist.id)
+        ]
+        for song in instances
+    }
+
+
+def serialize_songs(songs):
+    """Cùng output với SongSerializer(many=True) nhưng không đi qua field machinery của DRF."""
+    return song_dicts(song_rows(songs))
+
+
+def iter_serialized_songs(queryset, chunk_size):
+    """Như serialize_songs nhưng đọc queryset bằng iterator() và trả về từng chunk."""
+    rows = []
+    for row in queryset.values_list(*SONG_COLUMNS).iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield song_dicts(rows)
+            rows = []
+    if rows:
+        yield song_dicts(rows)
+
+
+def song_dicts(rows):
+    ids = [row[0] for row in rows]
+    genres, albums, artists = related_genres(ids), related_albums(ids), related_artists(ids)
+    return [
+        {
+            'id': song_id,
+            'title': title,
+            'duration': duration,
+            'url': _file_name(url),
+            'thumbnail': _file_name(thumbnail),
+            'play_count': play_count,
+            'loudness': loudness,
+            'peak': peak,
+            'gain': gain,
+            'genre': genres.get(song_id, []),
+            'albums': albums.get(song_id, []),
+            'artist': artists.get(song_id, []),
+        }
+        for song_id, title, duration, url, thumbnail, play_count, loudness, peak, gain in rows
+    ]
+
+
+def serialize_songs_mini(songs):
+    """Cùng output với SongMiniSerializer(many=True)."""
+    rows = song_rows(songs)
+    artists = prefetched_artists(songs)
+    if artists is None:
+        artists = related_artists([row[0] for row in rows])
+    return [
+        {
+            'id': song_id,
+            'title': title,
+            'duration': duration,
+            'artist': artists.get(song_id, []),
+            'url': _file_name(url),
+            'thumbnail': _file_name(thumbnail),
+            'gain': gain,
+        }
+        for song_id, title, duration, url, thumbnail, _, _, _, gain in rows
+    ]
+
+
+# ======= LIST SERIALIZERS (chỉ dùng khi đọc) =======
+
+class _SongListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return mark_liked(serialize_songs(data), request_user(self.context))
+
+
+class _SongMiniListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return mark_liked(serialize_songs_mini(data), request_user(self.context))
+
+
+class FastSongListSerializer(TimedRepresentationMixin, _SongListSerializer):
+    pass
+
+
+class FastSongMiniListSerializer(TimedRepresentationMixin, _SongMiniListSerializer):
+    pass
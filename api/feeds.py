@@ -0,0 +1,147 @@
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from .fast_serializers import serialize_songs
+from .models import Genre, Song, Album, Playlist, SimilarSongs, HomeFeed
+from .recommendations import m2m_pairs, pairs_array, incidence, positions
+from .serializers import AlbumSerializer
+
+SIMILAR_WEIGHT = 1.0
+ARTIST_WEIGHT = 0.6
+GENRE_WEIGHT = 0.3
+POPULARITY_WEIGHT = 0.1
+
+RECOMMENDED_SONGS = 20
+RECOMMENDED_ALBUMS = 10
+GENRE_SECTIONS = 4
+SONGS_PER_GENRE = 10
+
+
+def _row_normalize(matrix):
+    totals = np.asarray(matrix.sum(axis=1)).ravel()
+    scale = np.divide(1.0, totals, out=np.zeros_like(totals), where=totals > 0)
+    return sparse.diags(scale.astype(np.float32)) @ matrix
+
+
+def _top(scores, n):
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > n:
+        candidates = candidates[np.argpartition(-scores[candidates], n)[:n]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class FeedModel:
+    """Các ma trận dùng chung cho mọi user: song x artist, song x genre, song x album, song x song."""
+
+    def __init__(self):
+        rows = Song.objects.order_by('id').values_list('id', 'play_count')
+        songs = np.array(list(rows), dtype=np.int64).reshape(-1, 2)
+        self.song_ids = songs[:, 0]
+        popularity = np.log1p(songs[:, 1].astype(np.float32))
+        self.popularity = popularity / popularity.max() if len(popularity) and popularity.max() > 0 else popularity
+
+        self.artists = incidence(m2m_pairs(Song.artists.field), self.song_ids, normalize=False).T.tocsr()
+        self.genre_ids = np.fromiter(Genre.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+        self.genres = incidence(m2m_pairs(Song.genre.field), self.song_ids, groups=self.genre_ids,
+                                normalize=False).T.tocsr()
+        self.album_ids = np.fromiter(Album.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+        albums = incidence(m2m_pairs(Song.albums.field), self.song_ids, groups=self.album_ids, normalize=False)
+        self.albums = _row_normalize(albums).T.tocsr()  # song x album, chia cho số bài của album
+        self.similar = self._similar_matrix()
+        self.genre_names = dict(Genre.objects.values_list('id', 'name'))
+
+    def _similar_matrix(self):
+        rows, cols, data = [], [], []
+        for song_id, song_ids, scores in SimilarSongs.objects.values_list('song_id', 'song_ids', 'scores').iterator():
+            rows.extend([song_id] * len(song_ids))
+            cols.extend(song_ids)
+            data.extend(scores)
+        row_index, row_found = positions(self.song_ids, np.asarray(rows, dtype=np.int64))
+        col_index, col_found = positions(self.song_ids, np.asarray(cols, dtype=np.int64))
+        keep = row_found & col_found
+        n = len(self.song_ids)
+        return sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32)[keep], (row_index[keep], col_index[keep])), shape=(n, n)
+        )
+
+    def score(self, owned):
+        """owned: ma trận user x song (bài trong playlist của user). Trả về điểm dense user x song."""
+        owned = _row_normalize(owned)
+        artist_affinity = _row_normalize(owned @ self.artists)
+        genre_affinity = _row_normalize(owned @ self.genres)
+
+        scores = SIMILAR_WEIGHT * (owned @ self.similar).toarray()
+        scores += ARTIST_WEIGHT * (artist_affinity @ self.artists.T).toarray()
+        scores += GENRE_WEIGHT * (genre_affinity @ self.genres.T).toarray()
+        scores += POPULARITY_WEIGHT * self.popularity
+        scores[owned.toarray() > 0] = 0  # không gợi ý lại bài user đã có
+        return scores, genre_affinity.toarray()
+
+
+def build_home_feeds(user_ids=None, block_size=100, log=None):
+    """Tính feed cá nhân cho các user có playlist và lưu payload sẵn sàng trả về vào HomeFeed."""
+    log = log or (lambda message: None)
+    memberships = Playlist.songs.through.objects.values_list('playlist__user_id', 'song_id')
+    if user_ids is not None:
+        memberships = memberships.filter(playlist__user_id__in=user_ids)
+    pairs = pairs_array(memberships)
+    users = np.unique(pairs[:, 0])
+    log(f'{len(users)} users with playlists')
+    if not len(users):
+        return 0
+
+    model = FeedModel()
+    album_cache = {}
+    trending = serialize_songs(Song.objects.order_by('-play_count')[:10])
+    for start in range(0, len(users), block_size):
+        block = users[start:start + block_size]
+        owned = incidence(pairs, model.song_ids, groups=block, normalize=False)
+        scores, genre_affinity = model.score(owned)
+
+        feeds = {}
+        for i, user_id in enumerate(block):
+            user_scores = scores[i]
+            sections = []
+            for genre_index in _top(genre_affinity[i], GENRE_SECTIONS):
+                in_genre = model.genres[:, genre_index].toarray().ravel() > 0
+                songs = _top(np.where(in_genre, user_scores, 0), SONGS_PER_GENRE)
+                sections.append((model.genre_names[int(model.genre_ids[genre_index])], model.song_ids[songs].tolist()))
+            album_scores = (model.albums.T @ np.maximum(user_scores, 0))
+            feeds[int(user_id)] = {
+                'songs': model.song_ids[_top(user_scores, RECOMMENDED_SONGS)].tolist(),
+                'sections': sections,
+                'albums': model.album_ids[_top(album_scores, RECOMMENDED_ALBUMS)].tolist(),
+            }
+
+        _save_feeds(feeds, album_cache, trending)
+        log(f'  {min(start + block_size, len(users))} / {len(users)}')
+    return len(users)
+
+
+def _save_feeds(feeds, album_cache, trending):
+    song_ids = {song_id for feed in feeds.values() for song_id in feed['songs']}
+    song_ids.update(song_id for feed in feeds.values() for _, ids in feed['sections'] for song_id in ids)
+    songs = {song['id']: song for song in serialize_songs(Song.objects.filter(id__in=song_ids))}
+
+    missing = {album_id for feed in feeds.values() for album_id in feed['albums']} - set(album_cache)
+    for album in AlbumSerializer(Album.objects.filter(id__in=missing), many=True).data:
+        album_cache[album['id']] = album
+
+    rows = [
+        HomeFeed(user_id=user_id, payload={
+            'personalized': True,
+            'recommended_songs': [songs[song_id] for song_id in feed['songs'] if song_id in songs],
+            'playlists_by_genre': [
+                {'genre': genre, 'songs': [songs[song_id] for song_id in ids if song_id in songs]}
+                for genre, ids in feed['sections']
+            ],
+            'top_trending_songs': trending,
+            'recommended_albums': [album_cache[album_id] for album_id in feed['albums'] if album_id in album_cache],
+        })
+        for user_id, feed in feeds.items()
+    ]
+    with transaction.atomic():
+        HomeFeed.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['user'], update_fields=['payload', 'computedAt'],
+        )
@@ -0,0 +1,172 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Q, F, Sum
+
+from .library import invalidate_user
+from .models import Song, Fingerprint, FingerprintBucket, SongLike, PlayQueueItem
+
+FRAME_SIZE = 1024
+SEGMENTS = 16            # chia bài (đã bỏ im lặng đầu / cuối) thành 16 đoạn thời gian
+FREQUENCY_BANDS = 17     # dải log 300 Hz - 5 kHz; hiệu giữa các dải kề nhau => 16 giá trị / đoạn
+SILENCE = 0.01
+
+LSH_BANDS = 12           # chữ ký 12 x 16 bit; trùng một band => ứng viên
+LSH_BITS = 16
+DUPLICATE_SIMILARITY = 0.95
+MAX_BUCKET_SIZE = 200    # bucket quá đông (nhạc rất giống nhau / im lặng) bỏ qua khi dedupe cả catalog
+
+_PROJECTIONS = np.random.default_rng(20240601).standard_normal(
+    (LSH_BANDS * LSH_BITS, SEGMENTS * (FREQUENCY_BANDS - 1))
+).astype(np.float32)
+
+
+# ======= FINGERPRINT =======
+
+def fingerprint_vector(samples, rate):
+    """Vector phổ đã chuẩn hoá L2 (float32), bất biến với gain; None nếu bài quá ngắn."""
+    loud = np.flatnonzero(np.abs(samples) > SILENCE)
+    if not len(loud):
+        return None
+    samples = samples[loud[0]:loud[-1] + 1]
+    n_frames = len(samples) // FRAME_SIZE
+    if n_frames < SEGMENTS:
+        return None
+
+    frames = samples[:n_frames * FRAME_SIZE].reshape(n_frames, FRAME_SIZE) * np.hanning(FRAME_SIZE)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+
+    edges = np.geomspace(300, min(5000, rate / 2), FREQUENCY_BANDS + 1)
+    band = np.digitize(np.fft.rfftfreq(FRAME_SIZE, 1 / rate), edges) - 1
+    inside = (band >= 0) & (band < FREQUENCY_BANDS)
+    to_bands = np.zeros((len(band), FREQUENCY_BANDS), dtype=np.float32)
+    to_bands[np.flatnonzero(inside), band[inside]] = 1
+    energy = power @ to_bands
+
+    starts = (np.arange(SEGMENTS) * n_frames) // SEGMENTS
+    log_energy = np.log10(np.add.reduceat(energy, starts, axis=0) + 1e-10)
+    features = np.diff(log_energy, axis=1).ravel()
+    features -= features.mean()
+    norm = np.linalg.norm(features)
+    return (features / norm).astype(np.float32) if norm > 0 else None
+
+
+def signature_keys(vectors):
+    """Random hyperplane LSH: mỗi vector -> LSH_BANDS khoá nguyên LSH_BITS bit. vectors: (n, dim)."""
+    bits = (np.atleast_2d(vectors) @ _PROJECTIONS.T > 0).reshape(-1, LSH_BANDS, LSH_BITS)
+    return (bits * (1 << np.arange(LSH_BITS))).sum(axis=2)
+
+
+def _vector(data):
+    return np.frombuffer(bytes(data), dtype=np.float16).astype(np.float32)
+
+
+# ======= INDEX =======
+
+def find_duplicate(song_id, vector):
+    """Bài đã có trong index giống `vector` nhất (>= DUPLICATE_SIMILARITY), trỏ về bản gốc của cluster."""
+    keys = signature_keys(vector)[0]
+    lookup = Q()
+    for band, key in enumerate(keys):
+        lookup |= Q(band=band, key=int(key))
+    candidates = set(FingerprintBucket.objects.filter(lookup).values_list('fingerprint_id', flat=True))
+    candidates.discard(song_id)
+    if not candidates:
+        return None
+
+    rows = list(Fingerprint.objects.filter(song_id__in=candidates).values_list('song_id', 'vector', 'duplicate_of_id'))
+    similarity = np.array([_vector(data) for _, data, _ in rows]) @ vector
+    best = int(np.argmax(similarity))
+    if similarity[best] < DUPLICATE_SIMILARITY:
+        return None
+    candidate_id, _, original_id = rows[best]
+    return original_id or candidate_id
+
+
+@transaction.atomic
+def index_fingerprint(song_id, vector):
+    """Lưu fingerprint + bucket LSH của một bài, trả về id bài gốc nếu là bản trùng."""
+    duplicate_of = find_duplicate(song_id, vector)
+    Fingerprint.objects.update_or_create(song_id=song_id, defaults={
+        'vector': vector.astype(np.float16).tobytes(),
+        'duplicate_of_id': duplicate_of,
+    })
+    FingerprintBucket.objects.filter(fingerprint_id=song_id).delete()
+    FingerprintBucket.objects.bulk_create([
+        FingerprintBucket(fingerprint_id=song_id, band=band, key=int(key))
+        for band, key in enumerate(signature_keys(vector)[0])
+    ])
+    return duplicate_of
+
+
+# ======= CATALOG DEDUPE =======
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def duplicate_clusters():
+    """{id bài gốc: [id bản trùng, ...]} trên toàn catalog; bài gốc là bài có id nhỏ nhất của cluster."""
+    rows = list(Fingerprint.objects.order_by('song_id').values_list('song_id', 'vector'))
+    if not rows:
+        return {}
+    song_ids = np.array([song_id for song_id, _ in rows])
+    vectors = np.array([_vector(data) for _, data in rows])
+    keys = signature_keys(vectors)
+
+    pairs = []
+    for band in range(LSH_BANDS):
+        order = np.argsort(keys[:, band], kind='stable')
+        _, starts, counts = np.unique(keys[order, band], return_index=True, return_counts=True)
+        # Gom các bucket cùng kích thước để sinh cặp bằng một phép index thay vì lặp từng bucket
+        for count in np.unique(counts[(counts > 1) & (counts <= MAX_BUCKET_SIZE)]):
+            members = order[starts[counts == count][:, None] + np.arange(count)]
+            i, j = np.triu_indices(count, k=1)
+            pairs.append(np.stack([members[:, i].ravel(), members[:, j].ravel()], axis=1))
+    if not pairs:
+        return {}
+
+    pairs = np.unique(np.concatenate(pairs), axis=0)
+    similarity = np.einsum('ij,ij->i', vectors[pairs[:, 0]], vectors[pairs[:, 1]])
+    parent = list(range(len(rows)))
+    for i, j in pairs[similarity >= DUPLICATE_SIMILARITY]:
+        a, b = _find(parent, int(i)), _find(parent, int(j))
+        if a != b:
+            parent[max(a, b)] = min(a, b)  # index theo song_id tăng dần => gốc là id nhỏ nhất
+
+    clusters = {}
+    for i in range(len(rows)):
+        root = _find(parent, i)
+        if root != i:
+            clusters.setdefault(int(song_ids[root]), []).append(int(song_ids[i]))
+    return clusters
+
+
+@transaction.atomic
+def merge_songs(original_id, duplicate_ids):
+    """Gộp bản trùng vào bài gốc: cộng play_count, chuyển playlist / album / genre / artist, like và hàng đợi
+    phát của user rồi xoá bản trùng."""
+
+    original = Song.objects.get(pk=original_id)
+    duplicates = Song.objects.filter(pk__in=duplicate_ids)
+    plays = duplicates.aggregate(total=Sum('play_count'))['total'] or 0
+
+    # add() qua ORM để signal ghi change log cho /api/sync/
+    original.genre.add(*Song.genre.through.objects.filter(song__in=duplicates).values_list('genre_id', flat=True))
+    original.albums.add(*Song.albums.through.objects.filter(song__in=duplicates).values_list('album_id', flat=True))
+    original.artists.add(*Song.artists.through.objects.filter(song__in=duplicates).values_list('user_id', flat=True))
+    original.playlist_set.add(
+        *Song.playlist_set.through.objects.filter(song__in=duplicates).values_list('playlist_id', flat=True)
+    )
+    Song.objects.filter(pk=original_id).update(play_count=F('play_count') + plays)
+
+    liked_by = set(SongLike.objects.filter(song__in=duplicates).values_list('user_id', flat=True))
+    SongLike.objects.bulk_create([SongLike(user_id=user_id, song_id=original_id) for user_id in liked_by],
+                                 batch_size=500, ignore_conflicts=True)
+    PlayQueueItem.objects.filter(song__in=duplicates).update(song_id=original_id)
+    duplicates.delete()
+    for user_id in liked_by:
+        # bulk_create không bắn signal
+        transaction.on_commit(lambda user_id=user_id: invalidate_user('songs', user_id))
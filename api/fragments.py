@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .models import User, Genre, Album
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 20000,
+    # True: version (và fragment) nằm thêm trong Django cache để nhiều process thấy invalidation của nhau
+    'SHARED': False,
+    'TIMEOUT': 60 * 60,
+    # Không SHARED: process khác không thấy invalidation, entry trong LRU chỉ dùng được chừng này giây
+    'LOCAL_TIMEOUT': 30,
+}
+
+# tên fragment -> (model, các cột ngoài id); cùng output với ArtistMini / AlbumMini / GenreSerializer
+FRAGMENTS = {
+    'artist': (User, ('username', 'fullname')),
+    'album': (Album, ('title',)),
+    'genre': (Genre, ('name',)),
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_FRAGMENTS', {}).get(name, DEFAULTS[name])
+
+
+def _version_key(name, pk):
+    return f'fragment-version:{name}:{pk}'
+
+
+def _value_key(name, pk, version):
+    return f'fragment:{name}:{pk}:{version}'
+
+
+class FragmentCache:
+    """LRU trong process, key (fragment, pk) -> (version, dict, hết hạn).
+
+    Entry chỉ được dùng khi version khớp version hiện tại của object, nên một fragment dựng từ dữ liệu
+    cũ (đọc trước khi invalidate) không bao giờ được trả về sau khi version đã tăng. Không SHARED thì
+    version chỉ có trong process này: entry còn hết hạn sau LOCAL_TIMEOUT để thấy thay đổi từ process khác.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.hits = dict.fromkeys(FRAGMENTS, 0)
+        self.misses = dict.fromkeys(FRAGMENTS, 0)
+
+    def _versions(self, name, pks):
+        if not get_setting('SHARED'):
+            return {pk: self.versions.get((name, pk), 0) for pk in pks}
+        keys = {pk: _version_key(name, pk) for pk in pks}
+        found = cache.get_many(list(keys.values()))
+        return {pk: found.get(key, 0) for pk, key in keys.items()}
+
+    def get_many(self, name, pks, build):
+        """{pk: fragment}; build(pks) -> {pk: fragment} chỉ được gọi cho phần miss."""
+        if not get_setting('ENABLED'):
+            return build(pks)
+        pks = list(dict.fromkeys(pks))
+        if not pks:
+            return {}
+        versions = self._versions(name, pks)
+        now = time.monotonic()
+        result, missing = {}, []
+        with self.lock:
+            for pk in pks:
+                entry = self.entries.get((name, pk))
+                if entry is not None and entry[0] == versions[pk] and entry[2] > now:
+                    self.entries.move_to_end((name, pk))
+                    result[pk] = entry[1]
+                else:
+                    missing.append(pk)
+
+        fresh = {}
+        if missing and get_setting('SHARED'):
+            keys = {_value_key(name, pk, versions[pk]): pk for pk in missing}
+            fresh = {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+            missing = [pk for pk in missing if pk not in fresh]
+        built = build(missing) if missing else {}
+        if built and get_setting('SHARED'):
+            cache.set_many({_value_key(name, pk, versions[pk]): value for pk, value in built.items()},
+                           get_setting('TIMEOUT'))
+        fresh.update(built)
+
+        limit = get_setting('MAX_ENTRIES')
+        # SHARED: version trong Django cache được kiểm tra mỗi lần đọc, entry không cần hết hạn
+        expires = float('inf') if get_setting('SHARED') else now + get_setting('LOCAL_TIMEOUT')
+        with self.lock:
+            self.hits[name] += len(pks) - len(missing)
+            self.misses[name] += len(missing)
+            for pk, value in fresh.items():
+                self.entries[(name, pk)] = (versions[pk], value, expires)
+                self.entries.move_to_end((name, pk))
+            while len(self.entries) > limit:
+                self.entries.popitem(last=False)
+        result.update(fresh)
+        return result
+
+    def get(self, name, pk, build):
+        return self.get_many(name, [pk], lambda pks: {pk: build()}).get(pk)
+
+    def invalidate(self, name, pk):
+        with self.lock:
+            self.versions[(name, pk)] = self.versions.get((name, pk), 0) + 1
+            self.entries.pop((name, pk), None)
+        if get_setting('SHARED'):
+            try:
+                cache.incr(_version_key(name, pk))
+            except ValueError:
+                cache.set(_version_key(name, pk), 1, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+            self.hits = dict.fromkeys(FRAGMENTS, 0)
+            self.misses = dict.fromkeys(FRAGMENTS, 0)
+
+    def stats(self):
+        with self.lock:
+            stats = {}
+            for name in FRAGMENTS:
+                hits, misses = self.hits[name], self.misses[name]
+                stats[name] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                }
+            return {'entries': len(self.entries), 'fragments': stats}
+
+    def render_metrics(self):
+        stats = self.stats()
+        lines = [
+            '# HELP api_fragment_cache_requests_total Nested fragment lookups by result.',
+            '# TYPE api_fragment_cache_requests_total counter',
+        ]
+        for name, counters in stats['fragments'].items():
+            lines.append(f'api_fragment_cache_requests_total{{fragment="{name}",result="hit"}} {counters["hits"]}')
+            lines.append(f'api_fragment_cache_requests_total{{fragment="{name}",result="miss"}} {counters["misses"]}')
+        lines.append('# HELP api_fragment_cache_entries Fragments held in the in-process LRU.')
+        lines.append('# TYPE api_fragment_cache_entries gauge')
+        lines.append(f'api_fragment_cache_entries {stats["entries"]}')
+        return '\n'.join(lines) + '\n'
+
+
+fragments = FragmentCache()
+
+
+class CachedFragmentMixin:
+    """Nested serializer (ArtistMini, AlbumMini, Genre) đọc output từ fragment cache thay vì dựng lại."""
+
+    fragment = None
+
+    def to_representation(self, instance):
+        build = super().to_representation
+        return fragments.get(self.fragment, instance.pk, lambda: build(instance))
+
+
+# ======= SIGNALS: tăng version khi object đổi =======
+
+def _invalidate(name):
+    def handler(sender, instance, **kwargs):
+        pk = instance.pk
+        fragments.invalidate(name, pk)
+        # Lần nữa sau commit: request đọc giữa lúc save và commit có thể đã cache lại dữ liệu cũ
+        transaction.on_commit(lambda: fragments.invalidate(name, pk))
+    return handler
+
+
+def connect_signals():
+    for name, (model, _) in FRAGMENTS.items():
+        for signal_name, signal in (('save', post_save), ('delete', post_delete)):
+            signal.connect(_invalidate(name), sender=model, weak=False, dispatch_uid=f'fragment-{name}-{signal_name}')
@@ -0,0 +1,221 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+
+from .audio import AudioDecodeError, get_setting as audio_setting
+from .models import Song
+
+DEFAULTS = {
+    'SEGMENT_SECONDS': 6,
+    'BITRATES': (128,),      # kbps AAC; nhiều mức => master playlist để client tự chuyển bitrate
+    'DIRECTORY': 'hls',      # trong MEDIA_ROOT
+    'BASE_URL': None,        # URL công khai của DIRECTORY (vd. CDN); None: MEDIA_URL + DIRECTORY
+    'RETRY_AFTER': 2,
+    'FAILURE_TTL': 60 * 60,  # ffmpeg lỗi với file này: báo lỗi thay vì đóng gói lại, hết hạn thì thử lại
+    'GC_GRACE': 24 * 60 * 60,  # file không còn được tham chiếu vẫn giữ chừng này giây cho client đang phát dở
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_HLS', {}).get(name, DEFAULTS[name])
+
+
+def _root():
+    return os.path.join(settings.MEDIA_ROOT, get_setting('DIRECTORY'))
+
+
+def _url(name):
+    base = get_setting('BASE_URL') or settings.MEDIA_URL + get_setting('DIRECTORY') + '/'
+    return base + name
+
+
+def source_key(song):
+    """Đổi khi file gốc hoặc tham số đóng gói đổi; là tên file của master playlist đã cache."""
+    stat = os.stat(song.url.path)
+    identity = f'{song.url.name}:{stat.st_size}:{stat.st_mtime_ns}:{get_setting("SEGMENT_SECONDS")}:{get_setting("BITRATES")}'
+    return hashlib.sha1(identity.encode()).hexdigest()[:16]
+
+
+def _master_path(song_id, key):
+    return os.path.join(_root(), 'songs', str(song_id), f'{key}.m3u8')
+
+
+def _failure_path(song_id, key):
+    return os.path.join(_root(), 'songs', str(song_id), f'{key}.failed')
+
+
+def packaging_error(song):
+    """Lỗi ffmpeg của lần đóng gói gần nhất với file hiện tại (trong FAILURE_TTL), hoặc None."""
+    path = _failure_path(song.pk, source_key(song))
+    try:
+        if time.time() - os.path.getmtime(path) > get_setting('FAILURE_TTL'):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def cached_master(song):
+    """Nội dung master playlist nếu bài đã được đóng gói với file hiện tại, ngược lại None."""
+    try:
+        with open(_master_path(song.pk, source_key(song)), encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+# ======= PACKAGING =======
+
+def _store(data, extension):
+    """Ghi theo sha256 của nội dung: cùng nội dung => cùng URL, file không bao giờ bị ghi đè."""
+    digest = hashlib.sha256(data).hexdigest()
+    name = f'{digest[:2]}/{digest}.{extension}'
+    path = os.path.join(_root(), name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, data)
+    return name
+
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def segment_file(path, workdir, bitrate):
+    """ffmpeg cắt file thành segment MPEG-TS AAC; trả về đường dẫn media playlist trong workdir."""
+    playlist = os.path.join(workdir, 'index.m3u8')
+    command = [
+        audio_setting('FFMPEG'), '-v', 'error', '-i', str(path), '-vn',
+        '-c:a', 'aac', '-b:a', f'{bitrate}k',
+        '-f', 'hls', '-hls_time', str(get_setting('SEGMENT_SECONDS')), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(workdir, 'seg%05d.ts'), playlist,
+    ]
+    try:
+        subprocess.run(command, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise AudioDecodeError('ffmpeg is not installed')
+    except subprocess.CalledProcessError as exc:
+        raise AudioDecodeError(exc.stderr.decode(errors='replace').strip() or 'ffmpeg failed')
+    return playlist
+
+
+def _package_variant(path, bitrate):
+    with tempfile.TemporaryDirectory() as workdir:
+        playlist = segment_file(path, workdir, bitrate)
+        lines = []
+        with open(playlist, encoding='utf-8') as f:
+            for line in f.read().splitlines():
+                if line and not line.startswith('#'):
+                    with open(os.path.join(workdir, line), 'rb') as segment:
+                        line = _url(_store(segment.read(), 'ts'))
+                lines.append(line)
+    return _store(('\n'.join(lines) + '\n').encode(), 'm3u8')
+
+
+def package_song(song):
+    """Đóng gói HLS cho bài hát (nếu chưa có với file hiện tại); trả về nội dung master playlist.
+
+    Chạy trong job 'package_hls' (key theo bài hát) nên mỗi bài chỉ có một lần đóng gói tại một thời điểm.
+    """
+    master = cached_master(song)
+    if master is not None:
+        return master
+
+    key = source_key(song)
+    directory = os.path.dirname(_master_path(song.pk, key))
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    try:
+        for bitrate in sorted(get_setting('BITRATES')):
+            variant = _package_variant(song.url.path, bitrate)
+            lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bitrate * 1000},CODECS="mp4a.40.2"')
+            lines.append(_url(variant))
+    except AudioDecodeError as exc:
+        # Lỗi của chính file (hoặc thiếu ffmpeg): thử lại ngay cũng vậy, ghi lại để endpoint báo lỗi
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(_failure_path(song.pk, key), str(exc).encode())
+        raise
+    master = '\n'.join(lines) + '\n'
+
+    if os.path.isdir(directory):
+        # Master / lỗi của file cũ; segment cũ để collect_garbage() dọn sau GC_GRACE
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+    _write_atomic(_master_path(song.pk, key), master.encode())
+    return master
+
+
+def package_song_id(song_id):
+    song = Song.objects.filter(pk=song_id).first()
+    if song is None or not song.url:
+        return
+    try:
+        package_song(song)
+    except AudioDecodeError:
+        pass  # đã ghi file .failed; job không cần thử lại
+
+
+# ======= DỌN FILE KHÔNG CÒN DÙNG =======
+
+def _referenced(master_paths):
+    """Tên (tương đối với DIRECTORY) của mọi variant playlist và segment mà các master còn tham chiếu."""
+    prefix = _url('')
+    names, pending = set(), list(master_paths)
+    while pending:
+        with open(pending.pop(), encoding='utf-8') as f:
+            for line in f.read().splitlines():
+                if line.startswith(prefix) and line[len(prefix):] not in names:
+                    name = line[len(prefix):]
+                    names.add(name)
+                    if name.endswith('.m3u8'):
+                        pending.append(os.path.join(_root(), name))
+    return names
+
+
+def collect_garbage(now=None):
+    """Xoá master của bài đã xoá / file đã thay, rồi mọi segment và variant playlist không còn master nào
+    tham chiếu. Chỉ xoá file cũ hơn GC_GRACE: client đang phát bản cũ, job đang đóng gói không bị ảnh hưởng.
+    """
+    now = time.time() if now is None else now
+    grace = get_setting('GC_GRACE')
+    root, songs_root = _root(), os.path.join(_root(), 'songs')
+    song_dirs = os.listdir(songs_root) if os.path.isdir(songs_root) else []
+    songs = {str(song.pk): song for song in Song.objects.filter(pk__in=[d for d in song_dirs if d.isdigit()])}
+
+    masters, removed = [], 0
+    for song_dir in song_dirs:
+        song = songs.get(song_dir)
+        try:
+            current = source_key(song) if song is not None and song.url else None
+        except FileNotFoundError:
+            current = None
+        directory = os.path.join(songs_root, song_dir)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if not name.startswith(f'{current}.') and now - os.path.getmtime(path) > grace:
+                os.remove(path)
+                removed += 1
+            elif name.endswith('.m3u8'):
+                masters.append(path)
+        if not os.listdir(directory):
+            os.rmdir(directory)
+
+    referenced = _referenced(masters)
+    for shard in os.listdir(root) if os.path.isdir(root) else []:
+        directory = os.path.join(root, shard)
+        if shard == 'songs' or not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if f'{shard}/{name}' not in referenced and now - os.path.getmtime(path) > grace:
+                os.remove(path)
+                removed += 1
+    return removed
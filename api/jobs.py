@@ -0,0 +1,233 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'EAGER': False,            # True: enqueue() chạy luôn trong request (test / dev không chạy worker)
+    'THREADS': 4,              # SQLite chỉ cho một writer: nhiều thread chủ yếu có ích khi job chờ I/O
+    'POLL_INTERVAL': 1.0,
+    'LEASE': 10 * 60,          # job 'running' quá lâu (worker chết giữa chừng) được xếp lại
+    'BACKOFF_BASE': 10.0,      # giây; lần thử thứ n chờ BASE * 2^(n-1), có jitter
+    'BACKOFF_MAX': 60 * 60,
+    'KEEP_FINISHED': 7 * 24 * 60 * 60,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_JOBS', {}).get(name, DEFAULTS[name])
+
+
+# ======= REGISTRY =======
+
+TASKS = {}
+
+
+def task(name=None, priority=0, max_attempts=3):
+    """Đăng ký hàm làm task; tham số truyền bằng keyword và phải serialize được thành JSON."""
+    def register(function):
+        function.task_name = name or function.__name__
+        function.priority = priority
+        function.max_attempts = max_attempts
+        TASKS[function.task_name] = function
+        return function
+    return register
+
+
+class UnknownTask(Exception):
+    pass
+
+
+# ======= ENQUEUE =======
+
+def enqueue(task_name, key=None, priority=None, delay=0, **kwargs):
+    """Ghi job vào DB (cùng transaction với request) rồi trả về ngay.
+
+    Đã có job cùng `key` đang chờ thì trả về job đó thay vì tạo thêm, nên gọi lặp lại (mỗi lần save,
+    mỗi lượt nghe) chỉ để lại một job. Job cùng key đang chạy thì vẫn xếp thêm: nó có thể đang đọc dữ liệu cũ.
+    """
+    function = TASKS.get(task_name)
+    if function is None:
+        raise UnknownTask(task_name)
+
+    if get_setting('EAGER'):
+        job = Job(task=task_name, kwargs=kwargs, key=key, max_attempts=function.max_attempts)
+        transaction.on_commit(lambda: _run_eager(function, kwargs))
+        return job
+
+    if key is not None:
+        existing = Job.objects.filter(key=key, status=Job.QUEUED).first()
+        if existing is not None:
+            return existing
+    job = Job(
+        task=task_name, kwargs=kwargs, key=key,
+        priority=function.priority if priority is None else priority,
+        max_attempts=function.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # Request khác vừa xếp cùng key
+        return Job.objects.filter(key=key, status=Job.QUEUED).first() or job
+    return job
+
+
+def _run_eager(function, kwargs):
+    # Chạy ngay trong request: lỗi của task chỉ ghi log như ở worker, không làm hỏng response
+    try:
+        function(**kwargs)
+    except Exception:
+        logger.exception('eager task %s failed', function.task_name)
+
+
+def enqueue_on_save(model, task_name, build_kwargs, key=None, delay=0, ignore_fields=(), dispatch_uid=None):
+    """Hook: mỗi lần `model` được save thì xếp `task_name`; build_kwargs(instance) -> kwargs hoặc None để bỏ qua.
+
+    Save với update_fields chỉ gồm các field trong `ignore_fields` thì bỏ qua, không tốn query nào.
+    """
+    def handler(sender, instance, created, raw=False, update_fields=None, **kwargs):
+        if raw or (update_fields and update_fields <= set(ignore_fields)):
+            return
+        task_kwargs = build_kwargs(instance)
+        if task_kwargs is not None:
+            enqueue(task_name, key=key(instance) if key else None, delay=delay, **task_kwargs)
+    post_save.connect(handler, sender=model, weak=False, dispatch_uid=dispatch_uid or f'job-{model.__name__}-{task_name}')
+
+
+# ======= WORKER =======
+
+def _backoff(attempts):
+    delay = min(get_setting('BACKOFF_MAX'), get_setting('BACKOFF_BASE') * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def requeue_stale():
+    """Job 'running' quá LEASE giây: worker đã chết, xếp lại (vẫn tính là một lần thử)."""
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=get_setting('LEASE')))
+    # Đã có job mới cùng key đang chờ: job đó làm thay, không xếp lại bản cũ
+    stale.filter(key__in=Job.objects.filter(status=Job.QUEUED).values('key')).update(
+        status=Job.FAILED, finishedAt=now, last_error='lease expired, superseded by a queued job',
+    )
+    return stale.update(status=Job.QUEUED, locked_by='', locked_at=None, last_error='lease expired')
+
+
+def claim(worker_id, limit):
+    """Nhận tối đa `limit` job đến hạn, ưu tiên cao trước.
+
+    UPDATE có điều kiện status='queued' nên hai worker không bao giờ cùng nhận một job, kể cả trên SQLite
+    (không có SELECT ... FOR UPDATE SKIP LOCKED).
+    """
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('-priority', 'run_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in list(candidates):
+        updated = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(job_id)
+    return list(Job.objects.filter(pk__in=claimed).order_by('-priority', 'run_at', 'id'))
+
+
+def run_job(job):
+    function = TASKS.get(job.task)
+    try:
+        if function is None:
+            raise UnknownTask(job.task)
+        function(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            retry_at = timezone.now() + timedelta(seconds=_backoff(job.attempts))
+            try:
+                with transaction.atomic():
+                    Job.objects.filter(pk=job.pk).update(
+                        status=Job.QUEUED, run_at=retry_at, locked_by='', locked_at=None, last_error=error,
+                    )
+            except IntegrityError:
+                # Trong lúc chạy đã có job mới cùng key được xếp: để job đó làm lại
+                Job.objects.filter(pk=job.pk).update(status=Job.FAILED, finishedAt=timezone.now(), last_error=error)
+            logger.warning('job %s (%s) failed, attempt %s/%s', job.pk, job.task, job.attempts, job.max_attempts)
+        else:
+            Job.objects.filter(pk=job.pk).update(status=Job.FAILED, finishedAt=timezone.now(), last_error=error)
+            logger.error('job %s (%s) failed permanently', job.pk, job.task)
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.SUCCEEDED, finishedAt=timezone.now(), locked_at=None)
+    return True
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        connections.close_all()
+
+
+def purge_finished():
+    cutoff = timezone.now() - timedelta(seconds=get_setting('KEEP_FINISHED'))
+    deleted, _ = Job.objects.filter(status=Job.SUCCEEDED, finishedAt__lt=cutoff).delete()
+    return deleted
+
+
+def run_worker(threads=None, once=False, stop=None, log=None):
+    """Vòng lặp worker: giữ tối đa `threads` job chạy song song, slot nào xong thì nhận job mới ngay.
+
+    once=True: chạy hết các job đến hạn rồi dừng (cron, test).
+    """
+    log = log or (lambda message: None)
+    threads = threads or get_setting('THREADS')
+    stop = stop or threading.Event()
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    processed, failed = 0, 0
+    last_maintenance = 0.0
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        inflight = set()
+        while not stop.is_set():
+            if time.monotonic() - last_maintenance > 60:
+                close_old_connections()
+                if requeue_stale():
+                    log('requeued stale jobs')
+                purge_finished()
+                last_maintenance = time.monotonic()
+
+            jobs = claim(worker_id, threads - len(inflight)) if len(inflight) < threads else []
+            if threads == 1:
+                # Một thread: chạy ngay trên thread này, dùng chung kết nối DB
+                results = [run_job(job) for job in jobs]
+                processed, failed = processed + len(results), failed + results.count(False)
+            else:
+                inflight.update(pool.submit(_run_in_thread, job) for job in jobs)
+
+            if inflight:
+                done, inflight = wait(inflight, timeout=get_setting('POLL_INTERVAL'), return_when=FIRST_COMPLETED)
+                results = [future.result() for future in done]
+                processed, failed = processed + len(results), failed + results.count(False)
+            elif not jobs:
+                if once:
+                    break
+                stop.wait(get_setting('POLL_INTERVAL'))
+    log(f'{processed} jobs processed, {failed} failed')
+    return processed
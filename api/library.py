@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+from .models import ARTIST_ROLE_ID, User, Song, Album, SongLike, AlbumLike, ArtistFollow
+
+DEFAULTS = {
+    # True chỉ khi CACHES là backend dùng chung (Redis / Memcached): invalidation khi like mới tới được mọi process
+    'SHARED': False,
+    'TIMEOUT': 60 * 60,
+    # Cache riêng từng process (LocMem mặc định): process khác không thấy invalidation, chỉ giữ vài giây
+    'LOCAL_TIMEOUT': 5,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_LIBRARY', {}).get(name, DEFAULTS[name])
+
+# kind -> (model, field của đối tượng được like, queryset hợp lệ)
+LIBRARY = {
+    'songs': (SongLike, 'song', Song.objects.all()),
+    'albums': (AlbumLike, 'album', Album.objects.all()),
+    'artists': (ArtistFollow, 'artist', User.objects.filter(role_id=ARTIST_ROLE_ID)),
+}
+
+
+def _cache_key(kind, user_id):
+    return f'library:{kind}:{user_id}'
+
+
+def library_ids(user, kind='songs'):
+    """Tập id user đã like / follow; cache theo user, miss thì đọc một lần bằng index (user, ...)."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    key = _cache_key(kind, user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        model, field, _ = LIBRARY[kind]
+        ids = frozenset(model.objects.filter(user_id=user.pk).values_list(f'{field}_id', flat=True))
+        cache.set(key, ids, get_setting('TIMEOUT') if get_setting('SHARED') else get_setting('LOCAL_TIMEOUT'))
+    return ids
+
+
+def mark_liked(songs, user):
+    """Gắn is_liked cho các dict bài hát đã serialize: tối đa một query (khi cache miss) cho cả trang."""
+    liked = library_ids(user) if songs else frozenset()
+    for song in songs:
+        song['is_liked'] = song['id'] in liked
+    return songs
+
+
+def request_user(context):
+    request = (context or {}).get('request')
+    return getattr(request, 'user', None)
+
+
+def add(user, kind, object_id):
+    model, field, queryset = LIBRARY[kind]
+    target = queryset.get(pk=object_id)
+    _, created = model.objects.get_or_create(user=user, **{field: target})
+    return created
+
+
+def remove(user, kind, object_id):
+    model, field, _ = LIBRARY[kind]
+    model.objects.filter(user=user, **{f'{field}_id': object_id}).delete()
+
+
+# ======= SIGNALS: xoá cache id của user khi like / follow đổi =======
+
+def invalidate_user(kind, user_id):
+    cache.delete(_cache_key(kind, user_id))
+
+
+def _invalidate(kind):
+    def handler(sender, instance, **kwargs):
+        invalidate_user(kind, instance.user_id)
+    return handler
+
+
+def connect_signals():
+    for kind, (model, _, _) in LIBRARY.items():
+        for name, signal in (('save', post_save), ('delete', post_delete)):
+            signal.connect(_invalidate(kind), sender=model, weak=False, dispatch_uid=f'library-{kind}-{name}')
@@ -0,0 +1,50 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.audio import AudioDecodeError, analyze_file, save_analysis
+from api.models import Song
+from api.streaming import batched
+
+
+def _analyze(item):
+    song_id, path = item
+    try:
+        return song_id, analyze_file(path), None
+    except (AudioDecodeError, OSError) as exc:
+        return song_id, None, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'Backfill phân tích audio (waveform peaks, loudness / gain, fingerprint) cho các bài chưa có, decode song song trên nhiều core.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--all', action='store_true', help='Tính lại cả những bài đã có kết quả')
+
+    def handle(self, *args, **options):
+        songs = Song.objects.exclude(url='').exclude(url__isnull=True)
+        if not options['all']:
+            songs = songs.filter(Q(waveform__isnull=True) | Q(loudness__isnull=True) | Q(fingerprint__isnull=True))
+        items = [(pk, Song.url.field.storage.path(name)) for pk, name in songs.order_by('id').values_list('id', 'url')]
+        self.stdout.write(f'{len(items)} songs to analyze')
+
+        started = time.perf_counter()
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for batch in batched(items, options['batch_size']):
+                for song_id, result, error in pool.map(_analyze, batch):
+                    if error:
+                        failed += 1
+                        self.stderr.write(f'song {song_id}: {error}')
+                    else:
+                        save_analysis(song_id, result)
+                        done += 1
+                self.stdout.write(f'  {done + failed} / {len(items)}')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Analyzed {done} songs ({failed} failed) in {elapsed:.1f}s'))
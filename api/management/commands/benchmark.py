@@ -0,0 +1,94 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment, teardown_test_environment, setup_databases, teardown_databases
+
+from api.benchmarks import run_benchmarks, compare, login_storm
+from .seed_catalog import seed_catalog
+
+SCALES = {
+    # Các list endpoint chưa phân trang nên small phải đủ nhỏ để chạy trong vài phút
+    'small': {'artists': 20, 'listeners': 20, 'songs': 300, 'albums': 40, 'playlists': 100},
+    'medium': {'artists': 200, 'listeners': 200, 'songs': 10000, 'albums': 1000, 'playlists': 5000},
+    'large': {'artists': 1000, 'listeners': 1000, 'songs': 100000, 'albums': 10000, 'playlists': 50000},
+}
+
+
+class Command(BaseCommand):
+    help = 'Tạo DB test, seed catalog giả lập rồi đo latency / query / bộ nhớ cho từng endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--only', nargs='*', help='Chỉ chạy các case này (vd. songs-list auth-me)')
+        parser.add_argument('--output', default='bench_output.json')
+        parser.add_argument('--compare', help='File JSON của lần chạy trước để so sánh')
+        parser.add_argument('--login-storm', type=int, metavar='THREADS',
+                            help='Đo thêm p50 / p99 của /api/songs/ khi THREADS thread login liên tục, '
+                                 'với hash trên thread request (inline) và trong process pool')
+
+    def handle(self, *args, **options):
+        scale = SCALES[options['scale']]
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            seed_catalog(**scale)
+            results = run_benchmarks(repeat=options['repeat'], only=options['only'])
+            storm = None
+            if options['login_storm']:
+                storm = {
+                    'inline': login_storm(threads=options['login_storm'], workers=0),
+                    'pool': login_storm(threads=options['login_storm']),
+                }
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'scale': options['scale'],
+                'catalog': scale,
+                'repeat': options['repeat'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+        if storm:
+            report['login_storm'] = storm
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<22} {result["status"]}  p50 {result["latency_ms"]["p50"]:>9} ms  '
+                f'{result["queries"]:>5} queries  {result["peak_memory_kb"]:>9} KB'
+            )
+
+        for mode, result in (storm or {}).items():
+            self.stdout.write(
+                f'login storm ({mode:<6}) /api/songs/ p99 {result["baseline_ms"]["p99"]} -> '
+                f'{result["storm_ms"]["p99"]} ms, {result["logins_per_s"]} logins/s, '
+                f'login p99 {result["login_ms"]["p99"]} ms'
+            )
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)['results']
+            self.stdout.write('')
+            for line in compare(previous, results):
+                self.stdout.write(line)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.artist_stats import build_artist_stats
+
+
+class Command(BaseCommand):
+    help = 'Cập nhật bảng thống kê artist (chạy định kỳ, ví dụ mỗi 15 phút bằng cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--artist', type=int, action='append', dest='artists', help='Chỉ tính cho artist id này')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = build_artist_stats(artist_ids=options['artists'], log=lambda message: self.stdout.write(message))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Updated stats for {count} artists in {elapsed:.1f}s'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.feeds import build_home_feeds
+
+
+class Command(BaseCommand):
+    help = 'Tính landing page cá nhân hoá cho các user có playlist (chạy định kỳ, sau build_similar_songs).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Chỉ tính cho user id này')
+        parser.add_argument('--block-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = build_home_feeds(
+            user_ids=options['users'],
+            block_size=options['block_size'],
+            log=lambda message: self.stdout.write(message),
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Built home feeds for {count} users in {elapsed:.1f}s'))
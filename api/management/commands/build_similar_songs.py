@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.recommendations import build_similar_songs
+
+
+class Command(BaseCommand):
+    help = 'Tính bảng bài hát tương tự từ playlist co-occurrence + artist/genre chung.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20)
+        parser.add_argument('--block-size', type=int, default=1000)
+        parser.add_argument('--full', action='store_true', help='Tính lại toàn bộ thay vì chỉ các bài bị ảnh hưởng')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = build_similar_songs(
+            top_k=options['top_k'],
+            block_size=options['block_size'],
+            full=options['full'],
+            log=lambda message: self.stdout.write(message),
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Computed neighbours for {count} songs in {elapsed:.1f}s'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.hls import collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Xoá master playlist, variant playlist và segment HLS không còn được dùng (chạy định kỳ, vd. cron mỗi ngày).'
+
+    def handle(self, *args, **options):
+        removed = collect_garbage()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} unused HLS files'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.sync import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Xoá các dòng change log đã bị thay thế bởi thay đổi mới hơn của cùng object.'
+
+    def handle(self, *args, **options):
+        deleted = compact_changes()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} superseded changes'))
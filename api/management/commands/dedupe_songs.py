@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.fingerprints import duplicate_clusters, merge_songs
+from api.models import Song, Fingerprint
+
+
+class Command(BaseCommand):
+    help = 'Tìm các bài trùng bản ghi âm trên toàn catalog (theo fingerprint) và gắn cờ hoặc gộp chúng.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--merge', action='store_true',
+                            help='Gộp bản trùng vào bài gốc (cộng play_count, chuyển playlist/album) rồi xoá')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        clusters = duplicate_clusters()
+        titles = dict(Song.objects.filter(
+            id__in=[pk for original, duplicates in clusters.items() for pk in (original, *duplicates)]
+        ).values_list('id', 'title'))
+
+        for original, duplicates in clusters.items():
+            self.stdout.write(f'{original} {titles.get(original)!r} <- {duplicates}')
+            Fingerprint.objects.filter(song_id__in=duplicates).update(duplicate_of=original)
+            Fingerprint.objects.filter(song_id=original).update(duplicate_of=None)
+            if options['merge']:
+                merge_songs(original, duplicates)
+
+        total = sum(len(duplicates) for duplicates in clusters.values())
+        action = 'Merged' if options['merge'] else 'Flagged'
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{action} {total} duplicates in {len(clusters)} groups in {elapsed:.1f}s'))
@@ -0,0 +1,287 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from api import jobs
+from api.models import ARTIST_ROLE_ID, Role, User, Genre, Song, Album
+from api.streaming import batched
+from api.sync import record_changes
+
+COVER_EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp'}
+
+
+# ======= METADATA EXTRACTION (chạy trong process pool) =======
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(';') if part.strip()]
+    return [str(part).strip() for part in value if str(part).strip()]
+
+
+def _cover(path):
+    import mutagen
+    from mutagen.id3 import ID3, ID3NoHeaderError
+
+    try:
+        pictures = ID3(path).getall('APIC')
+        if pictures:
+            return pictures[0].data, pictures[0].mime
+    except (ID3NoHeaderError, mutagen.MutagenError):
+        pass
+
+    audio = mutagen.File(path)
+    for picture in getattr(audio, 'pictures', None) or []:
+        return picture.data, picture.mime
+    return None
+
+
+def extract_metadata(path):
+    """Đọc duration, tag title/artist/album/genre và ảnh bìa của một file audio."""
+    import mutagen
+
+    result = {'path': path, 'size': 0, 'error': None}
+    try:
+        result['size'] = os.path.getsize(path)
+        audio = mutagen.File(path, easy=True)
+        if audio is None:
+            raise ValueError('unsupported audio format')
+        tags = audio.tags or {}
+        result.update({
+            'duration': int(round(audio.info.length)),
+            'title': (tags.get('title') or [None])[0],
+            'artists': _as_list(tags.get('artist')),
+            'albums': _as_list(tags.get('album')),
+            'genres': _as_list(tags.get('genre')),
+            'cover': _cover(path),
+        })
+    except Exception as exc:  # lỗi của từng file không được làm dừng cả pool
+        result['error'] = f'{type(exc).__name__}: {exc}'
+    return result
+
+
+# ======= COMMAND =======
+
+class Command(BaseCommand):
+    help = 'Import hàng loạt bài hát từ thư mục audio + file metadata JSONL (có thể chạy lại để resume).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('metadata', help='JSONL, mỗi dòng: {"file": ..., "title", "artists", "albums", "genres"}')
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--progress-file', help='Mặc định: <metadata>.progress')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if not directory.is_dir():
+            raise CommandError(f'{directory} is not a directory')
+
+        progress_path = Path(options['progress_file'] or f'{options["metadata"]}.progress')
+        done = set(progress_path.read_text().split('\n')) if progress_path.exists() else set()
+        done.discard('')
+
+        entries = []
+        with open(options['metadata'], encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise CommandError(f'{options["metadata"]}:{number}: {exc}')
+                if 'file' not in entry:
+                    raise CommandError(f'{options["metadata"]}:{number}: missing "file"')
+                if entry['file'] not in done:
+                    entries.append(entry)
+
+        if done:
+            self.stdout.write(f'Resuming: {len(done)} already imported, {len(entries)} left')
+
+        importer = CatalogImporter()
+        stats = {'songs': 0, 'failed': 0, 'bytes': 0, 'extract': 0.0, 'write': 0.0}
+        started = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool, \
+                open(progress_path, 'a', encoding='utf-8') as progress:
+            for batch in batched(entries, options['batch_size']):
+                t0 = time.perf_counter()
+                paths = [str(directory / entry['file']) for entry in batch]
+                extracted = list(pool.map(extract_metadata, paths, chunksize=8))
+                t1 = time.perf_counter()
+
+                ok = []
+                for entry, meta in zip(batch, extracted):
+                    if meta['error']:
+                        stats['failed'] += 1
+                        self.stderr.write(f'{entry["file"]}: {meta["error"]}')
+                    else:
+                        ok.append((entry, meta))
+                        stats['bytes'] += meta['size']
+
+                song_ids = importer.import_batch(ok)
+                # bulk_create không bắn signal: tự xếp phân tích audio (waveform, loudness, fingerprint) sau commit
+                for song_id in song_ids:
+                    jobs.enqueue('analyze_song', key=f'analyze_song:{song_id}', song_id=song_id)
+                t2 = time.perf_counter()
+
+                # Chỉ ghi progress sau khi transaction của batch đã commit
+                progress.write(''.join(f'{entry["file"]}\n' for entry, _ in ok))
+                progress.flush()
+
+                stats['songs'] += len(ok)
+                stats['extract'] += t1 - t0
+                stats['write'] += t2 - t1
+                self.stdout.write(f'  +{len(ok)} songs ({len(ok) / max(t2 - t0, 1e-9):.0f} songs/s)')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["songs"]} songs ({stats["failed"]} failed) in {elapsed:.1f}s: '
+            f'{stats["songs"] / max(elapsed, 1e-9):.1f} songs/s, '
+            f'{stats["bytes"] / 1048576 / max(elapsed, 1e-9):.1f} MB/s, '
+            f'extract {stats["extract"]:.1f}s, write {stats["write"]:.1f}s'
+        ))
+
+
+class CatalogImporter:
+    """Giữ map tên -> id trong bộ nhớ để không phải query Genre/Album/User cho từng bài."""
+
+    def __init__(self):
+        self.artist_role, _ = Role.objects.get_or_create(id=ARTIST_ROLE_ID, defaults={'name': 'artist'})
+        self.genres = {name.lower(): pk for pk, name in Genre.objects.values_list('id', 'name')}
+        self.artists = {}
+        for pk, username, fullname in User.objects.filter(role=self.artist_role).values_list('id', 'username', 'fullname'):
+            self.artists.setdefault((fullname or username).lower(), pk)
+        self.usernames = set(User.objects.values_list('username', flat=True))
+        self.albums = {
+            (title.lower(), creator_id): pk for pk, title, creator_id in Album.objects.values_list('id', 'title', 'creator_id')
+        }
+
+    def import_batch(self, items):
+        """Import một lô trong một transaction; trả về id các bài đã tạo.
+
+        File audio / ảnh bìa được ghi vào storage trong transaction: lô bị rollback thì xoá lại.
+        """
+        stored = []
+        try:
+            with transaction.atomic():
+                return self._import_batch(items, stored)
+        except BaseException:
+            for name in stored:
+                default_storage.delete(name)
+            raise
+
+    def _import_batch(self, items, stored):
+        records = []
+        for entry, meta in items:
+            artists = _as_list(entry.get('artists')) or meta['artists'] or ['Unknown Artist']
+            records.append({
+                'entry': entry,
+                'meta': meta,
+                'title': entry.get('title') or meta['title'] or Path(entry['file']).stem,
+                'duration': int(entry.get('duration') or meta['duration']),
+                'artists': artists,
+                'albums': _as_list(entry.get('albums')) or meta['albums'],
+                'genres': _as_list(entry.get('genres')) or meta['genres'],
+            })
+
+        self._ensure_genres({name for record in records for name in record['genres']})
+        self._ensure_artists({name for record in records for name in record['artists']})
+        self._ensure_albums({
+            (title, self.artists[record['artists'][0].lower()])
+            for record in records for title in record['albums']
+        })
+
+        songs = []
+        for record in records:
+            source = record['meta']['path']
+            with open(source, 'rb') as f:
+                url = default_storage.save(f'songs/{Path(source).name}', File(f))
+            stored.append(url)
+            thumbnail = None
+            if record['meta']['cover']:
+                data, mime = record['meta']['cover']
+                name = f'thumbnails/{Path(source).stem}{COVER_EXTENSIONS.get(mime, ".jpg")}'
+                thumbnail = default_storage.save(name, ContentFile(data))
+                stored.append(thumbnail)
+            songs.append(Song(title=record['title'], duration=record['duration'], url=url, thumbnail=thumbnail))
+
+        Song.objects.bulk_create(songs)
+        if any(song.pk is None for song in songs):
+            # Backend không trả pk sau bulk insert (MySQL): lấy lại theo tên file vừa lưu
+            ids = dict(Song.objects.filter(url__in=[song.url.name for song in songs]).values_list('url', 'id'))
+            for song in songs:
+                song.pk = song.id = ids[song.url.name]
+
+        genre_links, album_links, artist_links = [], [], []
+        for song, record in zip(songs, records):
+            creator_id = self.artists[record['artists'][0].lower()]
+            for genre_id in {self.genres[name.lower()] for name in record['genres']}:
+                genre_links.append(Song.genre.through(song_id=song.pk, genre_id=genre_id))
+            for album_id in {self.albums[(title.lower(), creator_id)] for title in record['albums']}:
+                album_links.append(Song.albums.through(song_id=song.pk, album_id=album_id))
+            for user_id in {self.artists[name.lower()] for name in record['artists']}:
+                artist_links.append(Song.artists.through(song_id=song.pk, user_id=user_id))
+        Song.genre.through.objects.bulk_create(genre_links)
+        Song.albums.through.objects.bulk_create(album_links)
+        Song.artists.through.objects.bulk_create(artist_links)
+        # bulk_create không bắn signal nên tự ghi change log cho /api/sync/
+        record_changes('songs', [song.pk for song in songs])
+        return [song.pk for song in songs]
+
+    def _ensure_genres(self, names):
+        missing = {name.lower(): name for name in names if name.lower() not in self.genres}
+        if missing:
+            Genre.objects.bulk_create([Genre(name=name) for name in missing.values()])
+            created = list(Genre.objects.filter(name__in=missing.values()).values_list('id', 'name'))
+            for pk, name in created:
+                self.genres.setdefault(name.lower(), pk)
+            record_changes('genres', [pk for pk, _ in created])
+
+    def _ensure_artists(self, names):
+        missing = {name.lower(): name for name in names if name.lower() not in self.artists}
+        if not missing:
+            return
+        fullnames = {self._unique_username(name): name for name in missing.values()}
+        User.objects.bulk_create([
+            User(username=username, fullname=name, password=make_password(None), role=self.artist_role)
+            for username, name in fullnames.items()
+        ])
+        created = list(User.objects.filter(username__in=fullnames).values_list('id', 'username'))
+        for pk, username in created:
+            self.artists[fullnames[username].lower()] = pk
+        record_changes('artists', [pk for pk, _ in created])
+
+    def _ensure_albums(self, keys):
+        missing = {(title.lower(), creator_id): title for title, creator_id in keys
+                   if (title.lower(), creator_id) not in self.albums}
+        if missing:
+            created = Album.objects.bulk_create([
+                Album(title=title, creator_id=creator_id) for (_, creator_id), title in missing.items()
+            ])
+            if any(album.pk is None for album in created):
+                creators = {creator_id for _, creator_id in missing}
+                created = Album.objects.filter(creator_id__in=creators)
+            for album in created:
+                self.albums.setdefault((album.title.lower(), album.creator_id), album.pk)
+            record_changes('albums', [self.albums[key] for key in missing])
+
+    def _unique_username(self, name):
+        base = slugify(name)[:90] or 'artist'
+        username, n = base, 1
+        while username in self.usernames:
+            n += 1
+            username = f'{base}-{n}'
+        self.usernames.add(username)
+        return username
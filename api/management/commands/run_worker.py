@@ -0,0 +1,47 @@
+import signal
+import subprocess
+import sys
+import threading
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import get_setting, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Chạy job nền từ bảng api_job (analyze audio, thống kê artist, ...) cho tới khi bị dừng.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None, help='Số job chạy song song trong mỗi process')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Chạy thêm process worker (job tốn CPU như decode audio)')
+        parser.add_argument('--once', action='store_true', help='Chạy hết job đến hạn rồi thoát')
+
+    def handle(self, *args, **options):
+        threads = options['threads'] or get_setting('THREADS')
+        if options['processes'] > 1:
+            return self.supervise(options['processes'], threads, options['once'])
+
+        stop = threading.Event()
+        if not options['once']:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                # Dừng nhận job mới, chờ các job đang chạy xong
+                signal.signal(sig, lambda *_: stop.set())
+        self.stdout.write(f'Worker started with {threads} threads')
+        processed = run_worker(threads=threads, once=options['once'], stop=stop,
+                               log=lambda message: self.stdout.write(message))
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped after {processed} jobs'))
+
+    def supervise(self, processes, threads, once):
+        command = [sys.executable, sys.argv[0], 'run_worker', '--threads', str(threads)] + (['--once'] if once else [])
+        children = [subprocess.Popen(command) for _ in range(processes)]
+
+        def forward(sig, frame):
+            for child in children:
+                child.send_signal(sig)
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, forward)
+        codes = [child.wait() for child in children]
+        if any(codes):
+            sys.exit(max(codes))
@@ -0,0 +1,184 @@
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import ARTIST_ROLE_ID, Role, User, Genre, Song, Album, Playlist
+
+GENRES = [
+    'Pop', 'Rock', 'Hip Hop', 'R&B', 'Jazz', 'Classical', 'Electronic', 'Indie',
+    'Folk', 'Country', 'Blues', 'Metal', 'Lo-fi', 'K-Pop', 'V-Pop', 'Soul',
+    'Reggae', 'Latin', 'Punk', 'Ambient',
+]
+WORDS = [
+    'love', 'night', 'city', 'rain', 'summer', 'dream', 'fire', 'blue', 'heart',
+    'road', 'light', 'home', 'star', 'ocean', 'echo', 'gold', 'wild', 'slow',
+    'paper', 'moon', 'neon', 'river', 'ghost', 'sky', 'time', 'young',
+]
+SEED_PASSWORD = 'password'
+
+
+def _title(rng, words=2):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).title()
+
+
+class Command(BaseCommand):
+    help = 'Sinh catalog giả lập (artist, song, album, playlist) bằng bulk_create để benchmark.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--artists', type=int, default=1000)
+        parser.add_argument('--listeners', type=int, default=1000)
+        parser.add_argument('--songs', type=int, default=100000)
+        parser.add_argument('--albums', type=int, default=10000)
+        parser.add_argument('--playlists', type=int, default=50000)
+        parser.add_argument('--genres', type=int, default=len(GENRES))
+        parser.add_argument('--songs-per-playlist', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = seed_catalog(
+            artists=options['artists'],
+            listeners=options['listeners'],
+            songs=options['songs'],
+            albums=options['albums'],
+            playlists=options['playlists'],
+            genres=options['genres'],
+            songs_per_playlist=options['songs_per_playlist'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=lambda message: self.stdout.write(message),
+        )
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary} in {elapsed:.1f}s'))
+
+
+@transaction.atomic
+def seed_catalog(artists, listeners, songs, albums, playlists, genres=len(GENRES),
+                 songs_per_playlist=20, batch_size=5000, seed=42, log=None):
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+
+    artist_role, _ = Role.objects.get_or_create(id=ARTIST_ROLE_ID, defaults={'name': 'artist'})
+    listener_role, _ = Role.objects.get_or_create(name='user')
+
+    # Hash một lần rồi dùng lại, tránh chạy PBKDF2 cho từng user
+    password = make_password(SEED_PASSWORD)
+    offset = User.objects.count()
+
+    log('Users...')
+    User.objects.bulk_create(
+        [
+            User(username=f'artist{offset + i}', fullname=_title(rng), password=password, role=artist_role)
+            for i in range(artists)
+        ] + [
+            User(username=f'user{offset + i}', fullname=_title(rng), password=password, role=listener_role)
+            for i in range(listeners)
+        ],
+        batch_size=batch_size,
+    )
+    artist_ids = list(
+        User.objects.filter(role=artist_role).order_by('-id').values_list('id', flat=True)[:artists]
+    )
+    listener_ids = list(
+        User.objects.filter(role=listener_role).order_by('-id').values_list('id', flat=True)[:listeners]
+    )
+
+    log('Genres...')
+    names = [GENRES[i % len(GENRES)] if i < len(GENRES) else f'{GENRES[i % len(GENRES)]} {i}' for i in range(genres)]
+    existing = set(Genre.objects.filter(name__in=names).values_list('name', flat=True))
+    Genre.objects.bulk_create([Genre(name=name) for name in names if name not in existing])
+    genre_ids = list(Genre.objects.filter(name__in=names).values_list('id', flat=True))
+
+    log('Albums...')
+    album_start = _next_id(Album)
+    Album.objects.bulk_create(
+        [
+            Album(title=_title(rng, 3), poster=f'posters/synthetic-{i}.jpg', creator_id=rng.choice(artist_ids))
+            for i in range(albums)
+        ],
+        batch_size=batch_size,
+    )
+    album_ids = list(Album.objects.filter(id__gte=album_start).values_list('id', 'creator_id'))
+
+    log('Songs...')
+    song_start = _next_id(Song)
+    Song.objects.bulk_create(
+        [
+            Song(
+                title=_title(rng, rng.randint(1, 4)),
+                duration=rng.randint(90, 420),
+                url=f'songs/synthetic-{i}.mp3',
+                thumbnail=f'thumbnails/synthetic-{i}.jpg',
+                play_count=int(rng.paretovariate(1.2)) * 10,
+            )
+            for i in range(songs)
+        ],
+        batch_size=batch_size,
+    )
+    song_rows = list(Song.objects.filter(id__gte=song_start).order_by('id').values_list('id', 'play_count'))
+    song_ids = [song_id for song_id, _ in song_rows]
+
+    log('Song links...')
+    genre_links, album_links, artist_links = [], [], []
+    for song_id in song_ids:
+        for genre_id in rng.sample(genre_ids, min(len(genre_ids), rng.randint(1, 2))):
+            genre_links.append(Song.genre.through(song_id=song_id, genre_id=genre_id))
+        if album_ids:
+            album_id, creator_id = rng.choice(album_ids)
+            album_links.append(Song.albums.through(song_id=song_id, album_id=album_id))
+            artist_links.append(Song.artists.through(song_id=song_id, user_id=creator_id))
+            # Thỉnh thoảng có feat.
+            if rng.random() < 0.15:
+                featured = rng.choice(artist_ids)
+                if featured != creator_id:
+                    artist_links.append(Song.artists.through(song_id=song_id, user_id=featured))
+        elif artist_ids:
+            artist_links.append(Song.artists.through(song_id=song_id, user_id=rng.choice(artist_ids)))
+    Song.genre.through.objects.bulk_create(genre_links, batch_size=batch_size)
+    Song.albums.through.objects.bulk_create(album_links, batch_size=batch_size)
+    Song.artists.through.objects.bulk_create(artist_links, batch_size=batch_size)
+
+    log('Playlists...')
+    playlist_start = _next_id(Playlist)
+    owners = listener_ids or artist_ids
+    Playlist.objects.bulk_create(
+        [Playlist(name=_title(rng), user_id=rng.choice(owners)) for _ in range(playlists)],
+        batch_size=batch_size,
+    )
+    playlist_ids = list(Playlist.objects.filter(id__gte=playlist_start).values_list('id', flat=True))
+
+    # Chọn bài theo play_count để playlist nghiêng về bài hot như thực tế
+    cum_weights = list(accumulate(play_count + 1 for _, play_count in song_rows))
+    memberships = 0
+    links = []
+    for playlist_id in playlist_ids:
+        size = min(len(song_ids), rng.randint(1, songs_per_playlist * 2))
+        for song_id in set(rng.choices(song_ids, cum_weights=cum_weights, k=size)):
+            links.append(Playlist.songs.through(playlist_id=playlist_id, song_id=song_id))
+        if len(links) >= batch_size:
+            Playlist.songs.through.objects.bulk_create(links, batch_size=batch_size)
+            memberships += len(links)
+            links = []
+    Playlist.songs.through.objects.bulk_create(links, batch_size=batch_size)
+    memberships += len(links)
+
+    return {
+        'artists': len(artist_ids),
+        'listeners': len(listener_ids),
+        'genres': len(genre_ids),
+        'albums': len(album_ids),
+        'songs': len(song_ids),
+        'playlists': playlists,
+        'playlist songs': memberships,
+    }
+
+
+def _next_id(model):
+    last = model.objects.order_by('-id').values_list('id', flat=True).first()
+    return (last or 0) + 1
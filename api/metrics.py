@@ -0,0 +1,264 @@
+import hmac
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0,          # 0.0 - 1.0, phần request được đo
+    'SERVER_TIMING': True,
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    'QUERY_BUCKETS': (0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+    'SIZE_BUCKETS': (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    'TOKEN': None,                         # scraper gửi "Authorization: Bearer <TOKEN>"
+    # /metrics không cần token từ các địa chỉ này. Chỉ đặt khi không có reverse proxy phía trước:
+    # sau proxy cục bộ mọi request đều đến từ 127.0.0.1
+    'ALLOWED_IPS': (),
+}
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def get_setting(name):
+    return getattr(settings, 'API_METRICS', {}).get(name, DEFAULTS[name])
+
+
+# ======= PER-REQUEST STATS =======
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'sql_time', 'serialize_time', 'serialize_depth')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.serialize_depth = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+_current = ContextVar('api_request_stats', default=None)
+
+
+def current_stats():
+    return _current.get()
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_time += time.perf_counter() - start
+
+
+class TimedRepresentationMixin:
+    """Cộng thời gian to_representation của serializer ngoài cùng vào request hiện tại."""
+
+    def to_representation(self, instance):
+        stats = _current.get()
+        if stats is None or stats.serialize_depth:
+            return super().to_representation(instance)
+
+        stats.serialize_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serialize_depth -= 1
+            stats.serialize_time += time.perf_counter() - start
+
+
+# ======= HISTOGRAMS =======
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # ô cuối là +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            yield bound, running
+
+    def quantile(self, q):
+        """Ước lượng quantile bằng nội suy tuyến tính trong bucket chứa nó."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        lower = 0.0
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1] if self.buckets else 0.0
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            if i < len(self.buckets):
+                lower = self.buckets[i]
+        return lower
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram(get_setting('LATENCY_BUCKETS'))
+        self.sql_time = Histogram(get_setting('LATENCY_BUCKETS'))
+        self.serialize_time = Histogram(get_setting('LATENCY_BUCKETS'))
+        self.queries = Histogram(get_setting('QUERY_BUCKETS'))
+        self.response_bytes = Histogram(get_setting('SIZE_BUCKETS'))
+        self.statuses = {}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, route, status_code, stats, elapsed, size):
+        with self._lock:
+            metrics = self.routes.get(route)
+            if metrics is None:
+                metrics = self.routes[route] = RouteMetrics()
+            metrics.latency.observe(elapsed)
+            metrics.sql_time.observe(stats.sql_time)
+            metrics.serialize_time.observe(stats.serialize_time)
+            metrics.queries.observe(stats.queries)
+            if size is not None:
+                metrics.response_bytes.observe(size)
+            metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.routes = {}
+
+    def render(self):
+        with self._lock:
+            routes = sorted(self.routes.items())
+            lines = []
+            for name, attr, help_text in _HISTOGRAMS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for route, metrics in routes:
+                    hist = getattr(metrics, attr)
+                    label = _escape(route)
+                    for bound, running in hist.cumulative():
+                        le = '+Inf' if bound == float('inf') else _format(bound)
+                        lines.append(f'{name}_bucket{{route="{label}",le="{le}"}} {running}')
+                    lines.append(f'{name}_sum{{route="{label}"}} {_format(hist.total)}')
+                    lines.append(f'{name}_count{{route="{label}"}} {hist.count}')
+
+            lines.append('# HELP api_request_duration_quantile_seconds Estimated request latency quantiles.')
+            lines.append('# TYPE api_request_duration_quantile_seconds gauge')
+            for route, metrics in routes:
+                label = _escape(route)
+                for q in QUANTILES:
+                    value = _format(metrics.latency.quantile(q))
+                    lines.append(f'api_request_duration_quantile_seconds{{route="{label}",quantile="{q}"}} {value}')
+
+            lines.append('# HELP api_responses_total Responses by route and status code.')
+            lines.append('# TYPE api_responses_total counter')
+            for route, metrics in routes:
+                label = _escape(route)
+                for code, count in sorted(metrics.statuses.items()):
+                    lines.append(f'api_responses_total{{route="{label}",status="{code}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+_HISTOGRAMS = (
+    ('api_request_duration_seconds', 'latency', 'Request latency.'),
+    ('api_request_sql_seconds', 'sql_time', 'Total SQL time per request.'),
+    ('api_request_serialize_seconds', 'serialize_time', 'DRF serializer time per request.'),
+    ('api_request_queries', 'queries', 'SQL queries per request.'),
+    ('api_response_bytes', 'response_bytes', 'Response body size.'),
+)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(value):
+    return repr(float(value))
+
+
+registry = Registry()
+
+
+def can_scrape(request):
+    """/metrics lộ route, số query, lưu lượng: chỉ cho scraper có token, staff đã đăng nhập admin, hoặc
+    địa chỉ trong ALLOWED_IPS (nếu được cấu hình).
+    """
+    if request.META.get('REMOTE_ADDR') in get_setting('ALLOWED_IPS'):
+        return True
+    token = get_setting('TOKEN')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+# ======= MIDDLEWARE =======
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_setting('ENABLED'):
+            return self.get_response(request)
+        rate = get_setting('SAMPLE_RATE')
+        if rate < 1.0 and random.random() >= rate:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        elapsed = stats.elapsed()
+        size = None if response.streaming else len(response.content)
+        registry.observe(route_name(request), response.status_code, stats, elapsed, size)
+
+        if get_setting('SERVER_TIMING'):
+            response['Server-Timing'] = server_timing(stats, elapsed)
+        return response
+
+
+def server_timing(stats, elapsed):
+    return ', '.join([
+        f'db;dur={stats.sql_time * 1000:.2f};desc="{stats.queries} queries"',
+        f'serialize;dur={stats.serialize_time * 1000:.2f}',
+        f'total;dur={elapsed * 1000:.2f}',
+    ])
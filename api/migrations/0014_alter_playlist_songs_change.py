@@ -0,0 +1,36 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_song_play_count"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="playlist",
+            name="songs",
+            field=models.ManyToManyField(blank=True, null=True, to="api.song"),
+        ),
+        migrations.CreateModel(
+            name="Change",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("model", models.CharField(max_length=20)),
+                ("object_id", models.IntegerField()),
+                ("deleted", models.BooleanField(default=False)),
+                ("createAt", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["model", "object_id"],
+                        name="api_change_model_3723f2_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_alter_playlist_songs_change"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarSongs",
+            fields=[
+                (
+                    "song",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="similar",
+                        serialize=False,
+                        to="api.song",
+                    ),
+                ),
+                ("song_ids", models.JSONField(default=list)),
+                ("scores", models.JSONField(default=list)),
+                ("cursor", models.BigIntegerField(default=0)),
+                ("computedAt", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_similarsongs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HomeFeed",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="home_feed",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("payload", models.JSONField(default=dict)),
+                ("computedAt", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
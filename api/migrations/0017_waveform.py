@@ -0,0 +1,32 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_homefeed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Waveform",
+            fields=[
+                (
+                    "song",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="waveform",
+                        serialize=False,
+                        to="api.song",
+                    ),
+                ),
+                ("peaks", models.BinaryField()),
+                ("points", models.PositiveIntegerField()),
+                ("computedAt", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_waveform"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="song",
+            name="gain",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="loudness",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="peak",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
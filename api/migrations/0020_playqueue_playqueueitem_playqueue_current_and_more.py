@@ -0,0 +1,87 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_fingerprint_fingerprintbucket"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayQueue",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="play_queue",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("playlist", "Playlist"),
+                            ("album", "Album"),
+                            ("artist", "Artist"),
+                            ("radio", "Radio"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("source_id", models.IntegerField()),
+                ("shuffle", models.BooleanField(default=False)),
+                ("seed", models.BigIntegerField(default=0)),
+                ("updatedAt", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PlayQueueItem",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("rank", models.FloatField()),
+                ("base_rank", models.FloatField()),
+                (
+                    "queue",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="api.playqueue",
+                    ),
+                ),
+                (
+                    "song",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="api.song",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="playqueue",
+            name="current",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="api.playqueueitem",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playqueueitem",
+            index=models.Index(
+                fields=["queue", "rank"], name="api_playque_queue_i_f2910f_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_playqueue_playqueueitem_playqueue_current_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArtistFollow",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("createAt", models.DateTimeField(auto_now_add=True)),
+                (
+                    "artist",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="followers",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="follows",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="AlbumLike",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("createAt", models.DateTimeField(auto_now_add=True)),
+                (
+                    "album",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="likes",
+                        to="api.album",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="album_likes",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SongLike",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("createAt", models.DateTimeField(auto_now_add=True)),
+                (
+                    "song",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="likes",
+                        to="api.song",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="song_likes",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-createAt"],
+                        name="api_songlik_user_id_d82f50_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="songlike",
+            constraint=models.UniqueConstraint(
+                fields=("user", "song"), name="unique_song_like"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="artistfollow",
+            index=models.Index(
+                fields=["user", "-createAt"], name="api_artistf_user_id_20306f_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="artistfollow",
+            constraint=models.UniqueConstraint(
+                fields=("user", "artist"), name="unique_artist_follow"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="albumlike",
+            index=models.Index(
+                fields=["user", "-createAt"], name="api_albumli_user_id_59a701_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="albumlike",
+            constraint=models.UniqueConstraint(
+                fields=("user", "album"), name="unique_album_like"
+            ),
+        ),
+    ]
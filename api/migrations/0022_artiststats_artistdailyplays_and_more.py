@@ -0,0 +1,58 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0021_artistfollow_albumlike_songlike_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArtistStats",
+            fields=[
+                (
+                    "artist",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("total_plays", models.BigIntegerField(default=0)),
+                ("song_count", models.PositiveIntegerField(default=0)),
+                ("album_count", models.PositiveIntegerField(default=0)),
+                ("follower_count", models.PositiveIntegerField(default=0)),
+                ("top_songs", models.JSONField(default=list)),
+                ("computedAt", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArtistDailyPlays",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("date", models.DateField()),
+                ("plays", models.BigIntegerField(default=0)),
+                (
+                    "artist",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_plays",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="artistdailyplays",
+            constraint=models.UniqueConstraint(
+                fields=("artist", "date"), name="unique_artist_daily_plays"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0023_job_job_unique_pending_job_key"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="album",
+            name="title",
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="genre",
+            name="name",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="playlist",
+            name="name",
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="song",
+            name="title",
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="fullname",
+            field=models.CharField(db_index=True, max_length=100, null=True),
+        ),
+    ]
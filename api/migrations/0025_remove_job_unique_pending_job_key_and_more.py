@@ -0,0 +1,25 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0024_alter_album_title_alter_genre_name_and_more"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="job",
+            name="unique_pending_job_key",
+        ),
+        migrations.AddConstraint(
+            model_name="job",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "queued")),
+                fields=("key",),
+                name="unique_queued_job_key",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:23
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0025_remove_job_unique_pending_job_key_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="album",
+            index=models.Index(
+                django.db.models.functions.text.Lower("title"), name="album_title_lower"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playlist",
+            index=models.Index(
+                django.db.models.functions.text.Lower("name"),
+                name="playlist_name_lower",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(
+                django.db.models.functions.text.Lower("title"), name="song_title_lower"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                django.db.models.functions.text.Lower("username"),
+                name="user_username_lower",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                django.db.models.functions.text.Lower("fullname"),
+                name="user_fullname_lower",
+            ),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.contrib.auth.base_user import BaseUserManager, AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+ARTIST_ROLE_ID = 1  # ArtistViewSet lọc theo role__id=1
 
 
 class CustomUserManager(BaseUserManager):
@@ -40,7 +44,7 @@ class Role(models.Model):
 class User(AbstractBaseUser, PermissionsMixin):
     id = models.AutoField(primary_key=True)
     username = models.CharField(max_length=100, unique=True)
-    fullname = models.CharField(max_length=100, null=True)
+    fullname = models.CharField(max_length=100, null=True, db_index=True)
     email = models.CharField(max_length=100, null=True)
     password = models.CharField(max_length=100)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
@@ -56,20 +60,27 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email']
 
+    class Meta:
+        # Admin tìm theo tiền tố không phân biệt hoa thường (xem admin.prefix_filter)
+        indexes = [
+            models.Index(Lower('username'), name='user_username_lower'),
+            models.Index(Lower('fullname'), name='user_fullname_lower'),
+        ]
+
     def __str__(self):
         return f"{self.role.name} - {self.username} - {self.fullname}"
 
 
 class Genre(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
 
     def __str__(self):
         return self.name
 
 class Song(models.Model):
     id = models.AutoField(primary_key=True)
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=255, db_index=True)
     duration = models.IntegerField()
     genre = models.ManyToManyField(Genre,blank=True)
     url = models.FileField(upload_to='songs/', blank=True, null=True)
@@ -77,27 +88,228 @@ class Song(models.Model):
     albums = models.ManyToManyField('Album', related_name='songs')
     artists = models.ManyToManyField(User, related_name='songs')
     play_count = models.PositiveIntegerField(default=0)  
+    # Chuẩn hoá âm lượng (BS.1770), tính khi ingest: client chỉ cần áp gain (dB) khi phát
+    loudness = models.FloatField(null=True, blank=True, editable=False)  # LUFS
+    peak = models.FloatField(null=True, blank=True, editable=False)  # dBFS
+    gain = models.FloatField(null=True, blank=True, editable=False)  # dB
+
+    class Meta:
+        indexes = [models.Index(Lower('title'), name='song_title_lower')]
 
     def __str__(self):
         return self.title
 
 class Album(models.Model):
     id = models.AutoField(primary_key=True)
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=255, db_index=True)
     releaseDate = models.DateField(auto_now_add=True)
     poster = models.ImageField(upload_to='posters/', null=True, blank=True)  # ✅ ảnh poster
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [models.Index(Lower('title'), name='album_title_lower')]
+
     def __str__(self):
         return self.title
 
 class Playlist(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     createAt = models.DateField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     poster = models.ImageField(upload_to='posters/', null=True, blank=True)  # ✅ ảnh poster
     songs = models.ManyToManyField(Song, null=True, blank=True)
 
+    class Meta:
+        indexes = [models.Index(Lower('name'), name='playlist_name_lower')]
+
     def __str__(self):
         return self.name
+
+
+class Change(models.Model):
+    """Change log cho /api/sync/: id tăng dần chính là cursor / version của dòng."""
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+    createAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['model', 'object_id'])]
+
+    def __str__(self):
+        return f"{self.model}:{self.object_id} {'deleted' if self.deleted else 'upsert'}"
+
+
+class SimilarSongs(models.Model):
+    """Top-K bài tương tự, tính offline bởi `manage.py build_similar_songs`."""
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, primary_key=True, related_name='similar')
+    song_ids = models.JSONField(default=list)
+    scores = models.JSONField(default=list)
+    cursor = models.BigIntegerField(default=0)  # Change.id đã tính tới
+    computedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.song_id} -> {self.song_ids[:5]}"
+
+
+class HomeFeed(models.Model):
+    """Landing page cá nhân hoá, tính sẵn bởi `manage.py build_home_feeds`; payload trả thẳng cho client."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='home_feed')
+    payload = models.JSONField(default=dict)
+    computedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.computedAt}"
+
+
+class Waveform(models.Model):
+    """Peaks (min, max) int8 xen kẽ để vẽ thanh scrubber; tính một lần khi ingest / `manage.py analyze_audio`."""
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, primary_key=True, related_name='waveform')
+    peaks = models.BinaryField()
+    points = models.PositiveIntegerField()
+    computedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.song_id} ({self.points} points)"
+
+
+class Fingerprint(models.Model):
+    """Fingerprint phổ (float16) để phát hiện bản upload trùng; duplicate_of trỏ về bài gốc nếu bị gắn cờ."""
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    vector = models.BinaryField()
+    duplicate_of = models.ForeignKey(Song, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    computedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.song_id}" + (f" (duplicate of {self.duplicate_of_id})" if self.duplicate_of_id else "")
+
+
+class FingerprintBucket(models.Model):
+    """Bảng LSH: mỗi fingerprint có một dòng / band, tra cứu bằng index (band, key)."""
+    fingerprint = models.ForeignKey(Fingerprint, on_delete=models.CASCADE, related_name='buckets')
+    band = models.PositiveSmallIntegerField()
+    key = models.IntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['band', 'key'])]
+
+
+class PlayQueue(models.Model):
+    """Hàng đợi phát của user (/api/me/queue/); thứ tự nằm ở PlayQueueItem.rank."""
+    SOURCES = [('playlist', 'Playlist'), ('album', 'Album'), ('artist', 'Artist'), ('radio', 'Radio')]
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='play_queue')
+    source = models.CharField(max_length=20, choices=SOURCES)
+    source_id = models.IntegerField()
+    shuffle = models.BooleanField(default=False)
+    seed = models.BigIntegerField(default=0)
+    current = models.ForeignKey('PlayQueueItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.source} {self.source_id}"
+
+
+class PlayQueueItem(models.Model):
+    """rank: thứ tự phát hiện tại (đã shuffle nếu bật); base_rank: thứ tự gốc để tắt shuffle."""
+    id = models.BigAutoField(primary_key=True)
+    queue = models.ForeignKey(PlayQueue, on_delete=models.CASCADE, related_name='items')
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='+')
+    rank = models.FloatField()
+    base_rank = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=['queue', 'rank'])]
+
+
+# ======= THƯ VIỆN CỦA USER (like / follow) =======
+
+class SongLike(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='song_likes')
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='likes')
+    createAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'song'], name='unique_song_like')]
+        indexes = [models.Index(fields=['user', '-createAt'])]
+
+
+class AlbumLike(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='album_likes')
+    album = models.ForeignKey(Album, on_delete=models.CASCADE, related_name='likes')
+    createAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'album'], name='unique_album_like')]
+        indexes = [models.Index(fields=['user', '-createAt'])]
+
+
+class ArtistFollow(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follows')
+    artist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers')
+    createAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'artist'], name='unique_artist_follow')]
+        indexes = [models.Index(fields=['user', '-createAt'])]
+
+
+class ArtistStats(models.Model):
+    """Thống kê artist tính sẵn bởi `manage.py build_artist_stats`."""
+    artist = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_plays = models.BigIntegerField(default=0)
+    song_count = models.PositiveIntegerField(default=0)
+    album_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    top_songs = models.JSONField(default=list)  # [song_id, ...] theo play_count giảm dần
+    computedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.artist_id}: {self.total_plays} plays"
+
+
+class ArtistDailyPlays(models.Model):
+    """Lượt nghe tăng thêm trong ngày (chênh lệch total_plays giữa các lần chạy job)."""
+    id = models.BigAutoField(primary_key=True)
+    artist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_plays')
+    date = models.DateField()
+    plays = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['artist', 'date'], name='unique_artist_daily_plays')]
+
+
+class Job(models.Model):
+    """Việc chạy nền sau request, lưu ngay trong DB của project; `manage.py run_worker` lấy ra chạy."""
+    QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    id = models.BigAutoField(primary_key=True)
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict)
+    priority = models.SmallIntegerField(default=0)  # lớn hơn chạy trước
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    key = models.CharField(max_length=200, null=True, blank=True)  # idempotency key
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    createAt = models.DateTimeField(auto_now_add=True)
+    finishedAt = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Cùng key chỉ có một job đang chờ; job đang chạy không chặn: thay đổi đến giữa lúc chạy được xếp phía sau
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='queued'), name='unique_queued_job_key'),
+        ]
+        indexes = [models.Index(fields=['status', '-priority', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.task} #{self.id} ({self.status})"
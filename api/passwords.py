@@ -0,0 +1,154 @@
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import cache
+from rest_framework.exceptions import APIException
+
+from .models import User
+
+DEFAULTS = {
+    'WORKERS': min(4, os.cpu_count() or 1),   # 0: hash ngay trên thread của request (test / dev)
+    'MAX_PENDING': 32,        # số phép hash đang chờ tối đa; vượt quá thì trả 503 thay vì xếp hàng vô hạn
+    'QUEUE_TIMEOUT': 2.0,     # giây chờ một chỗ trống trước khi báo bận
+    'ITERATIONS': hashers.PBKDF2PasswordHasher.iterations,
+    'LOGIN_CACHE_TIMEOUT': 5 * 60,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_PASSWORDS', {}).get(name, DEFAULTS[name])
+
+
+class PasswordHashBusy(APIException):
+    status_code = 503
+    default_detail = 'Too many logins in progress, retry shortly.'
+    default_code = 'password_hash_busy'
+    wait = 1
+
+
+class TunedPBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """pbkdf2_sha256 với số vòng lấy từ API_PASSWORDS['ITERATIONS'].
+
+    Cùng tên algorithm nên hash cũ vẫn kiểm tra được; hash có số vòng khác sẽ được băm lại khi login.
+    """
+
+    @property
+    def iterations(self):
+        return get_setting('ITERATIONS')
+
+
+# ======= PROCESS POOL =======
+
+def _needs_rehash(encoded):
+    preferred = hashers.get_hasher('default')
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def _check(password, encoded):
+    """Chạy trong worker: (đúng mật khẩu?, hash mới nếu cần băm lại theo tham số hiện tại)."""
+    if not hashers.check_password(password, encoded):
+        return False, None
+    return True, hashers.make_password(password) if _needs_rehash(encoded) else None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def _executor():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            # spawn: fork từ một process đang chạy nhiều thread (server) có thể kẹt lock
+            _pool = ProcessPoolExecutor(
+                max_workers=get_setting('WORKERS'),
+                mp_context=multiprocessing.get_context('spawn'),
+                # Worker cần settings + app registry trước khi unpickle hàm trong module này (import models)
+                initializer=django.setup,
+            )
+            _slots = threading.BoundedSemaphore(get_setting('MAX_PENDING'))
+        return _pool, _slots
+
+
+def _reset(broken):
+    global _pool
+    with _pool_lock:
+        # Thread khác có thể đã dựng pool mới
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(function, *args):
+    if not get_setting('WORKERS'):
+        return function(*args)
+    pool, slots = _executor()
+    if not slots.acquire(timeout=get_setting('QUEUE_TIMEOUT')):
+        raise PasswordHashBusy()
+    try:
+        try:
+            return pool.submit(function, *args).result()
+        except BrokenProcessPool:
+            # Worker chết (OOM, bị kill): dựng pool mới và thử lại một lần
+            _reset(pool)
+            return _executor()[0].submit(function, *args).result()
+    finally:
+        slots.release()
+
+
+def make_password(password):
+    return _run(hashers.make_password, password)
+
+
+def check_user_password(user, password):
+    """Như user.check_password nhưng hash trong pool; băm lại (và lưu) khi tham số hasher đã đổi."""
+    if not user.has_usable_password():
+        return False
+    valid, rehashed = _run(_check, password, user.password)
+    if rehashed:
+        User.objects.filter(pk=user.pk, password=user.password).update(password=rehashed)
+        user.password = rehashed
+    return valid
+
+
+def _login_key(user, password):
+    # Gồm cả hash đang lưu: đổi mật khẩu (hoặc băm lại) là key cũ hết hiệu lực
+    message = f'{user.pk}\0{user.password}\0{password}'.encode()
+    return 'login:' + hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def login(username, password, issue_token):
+    """Thay cho authenticate() + cấp token: (user, token), hoặc (None, None) nếu sai.
+
+    Login lặp lại đúng username / mật khẩu trong LOGIN_CACHE_TIMEOUT nhận lại token vừa cấp mà không
+    tốn phép hash nào; key là HMAC của mật khẩu nên cache không giữ mật khẩu.
+    """
+    user = User._default_manager.filter(**{User.USERNAME_FIELD: username}).first()
+    if user is None:
+        # Như ModelBackend: vẫn hash một lần để thời gian phản hồi không lộ username có tồn tại hay không
+        make_password(password)
+        return None, None
+    if not user.is_active:
+        return None, None
+
+    # Hash cũ theo tham số đã đổi thì bỏ qua cache để lần login này băm lại
+    token = None if _needs_rehash(user.password) else cache.get(_login_key(user, password))
+    if token is None:
+        if not check_user_password(user, password):
+            return None, None
+        token = issue_token(user)
+        cache.set(_login_key(user, password), token, get_setting('LOGIN_CACHE_TIMEOUT'))
+    return user, token
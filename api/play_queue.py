@@ -0,0 +1,215 @@
+import random
+
+import numpy as np
+from django.db import transaction
+
+from .fast_serializers import serialize_songs_mini
+from .library import mark_liked
+from .models import ARTIST_ROLE_ID, User, Song, Album, Playlist, SimilarSongs, PlayQueue, PlayQueueItem
+
+MAX_AHEAD = 50
+PREFETCH = 2
+
+
+class QueueError(Exception):
+    pass
+
+
+# ======= NGUỒN =======
+
+def source_song_ids(source, source_id):
+    if source == 'playlist':
+        playlist = Playlist.objects.get(pk=source_id)
+        # Thứ tự thêm vào playlist (id của bảng trung gian)
+        return list(Playlist.songs.through.objects.filter(playlist=playlist).order_by('id').values_list('song_id', flat=True))
+    if source == 'album':
+        return list(Album.objects.get(pk=source_id).songs.order_by('id').values_list('id', flat=True))
+    if source == 'artist':
+        artist = User.objects.get(pk=source_id, role_id=ARTIST_ROLE_ID)
+        return list(artist.songs.order_by('-play_count', 'id').values_list('id', flat=True))
+    if source == 'radio':
+        song = Song.objects.get(pk=source_id)
+        neighbours = SimilarSongs.objects.filter(song=song).values_list('song_ids', flat=True).first() or []
+        existing = set(Song.objects.filter(id__in=neighbours).values_list('id', flat=True))
+        return [song.id] + [song_id for song_id in neighbours if song_id in existing]
+    raise QueueError(f'source must be one of {", ".join(key for key, _ in PlayQueue.SOURCES)}')
+
+
+def _shuffled_ranks(count, seed):
+    return np.random.default_rng(seed).permutation(count).astype(float) + 1
+
+
+# ======= THAO TÁC =======
+
+@transaction.atomic
+def start_queue(user, source, source_id, shuffle=False, start_song_id=None, seed=None):
+    """Dựng lại hàng đợi từ nguồn; đây là thao tác O(n) duy nhất, mọi thao tác sau chỉ chạm vài dòng."""
+    song_ids = source_song_ids(source, source_id)
+    if not song_ids:
+        raise QueueError('source has no songs')
+
+    PlayQueue.objects.filter(user=user).delete()
+    queue = PlayQueue.objects.create(
+        user=user, source=source, source_id=source_id, shuffle=shuffle,
+        seed=random.getrandbits(48) if seed is None else seed,
+    )
+    items = PlayQueueItem.objects.bulk_create([
+        PlayQueueItem(queue=queue, song_id=song_id, rank=index, base_rank=index)
+        for index, song_id in enumerate(song_ids)
+    ])
+    if any(item.pk is None for item in items):
+        items = list(queue.items.order_by('base_rank'))
+
+    queue.current = next((item for item in items if item.song_id == start_song_id), items[0])
+    if shuffle:
+        _apply_shuffle(queue, items, queue.current.pk)
+    queue.save(update_fields=['current'])
+    return queue
+
+
+def _apply_shuffle(queue, items, current_id):
+    """Hoán vị theo seed: bài đang phát giữ vị trí đầu, phần còn lại xáo trộn phía sau."""
+    others = [item for item in items if item.pk != current_id]
+    for item, rank in zip(others, _shuffled_ranks(len(others), queue.seed)):
+        item.rank = rank
+    for item in items:
+        if item.pk == current_id:
+            item.rank = 0
+    PlayQueueItem.objects.bulk_update(items, ['rank'], batch_size=500)
+
+
+@transaction.atomic
+def set_shuffle(queue, shuffle, seed=None):
+    if shuffle == queue.shuffle and seed is None:
+        return queue
+    items = list(queue.items.all())
+    if shuffle:
+        queue.seed = random.getrandbits(48) if seed is None else seed
+        if items:
+            _apply_shuffle(queue, items, queue.current_id or items[0].pk)
+    else:
+        for item in items:
+            item.rank = item.base_rank
+        PlayQueueItem.objects.bulk_update(items, ['rank'], batch_size=500)
+    queue.current = next((item for item in items if item.pk == queue.current_id), None)
+    queue.shuffle = shuffle
+    queue.save(update_fields=['shuffle', 'seed', 'updatedAt'])
+    return queue
+
+
+def _neighbour(queue, item, field, after):
+    items = queue.items.exclude(pk=item.pk) if item.pk else queue.items.all()
+    value = getattr(item, field)
+    if after:
+        return items.filter(**{f'{field}__gt': value}).order_by(field).first()
+    return items.filter(**{f'{field}__lt': value}).order_by(f'-{field}').first()
+
+
+def _slot(items, field, after):
+    """Giá trị `field` nằm ngay sau `after` (None = trước phần tử đầu); None khi float đã hết chỗ.
+
+    Chỉ đọc một dòng kề bên theo index (queue, rank) => O(log n), không đánh số lại cả hàng đợi.
+    """
+    if after is None:
+        first = items.order_by(field).values_list(field, flat=True).first()
+        return 0.0 if first is None else first - 1
+    following = items.filter(**{f'{field}__gt': after}).order_by(field).values_list(field, flat=True).first()
+    if following is None:
+        return after + 1
+    middle = (after + following) / 2
+    return middle if after < middle < following else None
+
+
+def _renumber(queue):
+    # Hiếm khi xảy ra: sau rất nhiều lần chèn vào cùng một chỗ
+    items = list(queue.items.all())
+    for field in ('rank', 'base_rank'):
+        for index, item in enumerate(sorted(items, key=lambda item: getattr(item, field))):
+            setattr(item, field, index)
+    PlayQueueItem.objects.bulk_update(items, ['rank', 'base_rank'], batch_size=500)
+
+
+def _place_after(queue, item, anchor):
+    """Đặt `item` ngay sau `anchor` (None = đầu hàng đợi) theo cả thứ tự phát lẫn thứ tự gốc."""
+    others = queue.items.exclude(pk=item.pk) if item.pk else queue.items.all()
+    for _ in range(2):
+        rank = _slot(others, 'rank', anchor.rank if anchor else None)
+        base_rank = _slot(others, 'base_rank', anchor.base_rank if anchor else None)
+        if rank is not None and base_rank is not None:
+            item.rank, item.base_rank = rank, base_rank
+            return item
+        _renumber(queue)
+        if anchor is not None:
+            anchor.refresh_from_db()
+    raise QueueError('could not place item')
+
+
+@transaction.atomic
+def insert_next(queue, song_id):
+    """'Phát tiếp theo': chèn ngay sau bài đang phát."""
+    song = Song.objects.get(pk=song_id)
+    item = _place_after(queue, PlayQueueItem(queue=queue, song=song), queue.current)
+    item.save()
+    return item
+
+
+@transaction.atomic
+def move(queue, item_id, after_id=None):
+    item = queue.items.get(pk=item_id)
+    anchor = queue.items.get(pk=after_id) if after_id is not None else None
+    if anchor is not None and anchor.pk == item.pk:
+        raise QueueError('cannot move an item after itself')
+    _place_after(queue, item, anchor).save(update_fields=['rank', 'base_rank'])
+    return item
+
+
+@transaction.atomic
+def remove(queue, item_id):
+    item = queue.items.get(pk=item_id)
+    if queue.current_id == item.pk:
+        queue.current = _neighbour(queue, item, 'rank', after=True) or _neighbour(queue, item, 'rank', after=False)
+        queue.save(update_fields=['current', 'updatedAt'])
+    item.delete()
+
+
+def skip(queue, step=1):
+    """Chuyển sang bài kế tiếp / trước đó: một query theo index (queue, rank)."""
+    if queue.current is None:
+        target = queue.items.order_by('rank').first()
+    else:
+        target = _neighbour(queue, queue.current, 'rank', after=step > 0)
+    if target is None:
+        return False
+    queue.current = target
+    queue.save(update_fields=['current', 'updatedAt'])
+    return True
+
+
+# ======= TRẠNG THÁI =======
+
+def queue_state(queue, ahead=5, user=None):
+    """Chỉ bài đang phát + vài bài tiếp theo, không bao giờ trả cả danh sách."""
+    ahead = max(0, min(ahead, MAX_AHEAD))
+    current = queue.current
+    upcoming = queue.items.order_by('rank')
+    if current is not None:
+        upcoming = upcoming.filter(rank__gt=current.rank)
+    upcoming = list(upcoming.values_list('id', 'song_id')[:ahead])
+
+    items = ([(current.pk, current.song_id)] if current else []) + upcoming
+    songs = mark_liked(serialize_songs_mini(Song.objects.filter(id__in={song_id for _, song_id in items})), user)
+    songs = {song['id']: song for song in songs}
+
+    def entry(item_id, song_id):
+        return {'item_id': item_id, 'song': songs.get(song_id)}
+
+    return {
+        'source': queue.source,
+        'source_id': queue.source_id,
+        'shuffle': queue.shuffle,
+        'seed': queue.seed,
+        'current': entry(current.pk, current.song_id) if current else None,
+        'next': [entry(item_id, song_id) for item_id, song_id in upcoming],
+        'prefetch': [songs[song_id]['url'] for _, song_id in upcoming[:PREFETCH]
+                     if song_id in songs and songs[song_id]['url']],
+    }
@@ -0,0 +1,209 @@
+import cProfile
+import heapq
+import io
+import itertools
+import pstats
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.utils import timezone
+
+DEFAULTS = {
+    'QUERY_PARAM': 'profile',
+    'HEADER': 'HTTP_X_PROFILE',
+    'TOP_FUNCTIONS': 40,
+    'SLOW_REQUEST_THRESHOLD': 0.5,   # giây
+    'SLOW_LOG_SIZE': 50,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_PROFILING', {}).get(name, DEFAULTS[name])
+
+
+# ======= SQL CAPTURE =======
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Chuẩn hoá câu SQL để gom các query cùng dạng (vd. N+1)."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    def __init__(self, keep_params=False):
+        self.keep_params = keep_params
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries.append((sql, repr(params) if self.keep_params else None, duration))
+
+    def record(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    @property
+    def total_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def fingerprints(self):
+        groups = {}
+        for sql, _, duration in self.queries:
+            key = fingerprint(sql)
+            count, total = groups.get(key, (0, 0.0))
+            groups[key] = (count + 1, total + duration)
+        return [
+            {'fingerprint': key, 'count': count, 'total_ms': round(total * 1000, 3)}
+            for key, (count, total) in sorted(groups.items(), key=lambda item: -item[1][1])
+        ]
+
+    def duplicates(self):
+        seen = {}
+        for sql, params, _ in self.queries:
+            seen[(sql, params)] = seen.get((sql, params), 0) + 1
+        return [
+            {'sql': sql, 'params': params, 'count': count}
+            for (sql, params), count in seen.items() if count > 1
+        ]
+
+
+# ======= SLOW REQUEST LOG =======
+
+class SlowRequestLog:
+    """Giữ SLOW_LOG_SIZE request chậm nhất (min-heap theo duration), không phải các request gần nhất:
+    một loạt request vừa qua ngưỡng không đẩy được request chậm hẳn ra khỏi log.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []
+        self._sequence = itertools.count()   # phân xử khi trùng duration: dict không so sánh được
+
+    def add(self, entry):
+        with self._lock:
+            heapq.heappush(self._heap, (entry['duration_ms'], next(self._sequence), entry))
+            while len(self._heap) > get_setting('SLOW_LOG_SIZE'):
+                heapq.heappop(self._heap)
+
+    def entries(self):
+        with self._lock:
+            entries = [entry for _, _, entry in self._heap]
+        return sorted(entries, key=lambda entry: -entry['duration_ms'])
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+
+
+slow_log = SlowRequestLog()
+
+
+class SlowRequestMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        if elapsed >= get_setting('SLOW_REQUEST_THRESHOLD'):
+            slow_log.add({
+                'at': timezone.now(),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 3),
+                'query_count': len(recorder.queries),
+                'sql_ms': round(recorder.total_time * 1000, 3),
+                'fingerprints': recorder.fingerprints(),
+            })
+        return response
+
+
+# ======= ON-DEMAND PROFILER =======
+
+def _is_staff(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+
+    # API dùng JWT nên AuthenticationMiddleware không thấy user, tự xác thực lại
+    from rest_framework.exceptions import APIException
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return bool(result and result[0].is_staff)
+
+
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+
+def profiling_requested(request):
+    """?profile=1 / true / yes (hoặc header X-Profile tương tự); profile=0 / false thì không bật."""
+    for value in (request.GET.get(get_setting('QUERY_PARAM')), request.META.get(get_setting('HEADER'))):
+        if value is not None and value.strip().lower() in TRUE_VALUES:
+            return True
+    return False
+
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling_requested(request) or not _is_staff(request):
+            return self.get_response(request)
+
+        recorder = QueryRecorder(keep_params=True)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with recorder.record():
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(get_setting('TOP_FUNCTIONS'))
+
+        return JsonResponse({
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 3),
+            'sql_ms': round(recorder.total_time * 1000, 3),
+            'queries': [
+                {'sql': sql, 'params': params, 'duration_ms': round(duration * 1000, 3)}
+                for sql, params, duration in recorder.queries
+            ],
+            'duplicates': recorder.duplicates(),
+            'fingerprints': recorder.fingerprints(),
+            'profile': stream.getvalue(),
+        })
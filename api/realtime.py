@@ -0,0 +1,299 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .models import Song, Playlist, SongLike, AlbumLike, ArtistFollow
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'COALESCE_INTERVAL': 1.0,    # mỗi topic tối đa một message / khoảng này, burst chỉ gửi giá trị mới nhất
+    'KEEPALIVE': 15.0,
+    'MAX_TOPICS': 50,
+}
+
+TOPIC_KINDS = ('song', 'playlist', 'user')
+
+
+def get_setting(name):
+    return getattr(settings, 'API_REALTIME', {}).get(name, DEFAULTS[name])
+
+
+# ======= HUB =======
+
+class Subscription:
+    def __init__(self, hub, topics, loop):
+        self.hub = hub
+        self.topics = topics
+        self.loop = loop
+        self.wakeup = asyncio.Event()
+        self.sent = {}
+
+    def notify(self):
+        """False nếu event loop của subscription đã đóng (client đã đi, hoặc view chạy dưới WSGI)."""
+        try:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+        except RuntimeError:
+            return False
+        return True
+
+    async def messages(self):
+        """Sinh (topic, payload); None là nhịp keepalive. Gom burst: ngủ COALESCE_INTERVAL sau mỗi lượt gửi."""
+        interval, keepalive = get_setting('COALESCE_INTERVAL'), get_setting('KEEPALIVE')
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            self.wakeup.clear()
+            for key, version, topic, payload in self.hub.pending(self):
+                self.sent[key] = version
+                yield topic, payload
+            await asyncio.sleep(interval)
+
+
+class Hub:
+    """Pub/sub trong process: chỉ giữ bản mới nhất của mỗi (topic, key) khi topic còn người nghe.
+
+    Chạy nhiều process (nhiều worker) thì mỗi process có hub riêng: client phải nối tới process nhận ghi,
+    hoặc thay hub bằng broker ngoài (Redis pub/sub) với cùng interface publish / subscribe.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}   # topic -> set[Subscription]
+        self.latest = {}          # topic -> {key: (version, payload)}
+        self.versions = itertools.count(1)
+
+    def has_subscribers(self, topic):
+        return topic in self.subscriptions
+
+    def subscribe(self, topics, loop):
+        subscription = Subscription(self, topics, loop)
+        with self.lock:
+            for topic in topics:
+                self.subscriptions.setdefault(topic, set()).add(subscription)
+                # Không phát lại những gì xảy ra trước khi subscribe
+                for key, (version, _) in self.latest.get(topic, {}).items():
+                    subscription.sent[(topic, key)] = version
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for topic in subscription.topics:
+                subscribers = self.subscriptions.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscriptions[topic]
+                        self.latest.pop(topic, None)
+
+    def publish(self, topic, payload, key=None):
+        with self.lock:
+            subscribers = list(self.subscriptions.get(topic, ()))
+            if not subscribers:
+                return
+            self.latest.setdefault(topic, {})[key or topic] = (next(self.versions), payload)
+        for subscription in subscribers:
+            if not subscription.notify():
+                self.unsubscribe(subscription)
+
+    def pending(self, subscription):
+        with self.lock:
+            return [
+                ((topic, key), version, topic, payload)
+                for topic in subscription.topics
+                for key, (version, payload) in self.latest.get(topic, {}).items()
+                if version > subscription.sent.get((topic, key), 0)
+            ]
+
+
+hub = Hub()
+
+
+# ======= SIGNALS: publish sau khi transaction commit =======
+
+def _publish_on_commit(topic, build, key=None):
+    if hub.has_subscribers(topic):
+        transaction.on_commit(lambda: _publish(topic, build, key))
+
+
+def _publish(topic, build, key):
+    # Chạy trong on_commit của request ghi: lỗi realtime chỉ ghi log, không được làm hỏng response đó
+    try:
+        hub.publish(topic, build(), key)
+    except Exception:
+        logger.exception('realtime publish to %s failed', topic)
+
+
+def _on_song_saved(sender, instance, **kwargs):
+    _publish_on_commit(f'song:{instance.pk}', lambda: {'id': instance.pk, 'play_count': instance.play_count})
+
+
+def _playlist_payload(playlist_id):
+    song_ids = Playlist.songs.through.objects.filter(playlist_id=playlist_id).order_by('id').values_list('song_id', flat=True)
+    return {'event': 'playlist', 'id': playlist_id, 'song_ids': list(song_ids)}
+
+
+def _on_playlist_songs_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        playlists = Playlist.objects.filter(pk__in=pk_set or ()).values_list('id', 'user_id')
+    else:
+        playlists = [(instance.pk, instance.user_id)]
+    for playlist_id, user_id in playlists:
+        _publish_on_commit(f'playlist:{playlist_id}', lambda pk=playlist_id: _playlist_payload(pk))
+        _publish_on_commit(f'user:{user_id}', lambda pk=playlist_id: _playlist_payload(pk), key=f'playlist:{playlist_id}')
+
+
+def _on_playlist_saved(sender, instance, **kwargs):
+    _publish_on_commit(f'playlist:{instance.pk}', lambda: _playlist_payload(instance.pk))
+
+
+def _on_library_changed(kind):
+    def handler(sender, instance, **kwargs):
+        _publish_on_commit(f'user:{instance.user_id}', lambda: {'event': 'library', 'kind': kind}, key=f'library:{kind}')
+    return handler
+
+
+def connect_signals():
+    post_save.connect(_on_song_saved, sender=Song, dispatch_uid='realtime-song')
+    post_save.connect(_on_playlist_saved, sender=Playlist, dispatch_uid='realtime-playlist')
+    m2m_changed.connect(_on_playlist_songs_changed, sender=Playlist.songs.through, dispatch_uid='realtime-playlist-songs')
+    for kind, model in (('songs', SongLike), ('albums', AlbumLike), ('artists', ArtistFollow)):
+        for name, signal in (('save', post_save), ('delete', post_delete)):
+            signal.connect(_on_library_changed(kind), sender=model, weak=False, dispatch_uid=f'realtime-{kind}-{name}')
+
+
+# ======= TOPICS + AUTH =======
+
+class TopicError(Exception):
+    pass
+
+
+def parse_topics(raw, user):
+    """'song:1,playlist:2,user:me' -> tập topic; user:<id> chỉ được nghe của chính mình."""
+    topics = set()
+    for topic in filter(None, (part.strip() for part in (raw or '').split(','))):
+        kind, _, value = topic.partition(':')
+        if kind not in TOPIC_KINDS:
+            raise TopicError(f'unknown topic kind: {kind!r}')
+        if kind == 'user':
+            if user is None:
+                raise TopicError('user topics require authentication')
+            if value not in ('me', str(user.pk)):
+                raise TopicError('cannot subscribe to another user')
+            value = str(user.pk)
+        elif not value.isdigit():
+            raise TopicError(f'invalid topic: {topic!r}')
+        topics.add(f'{kind}:{value}')
+    if not topics:
+        raise TopicError('topics is required')
+    if len(topics) > get_setting('MAX_TOPICS'):
+        raise TopicError(f'at most {get_setting("MAX_TOPICS")} topics')
+    return topics
+
+
+def _user_from_token(raw_token):
+    """Header Authorization hoặc ?token= (EventSource / WebSocket của trình duyệt không gửi được header)."""
+    if not raw_token:
+        return None
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        raise TopicError('invalid token')
+
+
+def _token(header, query_token):
+    if header:
+        parts = header.split()
+        if len(parts) == 2 and parts[0] == 'Bearer':
+            return parts[1]
+    return query_token
+
+
+# ======= SSE =======
+
+async def events_view(request):
+    """GET /api/events/?topics=song:1,playlist:2,user:me — server-sent events (cần chạy dưới ASGI)."""
+    if not isinstance(request, ASGIRequest):
+        # WSGI gom cả stream vô hạn vào bộ nhớ trước khi gửi: client không nhận gì, thread bị giữ mãi
+        return JsonResponse(
+            {'error': 'server-sent events need an ASGI server, e.g. uvicorn spotify.asgi:application'}, status=501,
+        )
+    try:
+        user = await sync_to_async(_user_from_token)(
+            _token(request.headers.get('Authorization'), request.GET.get('token'))
+        )
+        topics = parse_topics(request.GET.get('topics'), user)
+    except TopicError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    subscription = hub.subscribe(topics, asyncio.get_running_loop())
+
+    async def stream():
+        try:
+            yield b'retry: 3000\n\n'
+            async for message in subscription.messages():
+                if message is None:
+                    yield b': keepalive\n\n'
+                else:
+                    topic, payload = message
+                    yield b'event: ' + topic.encode() + b'\ndata: ' + dumps(payload) + b'\n\n'
+        finally:
+            hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ======= WEBSOCKET (ASGI thô, không cần channels) =======
+
+async def websocket_app(scope, receive, send):
+    """ws://.../api/ws/?topics=...&token=... — gửi {"topic", "data"}; client không cần gửi gì."""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    query = {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+    headers = {key.decode().lower(): value.decode() for key, value in scope.get('headers', [])}
+    try:
+        user = await sync_to_async(_user_from_token)(_token(headers.get('authorization'), query.get('token')))
+        topics = parse_topics(query.get('topics'), user)
+    except TopicError:
+        await send({'type': 'websocket.close', 'code': 4400})
+        return
+
+    await send({'type': 'websocket.accept'})
+    subscription = hub.subscribe(topics, asyncio.get_running_loop())
+
+    async def push():
+        async for message in subscription.messages():
+            if message is not None:
+                topic, payload = message
+                await send({'type': 'websocket.send', 'text': json.dumps({'topic': topic, 'data': payload}, default=str)})
+
+    pusher = asyncio.ensure_future(push())
+    try:
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass
+    finally:
+        pusher.cancel()
+        hub.unsubscribe(subscription)
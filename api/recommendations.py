@@ -0,0 +1,143 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from scipy import sparse
+
+from .models import Song, Playlist, Change, SimilarSongs
+
+PLAYLIST_WEIGHT = 1.0
+ARTIST_WEIGHT = 0.5
+GENRE_WEIGHT = 0.2
+
+
+def m2m_pairs(field):
+    """(group, song) từ bảng trung gian M2M dưới dạng mảng numpy hai cột."""
+    if field.model is Song:
+        columns = (f'{field.m2m_reverse_field_name()}_id', f'{field.m2m_field_name()}_id')
+    else:
+        columns = (f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id')
+    return pairs_array(field.remote_field.through.objects.values_list(*columns))
+
+
+def pairs_array(rows):
+    flat = np.fromiter((value for row in rows.iterator(chunk_size=10000) for value in row), dtype=np.int64)
+    return flat.reshape(-1, 2)
+
+
+def positions(sorted_ids, values):
+    """Vị trí của `values` trong mảng id đã sort, kèm mask những giá trị tìm thấy."""
+    found = np.zeros(len(values), dtype=bool)
+    if not len(sorted_ids):
+        return np.zeros(len(values), dtype=np.int64), found
+    index = np.minimum(np.searchsorted(sorted_ids, values), len(sorted_ids) - 1)
+    found = sorted_ids[index] == values
+    return index, found
+
+
+def incidence(pairs, song_ids, groups=None, normalize=True):
+    """Ma trận group x song; normalize chia mỗi cột cho sqrt(bậc) để X.T @ X ra cosine similarity.
+
+    `groups` (đã sort) cố định thứ tự hàng, mặc định là các group xuất hiện trong pairs.
+    """
+    cols, keep = positions(song_ids, pairs[:, 1])
+    if groups is None:
+        groups = np.unique(pairs[keep, 0])
+    rows, found = positions(groups, pairs[:, 0])
+    keep &= found
+
+    matrix = sparse.csr_matrix(
+        (np.ones(int(keep.sum()), dtype=np.float32), (rows[keep], cols[keep])), shape=(len(groups), len(song_ids))
+    )
+    matrix.data[:] = 1.0  # membership trùng lặp vẫn chỉ tính một lần
+    if not normalize:
+        return matrix
+    degree = np.asarray(matrix.sum(axis=0)).ravel()
+    scale = np.divide(1.0, np.sqrt(degree), out=np.zeros_like(degree), where=degree > 0)
+    return (matrix @ sparse.diags(scale.astype(np.float32))).tocsr()
+
+
+class SimilarityModel:
+    def __init__(self):
+        self.song_ids = np.fromiter(Song.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+        n_songs = len(self.song_ids)
+
+        self.playlists = incidence(m2m_pairs(Playlist.songs.field), self.song_ids)
+        self.artists = incidence(m2m_pairs(Song.artists.field), self.song_ids)
+        # Số genre nhỏ nên giữ dạng dense (song x genre) để tính overlap theo cặp
+        self.genres = incidence(m2m_pairs(Song.genre.field), self.song_ids).T.toarray() \
+            if n_songs else np.zeros((0, 0), dtype=np.float32)
+
+        self.playlists_t = self.playlists.T.tocsr()
+        self.artists_t = self.artists.T.tocsr()
+
+    def index_of(self, ids):
+        index, found = positions(self.song_ids, np.asarray(sorted(ids), dtype=np.int64))
+        return index[found]
+
+    def top_k(self, rows, k):
+        """Điểm tương tự của các bài ở `rows` với toàn bộ catalog, trả về top-k mỗi bài."""
+        scores = PLAYLIST_WEIGHT * (self.playlists_t[rows] @ self.playlists)
+        scores = scores + ARTIST_WEIGHT * (self.artists_t[rows] @ self.artists)
+        scores = scores.tocoo()
+
+        # Genre chỉ cộng điểm cho ứng viên đã có từ playlist / artist, tránh ma trận dày đặc
+        song_rows = rows[scores.row]
+        if self.genres.size:
+            overlap = np.einsum('ij,ij->i', self.genres[song_rows], self.genres[scores.col])
+            scores.data = scores.data + GENRE_WEIGHT * overlap.astype(np.float32)
+        scores.data[scores.col == song_rows] = 0
+        scores = scores.tocsr()
+        scores.eliminate_zeros()
+
+        result = {}
+        for i, row in enumerate(rows):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            cols, data = scores.indices[start:end], scores.data[start:end]
+            if len(data) > k:
+                best = np.argpartition(-data, k)[:k]
+                cols, data = cols[best], data[best]
+            order = np.argsort(-data, kind='stable')
+            result[int(self.song_ids[row])] = (
+                self.song_ids[cols[order]].tolist(),
+                np.round(data[order], 4).tolist(),
+            )
+        return result
+
+
+def affected_songs(cursor):
+    """Bài cần tính lại từ sau cursor: bài có thay đổi + bài trong playlist có thay đổi."""
+    changes = Change.objects.filter(id__gt=cursor, deleted=False)
+    song_ids = set(changes.filter(model='songs').values_list('object_id', flat=True))
+    playlist_ids = changes.filter(model='playlists').values_list('object_id', flat=True)
+    song_ids.update(Playlist.songs.through.objects.filter(playlist_id__in=playlist_ids).values_list('song_id', flat=True))
+    return song_ids
+
+
+def build_similar_songs(top_k=20, block_size=1000, full=False, log=None):
+    """Tính (lại) bảng SimilarSongs; mặc định chỉ các bài bị ảnh hưởng kể từ lần chạy trước."""
+    log = log or (lambda message: None)
+    cursor = Change.objects.aggregate(last=Max('id'))['last'] or 0
+    previous = SimilarSongs.objects.aggregate(last=Max('cursor'))['last']
+
+    model = SimilarityModel()
+    if full or previous is None:
+        rows = np.arange(len(model.song_ids))
+    else:
+        rows = model.index_of(affected_songs(previous))
+    log(f'{len(rows)} / {len(model.song_ids)} songs to compute')
+
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        neighbours = model.top_k(block, top_k)
+        with transaction.atomic():
+            SimilarSongs.objects.bulk_create(
+                [
+                    SimilarSongs(song_id=song_id, song_ids=ids, scores=scores, cursor=cursor)
+                    for song_id, (ids, scores) in neighbours.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['song'],
+                update_fields=['song_ids', 'scores', 'cursor', 'computedAt'],
+            )
+        log(f'  {min(start + block_size, len(rows))} / {len(rows)}')
+    return len(rows)
@@ -0,0 +1,23 @@
+import orjson
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+_encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer dùng orjson; khi cần indent (browsable API) thì quay về bản gốc."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return dumps(data)
+
+
+def dumps(data):
+    ret = orjson.dumps(data, default=_encoder.default)
+    # Giữ hành vi của DRF: escape \u2028 / \u2029 để JSON là tập con của JS
+    return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -1,31 +1,40 @@
-from django.contrib.auth import authenticate
-from django.contrib.auth.hashers import make_password
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .fast_serializers import FastSongListSerializer, FastSongMiniListSerializer
+from .fragments import CachedFragmentMixin
+from .library import library_ids, request_user
+from . import passwords
+from .metrics import TimedRepresentationMixin
 from .models import Role, User, Genre, Song, Album, Playlist
 
 
 # === BASIC SERIALIZERS (for nested usage) ===
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Role
         fields = ['id', 'name']
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(TimedRepresentationMixin, CachedFragmentMixin, serializers.ModelSerializer):
+    fragment = 'genre'
+
     class Meta:
         model = Genre
         fields = ['id', 'name']
 
 
-class AlbumMiniSerializer(serializers.ModelSerializer):
+class AlbumMiniSerializer(CachedFragmentMixin, serializers.ModelSerializer):
+    fragment = 'album'
+
     class Meta:
         model = Album
         fields = ['id', 'title']
         
-class ArtistMiniSerializer(serializers.ModelSerializer):
+class ArtistMiniSerializer(CachedFragmentMixin, serializers.ModelSerializer):
+    fragment = 'artist'
+
     class Meta:
         model = User
         fields = ['id', 'username', 'fullname']
@@ -34,10 +43,15 @@ class SongMiniSerializer(serializers.ModelSerializer):
     artist = ArtistMiniSerializer(many=True, read_only=True, source='artists')
     url = serializers.FileField(use_url=False)
     thumbnail = serializers.ImageField(use_url=False)
+    is_liked = serializers.SerializerMethodField()
 
     class Meta:
         model = Song
-        fields = ['id', 'title', 'duration', 'artist', 'url', 'thumbnail']
+        fields = ['id', 'title', 'duration', 'artist', 'url', 'thumbnail', 'gain', 'is_liked']
+        list_serializer_class = FastSongMiniListSerializer
+
+    def get_is_liked(self, obj):
+        return obj.id in library_ids(request_user(self.context))
 
     def get_artist(self, obj):
         return [{'id': artist.id, 'name': artist.fullname} for artist in obj.artists.all()]        
@@ -49,7 +63,7 @@ class PlaylistMiniSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'poster', 'createAt', 'songs']
 
 
-class UserPublicSerializer(serializers.ModelSerializer):
+class UserPublicSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     role = RoleSerializer(read_only=True)
     avatar = serializers.ImageField(use_url=False)
     playlists = serializers.SerializerMethodField()
@@ -59,15 +73,16 @@ class UserPublicSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'avatar', 'role', 'fullname', 'playlists']
 
     def get_playlists(self, obj):
-        playlists = Playlist.objects.filter(user=obj)
-        return PlaylistMiniSerializer(playlists, many=True).data
+        # playlist_set.all() dùng kết quả prefetch nếu có (stream album / playlist)
+        playlists = obj.playlist_set.all()
+        return PlaylistMiniSerializer(playlists, many=True, context=self.context).data
     
 
 
 
 # === MAIN SERIALIZERS ===
 
-class ArtistSerializer(serializers.ModelSerializer):
+class ArtistSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     songs = serializers.SerializerMethodField()
     albums = serializers.SerializerMethodField()
     avatar = serializers.ImageField(use_url=False)
@@ -78,13 +93,13 @@ class ArtistSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'fullname', 'albums', 'songs', 'avatar']
 
     def get_songs(self, obj):
-        return SongSerializer(obj.songs.all(), many=True).data
+        return SongSerializer(obj.songs.all(), many=True, context=self.context).data
 
     def get_albums(self, obj):
-        return AlbumSerializer(Album.objects.filter(creator=obj), many=True).data
+        return AlbumSerializer(Album.objects.filter(creator=obj), many=True, context=self.context).data
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     role = RoleSerializer(read_only=True)
     role_id = serializers.PrimaryKeyRelatedField(
         queryset=Role.objects.all(), write_only=True, source='role'
@@ -100,7 +115,7 @@ class UserSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password', None)
         user = User(**validated_data)
         if password:
-            user.set_password(password)
+            user.password = passwords.make_password(password)
         user.save()
         return user
 
@@ -110,12 +125,12 @@ class UserSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
 
         if password:
-            instance.set_password(password)
+            instance.password = passwords.make_password(password)
         instance.save()
         return instance
 
 
-class AlbumSerializer(serializers.ModelSerializer):
+class AlbumSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     creator = UserPublicSerializer(read_only=True)
     creator_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), write_only=True, source='creator'
@@ -129,7 +144,7 @@ class AlbumSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'releaseDate', 'poster', 'creator', 'creator_id', 'songs']
 
 
-class SongSerializer(serializers.ModelSerializer):
+class SongSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     genre = GenreSerializer(many=True, read_only=True)
     genre_ids = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Genre.objects.all(), write_only=True, source='genre'
@@ -147,18 +162,25 @@ class SongSerializer(serializers.ModelSerializer):
     artists_ids = serializers.PrimaryKeyRelatedField(
         many=True, queryset=User.objects.all(), write_only=True, source='artists'
     )
+    is_liked = serializers.SerializerMethodField()
 
     class Meta:
         model = Song
         fields = [
             'id', 'title', 'duration', 'url', 'thumbnail', 'play_count',
+            'loudness', 'peak', 'gain',
             'genre', 'genre_ids',
             'albums', 'albums_ids',
-            'artist', 'artists_ids'
+            'artist', 'artists_ids',
+            'is_liked',
         ]
+        list_serializer_class = FastSongListSerializer
+
+    def get_is_liked(self, obj):
+        return obj.id in library_ids(request_user(self.context))
 
 
-class PlaylistSerializer(serializers.ModelSerializer):
+class PlaylistSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     user = UserPublicSerializer(read_only=True)
     user_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), write_only=True, source='user'
@@ -187,7 +209,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         }
 
     def create(self, validated_data):
-        validated_data['password'] = make_password(validated_data['password'])
+        validated_data['password'] = passwords.make_password(validated_data['password'])
         return User.objects.create(**validated_data)
 
 
@@ -200,12 +222,11 @@ class LoginSerializer(serializers.Serializer):
     def validate(self, data):
         username = data.get("username")
         password = data.get("password")
-        user = authenticate(username=username, password=password)
+        user, token = passwords.login(username, password, lambda user: str(RefreshToken.for_user(user).access_token))
 
-        if user and user.is_active:
-            refresh = RefreshToken.for_user(user)
+        if user:
             return {
-                'token': str(refresh.access_token),
+                'token': token,
                 'user': UserPublicSerializer(user).data
             }
 
@@ -0,0 +1,74 @@
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+from .renderers import dumps
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_stream(chunks):
+    for chunk in chunks:
+        if chunk:
+            yield b''.join(dumps(item) + b'\n' for item in chunk)
+
+
+def json_array_stream(chunks):
+    yield b'['
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        body = b','.join(dumps(item) for item in chunk)
+        yield body if first else b',' + body
+        first = False
+    yield b']'
+
+
+def streaming_response(chunks, fmt):
+    """Ghi từng chunk (list dict đã serialize) ra response, bộ nhớ không phụ thuộc số dòng."""
+    stream = ndjson_stream(chunks) if fmt == 'ndjson' else json_array_stream(chunks)
+    response = StreamingHttpResponse(stream, content_type=STREAM_FORMATS[fmt])
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class StreamingListMixin:
+    """?stream=ndjson|json trên list endpoint: đọc queryset bằng iterator() thay vì dựng cả list."""
+
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        fmt = request.query_params.get('stream')
+        if fmt is None:
+            return super().list(request, *args, **kwargs)
+        if fmt not in STREAM_FORMATS:
+            return Response({'error': f'stream must be one of {", ".join(STREAM_FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_stream_queryset(self.filter_queryset(self.get_queryset()))
+        return streaming_response(self.stream_chunks(queryset), fmt)
+
+    def get_stream_queryset(self, queryset):
+        """Thêm select_related / prefetch_related cho serializer lồng nhau; mặc định giữ nguyên."""
+        return queryset
+
+    def stream_chunks(self, queryset):
+        # iterator(chunk_size) cũng chạy prefetch_related theo từng chunk
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        for chunk in batched(rows, self.stream_chunk_size):
+            yield self.get_serializer(chunk, many=True).data
@@ -0,0 +1,282 @@
+from django.db.models import Max, Q
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+
+from .models import ARTIST_ROLE_ID, User, Genre, Song, Album, Playlist, Change, SongLike, AlbumLike, ArtistFollow
+
+MAX_LIMIT = 2000
+
+
+def record_changes(key, ids, deleted=False):
+    Change.objects.bulk_create([Change(model=key, object_id=pk, deleted=deleted) for pk in ids])
+
+
+# ======= SIGNALS =======
+
+def _is_artist(user):
+    return user.role_id == ARTIST_ROLE_ID
+
+
+def _on_save(key, condition=None):
+    def handler(sender, instance, update_fields=None, raw=False, **kwargs):
+        if raw or (condition and not condition(instance)):
+            return
+        # increase-play chỉ đổi play_count: không đáng để mọi client tải lại bài hát
+        if update_fields is not None and set(update_fields) <= {'play_count'}:
+            return
+        record_changes(key, [instance.pk])
+    return handler
+
+
+def _remember_artist(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Chỉ khi role có thể đổi: save(update_fields=['last_login']) lúc đăng nhập không tốn thêm query
+    if raw or instance.pk is None or (update_fields is not None and 'role' not in update_fields):
+        return
+    instance._sync_was_artist = User.objects.filter(pk=instance.pk, role_id=ARTIST_ROLE_ID).exists()
+
+
+def _on_user_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if _is_artist(instance):
+        record_changes('artists', [instance.pk])
+    elif getattr(instance, '_sync_was_artist', False):
+        # Không còn là artist: client phải bỏ artist này như khi bị xoá
+        record_changes('artists', [instance.pk], deleted=True)
+    instance._sync_was_artist = _is_artist(instance)
+
+
+def record_song_scope(song_ids):
+    """Bài vừa vào thư viện của ai đó (thêm vào playlist, like): ghi lại bài cùng album / artist của nó để
+    client của user đó nhận được dù các object này không đổi gì sau cursor của client.
+    """
+    song_ids = list(song_ids)
+    if not song_ids:
+        return
+    record_changes('songs', song_ids)
+    record_changes('albums', Song.albums.through.objects.filter(song_id__in=song_ids)
+                   .values_list('album_id', flat=True).distinct())
+    record_changes('artists', Song.artists.through.objects.filter(song_id__in=song_ids)
+                   .values_list('user_id', flat=True).distinct())
+
+
+def _on_playlist_songs_added(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        record_song_scope([instance.pk] if reverse else sorted(pk_set or ()))
+
+
+def _on_like(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    if isinstance(instance, SongLike):
+        record_song_scope([instance.song_id])
+    elif isinstance(instance, AlbumLike):
+        record_changes('albums', [instance.album_id])
+    else:
+        record_changes('artists', [instance.artist_id])
+
+
+def _on_delete(key, condition=None):
+    def handler(sender, instance, **kwargs):
+        if condition and not condition(instance):
+            return
+        record_changes(key, [instance.pk], deleted=True)
+    return handler
+
+
+def _on_m2m(key, field):
+    """Khi membership M2M đổi, ghi upsert cho phía khai báo field (Song / Playlist)."""
+    owner = field.model
+    through = field.remote_field.through
+    source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+
+    def handler(sender, instance, action, pk_set, **kwargs):
+        if isinstance(instance, owner):
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                record_changes(key, [instance.pk])
+        elif action == 'pre_clear':
+            # Sau khi clear thì không còn biết bài / playlist nào bị ảnh hưởng
+            record_changes(key, list(through.objects.filter(**{target: instance.pk}).values_list(source, flat=True)))
+        elif action in ('post_add', 'post_remove') and pk_set:
+            record_changes(key, sorted(pk_set))
+    return handler
+
+
+def _on_related_delete(fields):
+    """Xoá genre/album/artist/song thì danh sách id của các bài / playlist chứa nó cũng đổi."""
+    def handler(sender, instance, **kwargs):
+        for key, field in fields:
+            source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+            through = field.remote_field.through
+            record_changes(key, list(through.objects.filter(**{target: instance.pk}).values_list(source, flat=True)))
+    return handler
+
+
+SYNCED = {
+    'songs': Song,
+    'albums': Album,
+    'playlists': Playlist,
+    'genres': Genre,
+    'artists': User,
+}
+
+M2M_FIELDS = (
+    ('songs', Song.genre.field),
+    ('songs', Song.albums.field),
+    ('songs', Song.artists.field),
+    ('playlists', Playlist.songs.field),
+)
+
+
+def connect_signals():
+    for key, model in SYNCED.items():
+        condition = _is_artist if model is User else None
+        if model is User:
+            pre_save.connect(_remember_artist, sender=User, dispatch_uid='sync-user-role')
+            post_save.connect(_on_user_save, sender=User, dispatch_uid=f'sync-save-{key}')
+        else:
+            post_save.connect(_on_save(key), sender=model, weak=False, dispatch_uid=f'sync-save-{key}')
+        post_delete.connect(_on_delete(key, condition), sender=model, weak=False, dispatch_uid=f'sync-delete-{key}')
+
+        fields = [(owner, field) for owner, field in M2M_FIELDS if field.related_model is model]
+        if fields:
+            pre_delete.connect(_on_related_delete(fields), sender=model, weak=False, dispatch_uid=f'sync-related-{key}')
+
+    for key, field in M2M_FIELDS:
+        m2m_changed.connect(_on_m2m(key, field), sender=field.remote_field.through,
+                            weak=False, dispatch_uid=f'sync-m2m-{field.model.__name__}-{field.name}')
+    m2m_changed.connect(_on_playlist_songs_added, sender=Playlist.songs.through, dispatch_uid='sync-playlist-scope')
+    for model in (SongLike, AlbumLike, ArtistFollow):
+        post_save.connect(_on_like, sender=model, dispatch_uid=f'sync-like-{model.__name__}')
+
+
+# ======= PAYLOADS (gọn hơn serializer của REST API: quan hệ chỉ gửi id) =======
+
+def _file_name(name):
+    return name or None
+
+
+def _links(field, ids):
+    through = field.remote_field.through
+    source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+    links = {}
+    rows = through.objects.filter(**{f'{source}__in': ids}).order_by(source, target).values_list(source, target)
+    for owner_id, target_id in rows:
+        links.setdefault(owner_id, []).append(target_id)
+    return links
+
+
+def songs_payload(ids):
+    genres = _links(Song.genre.field, ids)
+    albums = _links(Song.albums.field, ids)
+    artists = _links(Song.artists.field, ids)
+    return [
+        {
+            **row,
+            'url': _file_name(row['url']),
+            'thumbnail': _file_name(row['thumbnail']),
+            'genre_ids': genres.get(row['id'], []),
+            'album_ids': albums.get(row['id'], []),
+            'artist_ids': artists.get(row['id'], []),
+        }
+        for row in Song.objects.filter(id__in=ids).values(
+            'id', 'title', 'duration', 'url', 'thumbnail', 'play_count', 'loudness', 'peak', 'gain'
+        )
+    ]
+
+
+def albums_payload(ids):
+    return [
+        {**row, 'poster': _file_name(row['poster'])}
+        for row in Album.objects.filter(id__in=ids).values('id', 'title', 'releaseDate', 'poster', 'creator_id')
+    ]
+
+
+def playlists_payload(ids):
+    songs = _links(Playlist.songs.field, ids)
+    return [
+        {**row, 'poster': _file_name(row['poster']), 'song_ids': songs.get(row['id'], [])}
+        for row in Playlist.objects.filter(id__in=ids).values('id', 'name', 'createAt', 'poster', 'user_id')
+    ]
+
+
+def genres_payload(ids):
+    return list(Genre.objects.filter(id__in=ids).values('id', 'name'))
+
+
+def artists_payload(ids):
+    return [
+        {**row, 'avatar': _file_name(row['avatar'])}
+        for row in User.objects.filter(id__in=ids, role_id=ARTIST_ROLE_ID).values('id', 'username', 'fullname', 'avatar')
+    ]
+
+
+PAYLOADS = {
+    'songs': songs_payload,
+    'albums': albums_payload,
+    'playlists': playlists_payload,
+    'genres': genres_payload,
+    'artists': artists_payload,
+}
+
+
+def library_scope(user):
+    """Change mà client của `user` cần: playlist của mình, bài trong đó hoặc đã like, album / artist của các
+    bài này hoặc đã like / follow, mọi genre, mọi tombstone (chỉ là id, không biết client có giữ hay không).
+    """
+    through = Playlist.songs.through.objects
+    songs = Q(id__in=through.filter(playlist__user=user).values('song_id')) | Q(id__in=SongLike.objects.filter(
+        user=user).values('song_id'))
+    song_ids = Song.objects.filter(songs).values('id')
+    albums = (Q(object_id__in=AlbumLike.objects.filter(user=user).values('album_id'))
+              | Q(object_id__in=Song.albums.through.objects.filter(song_id__in=song_ids).values('album_id')))
+    artists = (Q(object_id__in=ArtistFollow.objects.filter(user=user).values('artist_id'))
+               | Q(object_id__in=Song.artists.through.objects.filter(song_id__in=song_ids).values('user_id')))
+    return (
+        Q(deleted=True) | Q(model='genres')
+        | Q(model='playlists', object_id__in=Playlist.objects.filter(user=user).values('id'))
+        | Q(model='songs', object_id__in=song_ids)
+        | Q(model='albums') & albums
+        | Q(model='artists') & artists
+    )
+
+
+def changes_since(since, limit, user=None):
+    """Gom các Change sau cursor thành upserts (trạng thái hiện tại) + tombstones.
+
+    user: chỉ những gì thuộc thư viện của user (library_scope); None là cả catalog.
+    """
+    changes = Change.objects.filter(id__gt=since)
+    if user is not None:
+        changes = changes.filter(library_scope(user))
+    rows = list(changes.order_by('id').values_list('id', 'model', 'object_id', 'deleted')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for change_id, key, object_id, deleted in rows:
+        latest[(key, object_id)] = (change_id, deleted)
+
+    changes = {}
+    for key in SYNCED:
+        upserts = {pk: version for (k, pk), (version, deleted) in latest.items() if k == key and not deleted}
+        deletes = sorted(pk for (k, pk), (_, deleted) in latest.items() if k == key and deleted)
+        objects = PAYLOADS[key](list(upserts)) if upserts else []
+        for obj in objects:
+            obj['version'] = upserts[obj['id']]
+        # Bị xoá khỏi DB (hoặc không còn là artist) sau khi ghi log: coi như tombstone
+        missing = set(upserts) - {obj['id'] for obj in objects}
+        if objects or deletes or missing:
+            changes[key] = {'upserts': objects, 'deletes': sorted(set(deletes) | missing)}
+
+    return {
+        'cursor': rows[-1][0] if rows else since,
+        'has_more': has_more,
+        'changes': changes,
+    }
+
+
+def compact_changes():
+    """Xoá các Change đã bị một Change mới hơn của cùng object thay thế; cursor cũ vẫn hợp lệ."""
+    latest = Change.objects.values('model', 'object_id').annotate(last=Max('id')).values('last')
+    deleted, _ = Change.objects.exclude(id__in=latest).delete()
+    return deleted
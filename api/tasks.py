@@ -0,0 +1,51 @@
+from .artist_stats import build_artist_stats
+from .audio import analyze_song
+from .hls import package_song_id
+from .jobs import enqueue_on_save, task
+from .models import ARTIST_ROLE_ID, User, Song, Album
+
+# Thống kê artist không cần tức thời: gom mọi lần save trong khoảng này thành một job
+STATS_DELAY = 60
+
+
+@task(name='analyze_song', priority=10)
+def analyze_song_task(song_id):
+    song = Song.objects.filter(pk=song_id).first()
+    if song is not None:
+        analyze_song(song)
+
+
+@task(name='package_hls', priority=20)
+def package_hls_task(song_id):
+    # Ưu tiên hơn phân tích audio: có người đang chờ phát bài này
+    package_song_id(song_id)
+
+
+@task(name='artist_stats')
+def artist_stats_task(artist_ids):
+    build_artist_stats(artist_ids=artist_ids)
+
+
+@task(name='song_artist_stats')
+def song_artist_stats_task(song_id):
+    # Đọc artist lúc chạy job chứ không phải lúc save: request không tốn thêm query
+    artist_ids = list(Song.artists.through.objects.filter(song_id=song_id).values_list('user_id', flat=True))
+    if artist_ids:
+        build_artist_stats(artist_ids=artist_ids)
+
+
+def connect_signals():
+    enqueue_on_save(
+        Song, 'song_artist_stats', lambda song: {'song_id': song.pk},
+        key=lambda song: f'song_artist_stats:{song.pk}', delay=STATS_DELAY,
+        # increase_play save mỗi lượt nghe: lượt nghe vào thống kê qua `manage.py build_artist_stats` định kỳ
+        ignore_fields={'play_count'},
+    )
+    enqueue_on_save(
+        Album, 'artist_stats', lambda album: {'artist_ids': [album.creator_id]} if album.creator_id else None,
+        key=lambda album: f'artist_stats:{album.creator_id}', delay=STATS_DELAY,
+    )
+    enqueue_on_save(
+        User, 'artist_stats', lambda user: {'artist_ids': [user.pk]} if user.role_id == ARTIST_ROLE_ID else None,
+        key=lambda user: f'artist_stats:{user.pk}', delay=STATS_DELAY,
+    )
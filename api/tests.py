@@ -1,3 +1,1217 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import os
+import tempfile
+import time
+import wave
+import zipfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import hls, passwords
+from .admin import EstimatedCountPaginator
+from .archives import slots as download_slots
+from .audio import AudioDecodeError, analyze_song
+from .artist_stats import build_artist_stats
+from .benchmarks import run_benchmarks
+from .feeds import build_home_feeds
+from .fragments import fragments
+from .jobs import enqueue, requeue_stale, run_worker, task
+from .management.commands.seed_catalog import seed_catalog
+from .streaming import batched
+from .metrics import Histogram, registry
+from .profiling import SlowRequestLog, slow_log
+from .models import (
+    Role, User, Genre, Song, Album, Playlist, Fingerprint, Job, ArtistStats, SongLike, PlayQueue, PlayQueueItem,
+)
+from .realtime import TopicError, hub, parse_topics, websocket_app
+from .recommendations import build_similar_songs
+from .serializers import SongSerializer, SongMiniSerializer, AlbumSerializer
+from .throttling import BucketStore, store as throttle_store
+
+
+class MetricsTests(TestCase):
+    def test_histogram_buckets_and_quantiles(self):
+        histogram = Histogram((1, 2, 5))
+        for value in (0.5, 1, 1.5, 3, 10):
+            histogram.observe(value)
+        # Bucket tính cận trên (le): 1 rơi vào bucket 1, 10 vào +Inf
+        self.assertEqual(list(histogram.cumulative()), [(1, 2), (2, 3), (5, 4), (float('inf'), 5)])
+        self.assertEqual((histogram.count, histogram.total), (5, 16.0))
+        self.assertAlmostEqual(histogram.quantile(0.5), 1.5)
+        self.assertEqual(histogram.quantile(0.99), 5)
+        self.assertEqual(Histogram((1,)).quantile(0.5), 0.0)
+
+    def test_server_timing_and_route_metrics(self):
+        registry.reset()
+        Genre.objects.create(name='Pop')
+        response = self.client.get('/api/genres/')
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total;dur=[\d.]+$')
+
+        with override_settings(API_METRICS={'TOKEN': 't'}):
+            metrics = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer t').content.decode()
+        self.assertIn('api_request_duration_seconds_count{route="genre-list"} 1', metrics)
+        self.assertIn('api_responses_total{route="genre-list",status="200"} 1', metrics)
+
+    @override_settings(API_METRICS={'TOKEN': 's3cret'})
+    def test_metrics_restricted_to_scrapers_and_staff(self):
+        remote = {'REMOTE_ADDR': '203.0.113.7'}
+        # Sau reverse proxy cục bộ mọi request đều đến từ 127.0.0.1: không tin địa chỉ nếu không cấu hình
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(API_METRICS={'ALLOWED_IPS': ('127.0.0.1',)}):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', **remote).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer nope', **remote).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret', **remote).status_code, 200)
+
+        self.client.force_login(User.objects.create_user('fan', password='x', role=Role.objects.create(id=2, name='user')))
+        self.assertEqual(self.client.get('/metrics', **remote).status_code, 403)
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+        self.assertEqual(self.client.get('/metrics', **remote).status_code, 200)
+
+
+class ProfilingTests(TestCase):
+    @override_settings(API_PROFILING={'SLOW_LOG_SIZE': 3})
+    def test_slow_log_keeps_slowest_requests(self):
+        log = SlowRequestLog()
+        for duration in (5, 1, 9, 3, 7, 2, 7):
+            log.add({'path': f'/{duration}', 'duration_ms': duration})
+        self.assertEqual([entry['duration_ms'] for entry in log.entries()], [9, 7, 7])
+
+    def test_profile_flag_parsed_as_boolean(self):
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+        for value in ('0', 'false', 'no'):
+            self.assertIsInstance(self.client.get('/api/genres/', {'profile': value}).json(), list)
+        for value in ('1', 'true', 'Yes'):
+            self.assertIn('profile', self.client.get('/api/genres/', {'profile': value}).json())
+        self.assertIn('profile', self.client.get('/api/genres/', HTTP_X_PROFILE='1').json())
+
+    @override_settings(API_PROFILING={'SLOW_REQUEST_THRESHOLD': 0})
+    def test_slow_requests_captured_with_fingerprints(self):
+        slow_log.clear()
+        Genre.objects.bulk_create([Genre(name='Pop'), Genre(name='Rap')])
+        self.client.get('/api/genres/?limit=1')
+        entry = next(entry for entry in slow_log.entries() if entry['path'] == '/api/genres/?limit=1')
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(entry['query_count'], sum(fp['count'] for fp in entry['fingerprints']))
+        self.assertTrue(any('api_genre' in fp['fingerprint'] for fp in entry['fingerprints']))
+
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+        self.assertContains(self.client.get('/admin/slow-requests/'), '/api/genres/?limit=1')
+
+
+class SeedCatalogTests(TestCase):
+    def test_seed_creates_linked_catalog(self):
+        counts = seed_catalog(artists=5, listeners=5, songs=50, albums=10, playlists=20)
+
+        self.assertEqual(Song.objects.count(), 50)
+        self.assertEqual(Album.objects.count(), 10)
+        self.assertEqual(Playlist.objects.count(), 20)
+        self.assertEqual(User.objects.filter(role__id=1).count(), 5)
+        self.assertEqual(Song.artists.through.objects.values('song_id').distinct().count(), 50)
+        self.assertEqual(Playlist.songs.through.objects.count(), counts['playlist songs'])
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_every_endpoint_responds(self):
+        seed_catalog(artists=3, listeners=3, songs=20, albums=4, playlists=5)
+
+        results = run_benchmarks(repeat=1, warmup=0)
+
+        self.assertEqual(
+            set(results),
+            {
+                'songs-list', 'songs-search', 'songs-detail', 'songs-increase-play',
+                'albums-list', 'albums-detail', 'playlists-list', 'playlists-detail',
+                'artists-list', 'artists-detail', 'genres-list', 'landing-page',
+                'auth-login', 'auth-me',
+            },
+        )
+        for name, result in results.items():
+            self.assertEqual(result['status'], 200, name)
+            self.assertGreater(result['queries'], 0, name)
+
+
+class FastSongSerializerTests(TestCase):
+    """Golden test: đường đọc nhanh phải trả về y hệt ModelSerializer."""
+
+    def setUp(self):
+        artist_role = Role.objects.create(id=1, name='artist')
+        self.artists = [
+            User.objects.create(username='sontung', fullname='Sơn Tùng M-TP', role=artist_role),
+            User.objects.create(username='hieuthuhai', fullname=None, role=artist_role),
+        ]
+        pop, rap, indie = (Genre.objects.create(name=name) for name in ('Pop', 'Rap', 'Indie'))
+        album = Album.objects.create(title='m-tp M-TP', creator=self.artists[0], poster='posters/mtp-album.jpg')
+        self.album = album
+
+        first = Song.objects.create(title='Exit Sign', duration=215, url='songs/Exit_Sign.mp3',
+                                    thumbnail='thumbnails/LOGO.png', play_count=12)
+        first.genre.add(rap, pop)
+        first.albums.add(album)
+        first.artists.add(*reversed(self.artists))
+
+        second = Song.objects.create(title='Không Thể Say \u2028', duration=180, url='songs/Khong_The_Say.mp3')
+        second.genre.add(indie)
+        second.artists.add(self.artists[1])
+        second.albums.add(album)
+
+        Song.objects.create(title='Chưa có gì', duration=1)
+
+    def expected(self, serializer_class, songs):
+        return [serializer_class(song).data for song in songs]
+
+    def test_song_serializer_matches_model_serializer(self):
+        songs = Song.objects.order_by('id')
+        self.assertEqual(SongSerializer(songs, many=True).data, self.expected(SongSerializer, songs))
+
+    def test_song_mini_serializer_matches_model_serializer(self):
+        songs = Song.objects.order_by('-id')
+        self.assertEqual(SongMiniSerializer(songs, many=True).data, self.expected(SongMiniSerializer, songs))
+
+    def test_prefetched_instances(self):
+        songs = list(Song.objects.prefetch_related('artists').order_by('id'))
+        self.assertEqual(SongSerializer(songs[:2], many=True).data, self.expected(SongSerializer, songs[:2]))
+
+    def test_nested_album_songs(self):
+        data = AlbumSerializer(self.album).data
+        self.assertEqual(data['songs'], self.expected(SongMiniSerializer, self.album.songs.all()))
+
+    def test_song_list_endpoint(self):
+        response = self.client.get('/api/songs/')
+        self.assertEqual(response.json(), json.loads(JSONRenderer().render(self.expected(SongSerializer, Song.objects.all()))))
+        self.assertIn(b'\\u2028', response.content)
+
+
+class StreamingListTests(TestCase):
+    def test_ndjson_matches_list_response(self):
+        seed_catalog(artists=3, listeners=3, songs=30, albums=4, playlists=5)
+
+        response = self.client.get('/api/songs/', {'stream': 'ndjson'})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.client.get('/api/songs/').json())
+
+    def test_nested_lists_stream_without_per_row_queries(self):
+        fragments.clear()   # fragment của test trước (cùng pk, dữ liệu khác) còn trong cache của process
+        seed_catalog(artists=3, listeners=3, songs=30, albums=4, playlists=5)
+        Playlist.objects.create(name='by artist', user=Album.objects.first().creator).songs.add(*Song.objects.all()[:3])
+
+        def stream(path):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(path, {'stream': 'ndjson'})
+                lines = b''.join(response.streaming_content).splitlines()
+            self.assertEqual([json.loads(line) for line in lines], self.client.get(path).json())
+            return len(queries)
+
+        counts = [stream('/api/albums/'), stream('/api/playlists/')]
+        seed_catalog(artists=3, listeners=3, songs=60, albums=20, playlists=20)
+        self.assertEqual([stream('/api/albums/'), stream('/api/playlists/')], counts)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/songs/', {'stream': 'xml'}).status_code, 400)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create(username='dalab', fullname='Da LAB', role=Role.objects.create(id=1, name='artist'))
+        self.listener = User.objects.create(username='fan', role=Role.objects.create(name='user'))
+
+    def sync(self, since):
+        response = self.client.get('/api/sync/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_upserts_and_tombstones_since_cursor(self):
+        genre = Genre.objects.create(name='Pop')
+        song = Song.objects.create(title='Lời Tạm Biệt Chưa Nói', duration=200)
+        song.genre.add(genre)
+        song.artists.add(self.artist)
+        first = self.sync(0)
+        self.assertEqual(first['changes']['songs']['upserts'][0]['genre_ids'], [genre.id])
+        self.assertEqual(first['changes']['artists']['upserts'][0]['id'], self.artist.id)
+        self.assertNotIn('artists', {key for key, value in first['changes'].items() if value['deletes']})
+
+        playlist = Playlist.objects.create(name='Chill', user=self.listener)
+        song.playlist_set.add(playlist)
+        song.play_count += 1
+        song.save(update_fields=['play_count'])
+        second = self.sync(first['cursor'])
+        # Bài vào playlist: bài và artist của nó được ghi lại cho client của chủ playlist
+        self.assertEqual(set(second['changes']), {'playlists', 'songs', 'artists'})
+        self.assertEqual(second['changes']['playlists']['upserts'][0]['song_ids'], [song.id])
+
+        song_id = song.id
+        song.delete()
+        third = self.sync(second['cursor'])
+        self.assertEqual(third['changes']['songs'], {'upserts': [], 'deletes': [song_id]})
+        self.assertEqual(third['changes']['playlists']['upserts'][0]['song_ids'], [])
+
+        self.assertEqual(self.sync(third['cursor'])['changes'], {})
+
+    def test_authenticated_sync_is_scoped_to_library(self):
+        other = User.objects.create(username='other', role=self.listener.role)
+        mine, theirs, liked = (Song.objects.create(title=title, duration=200) for title in ('Mine', 'Theirs', 'Liked'))
+        mine.artists.add(self.artist)
+        Playlist.objects.create(name='Của tôi', user=self.listener).songs.add(mine)
+        Playlist.objects.create(name='Của người khác', user=other).songs.add(theirs)
+        SongLike.objects.create(user=self.listener, song=liked)
+
+        client = APIClient()
+        client.force_authenticate(self.listener)
+        first = client.get('/api/sync/', {'since': 0}).json()
+        self.assertEqual({song['id'] for song in first['changes']['songs']['upserts']}, {mine.id, liked.id})
+        self.assertEqual([playlist['name'] for playlist in first['changes']['playlists']['upserts']], ['Của tôi'])
+        self.assertEqual([artist['id'] for artist in first['changes']['artists']['upserts']], [self.artist.id])
+
+        theirs.title = 'Theirs (remix)'
+        theirs.save()
+        self.assertEqual(client.get('/api/sync/', {'since': first['cursor']}).json()['changes'], {})
+
+        # Artist đổi role: tombstone như khi bị xoá
+        self.artist.role = self.listener.role
+        self.artist.save()
+        changes = client.get('/api/sync/', {'since': first['cursor']}).json()['changes']
+        self.assertEqual(changes['artists'], {'upserts': [], 'deletes': [self.artist.id]})
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportCatalogTests(TestCase):
+    def test_import_resumes_after_failures(self):
+        directory = tempfile.mkdtemp()
+        for name in ('a', 'b', 'c'):
+            with open(f'{directory}/{name}.wav', 'wb') as f:
+                f.write(wav_file(f'{name}.wav', np.zeros(8000)).read())
+        with open(f'{directory}/d.wav', 'wb') as f:
+            f.write(b'not audio')
+        metadata = f'{directory}/catalog.jsonl'
+        with open(metadata, 'w', encoding='utf-8') as f:
+            for name in ('a', 'b', 'c', 'd'):
+                f.write(json.dumps({'file': f'{name}.wav', 'title': name.upper(), 'artists': 'Đen; MCK',
+                                    'albums': ['Mưa'], 'genres': ['Rap']}) + '\n')
+
+        call_command('import_catalog', directory, metadata, workers=1, batch_size=2, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(sorted(Song.objects.values_list('title', flat=True)), ['A', 'B', 'C'])
+        with open(f'{metadata}.progress', encoding='utf-8') as f:
+            self.assertEqual(f.read().split(), ['a.wav', 'b.wav', 'c.wav'])
+
+        # Chạy lại: chỉ file lỗi được thử lại, artist / album / genre dùng lại bản đã tạo
+        with open(f'{directory}/d.wav', 'wb') as f:
+            f.write(wav_file('d.wav', np.zeros(8000)).read())
+        out = StringIO()
+        call_command('import_catalog', directory, metadata, workers=1, batch_size=2, stdout=out, stderr=StringIO())
+        self.assertIn('Resuming: 3 already imported, 1 left', out.getvalue())
+        self.assertEqual(sorted(Song.objects.values_list('title', flat=True)), ['A', 'B', 'C', 'D'])
+        self.assertEqual(User.objects.filter(role_id=1).count(), 2)
+        self.assertEqual((Album.objects.count(), Genre.objects.count()), (1, 1))
+        song = Song.objects.get(title='D')
+        self.assertEqual(song.duration, 1)
+        self.assertEqual(sorted(song.artists.values_list('fullname', flat=True)), ['MCK', 'Đen'])
+        # bulk_create không bắn signal: phân tích audio được xếp riêng cho từng bài đã import
+        self.assertEqual(sorted(Job.objects.filter(task='analyze_song').values_list('kwargs__song_id', flat=True)),
+                         sorted(Song.objects.values_list('id', flat=True)))
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_rolled_back_batch_removes_stored_files(self):
+        directory = tempfile.mkdtemp()
+        with open(f'{directory}/a.wav', 'wb') as f:
+            f.write(wav_file('a.wav', np.zeros(8000)).read())
+        metadata = f'{directory}/catalog.jsonl'
+        with open(metadata, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'file': 'a.wav', 'title': 'A', 'artists': 'Đen'}) + '\n')
+
+        def fail_on_songs(key, ids, **kwargs):
+            if key == 'songs':   # sau khi file đã được ghi vào storage
+                raise RuntimeError('db down')
+
+        with mock.patch('api.management.commands.import_catalog.record_changes', side_effect=fail_on_songs), \
+                self.assertRaises(RuntimeError):
+            call_command('import_catalog', directory, metadata, workers=1, stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Song.objects.exists())
+        songs_dir = os.path.join(settings.MEDIA_ROOT, 'songs')
+        self.assertEqual(os.listdir(songs_dir) if os.path.isdir(songs_dir) else [], [])
+
+
+class SimilarSongsTests(TestCase):
+    def test_playlist_cooccurrence_ranks_neighbours(self):
+        artist = User.objects.create(username='mck', role=Role.objects.create(id=1, name='artist'))
+        a, b, c, d = (Song.objects.create(title=title, duration=180) for title in 'abcd')
+        for song in (a, b, c, d):
+            song.artists.add(artist)
+        for name, songs in (('one', [a, b]), ('two', [a, b, c]), ('three', [c, d])):
+            Playlist.objects.create(name=name, user=artist).songs.add(*songs)
+
+        self.assertEqual(build_similar_songs(top_k=2), 4)
+        response = self.client.get(f'/api/songs/{a.id}/similar/')
+
+        self.assertEqual([song['id'] for song in response.json()], [b.id, c.id])
+        self.assertEqual(build_similar_songs(), 0)
+        self.assertEqual(self.client.get('/api/songs/999/similar/').status_code, 404)
+        self.assertEqual(self.client.get('/api/songs/abc/similar/').status_code, 404)
+
+
+class HomeFeedTests(TestCase):
+    def test_personalized_feed_with_global_fallback(self):
+        seed_catalog(artists=3, listeners=4, songs=40, albums=4, playlists=8, seed=7)
+        build_similar_songs()
+        listener = Playlist.objects.first().user
+
+        self.assertGreater(build_home_feeds(), 0)
+        client = APIClient()
+        client.force_authenticate(listener)
+        feed = client.get('/api/landing-page/').json()
+
+        self.assertTrue(feed['personalized'])
+        owned = set(Playlist.songs.through.objects.filter(playlist__user=listener).values_list('song_id', flat=True))
+        self.assertTrue(feed['recommended_songs'])
+        self.assertFalse(owned & {song['id'] for song in feed['recommended_songs']})
+        anonymous = self.client.get('/api/landing-page/').json()
+        self.assertNotIn('personalized', anonymous)
+        self.assertLessEqual(set(anonymous), set(feed))
+        self.assertEqual(feed['random_albums'], feed['recommended_albums'])
+
+
+def wav_file(name, samples, rate=8000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(samples.shape[1] if samples.ndim == 2 else 1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='audio/wav')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), API_AUDIO={'WAVEFORM_POINTS': 100})
+class WaveformTests(TestCase):
+    def test_peaks_served_as_binary(self):
+        # 1 giây im lặng rồi 1 giây sine 1 kHz biên độ 0.5 (-9 LUFS)
+        t = np.arange(8000) / 8000
+        samples = np.concatenate([np.zeros(8000), 0.5 * np.sin(2 * np.pi * 1000 * t)])
+        song = Song.objects.create(title='tone', duration=2, url=wav_file('tone.wav', samples))
+        self.assertEqual(self.client.get(f'/api/songs/{song.id}/waveform/').status_code, 404)
+        self.assertEqual(self.client.get('/api/songs/abc/waveform/').status_code, 404)
+
+        self.assertTrue(analyze_song(song))
+        response = self.client.get(f'/api/songs/{song.id}/waveform/')
+
+        peaks = np.frombuffer(response.content, dtype=np.int8).reshape(-1, 2)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(peaks.shape, (100, 2))
+        self.assertFalse(peaks[:50].any())
+        self.assertTrue((abs(peaks[50:] - [-64, 64]) <= 1).all())
+
+        encoded = self.client.get(f'/api/songs/{song.id}/waveform/', {'encoding': 'base64'}).json()
+        self.assertEqual(base64.b64decode(encoded['peaks']), response.content)
+        cached = self.client.get(f'/api/songs/{song.id}/waveform/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_loudness_and_gain(self):
+        t = np.arange(16000) / 8000
+        song = Song.objects.create(title='tone', duration=2, url=wav_file('loud.wav', 0.5 * np.sin(2 * np.pi * 1000 * t)))
+        analyze_song(song)
+
+        data = self.client.get(f'/api/songs/{song.id}/').json()
+        self.assertAlmostEqual(data['loudness'], -9.0, delta=0.5)
+        self.assertAlmostEqual(data['peak'], -6.0, delta=0.1)
+        self.assertAlmostEqual(data['gain'], -14.0 - data['loudness'], delta=0.01)
+        self.assertEqual(self.client.get('/api/songs/').json()[0]['gain'], data['gain'])
+
+    def test_stereo_loudness_sums_channels(self):
+        # Tín hiệu chuẩn EBU Tech 3341: sine 1 kHz -23 dBFS trên cả hai kênh đo được -23 LUFS
+        t = np.arange(96000) / 48000
+        tone = 10 ** (-23 / 20) * np.sin(2 * np.pi * 1000 * t)
+        song = Song.objects.create(title='ebu', duration=2,
+                                   url=wav_file('ebu.wav', np.stack([tone, tone], axis=1), rate=48000))
+        analyze_song(song)
+        song.refresh_from_db()
+        self.assertAlmostEqual(song.loudness, -23.0, delta=0.1)
+
+    def test_24_bit_wav_falls_back_to_ffmpeg(self):
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(3)
+            f.setframerate(8000)
+            f.writeframes(bytes(3 * 8000))
+        song = Song.objects.create(title='hi-res', duration=1,
+                                   url=SimpleUploadedFile('hires.wav', buffer.getvalue(), content_type='audio/wav'))
+        t = np.arange(22050) / 22050
+        pcm = np.repeat(0.5 * np.sin(2 * np.pi * 1000 * t), 2).astype('<f4').tobytes()
+        with mock.patch('api.audio.subprocess.run', return_value=mock.Mock(stdout=pcm)) as run:
+            analyze_song(song)
+        self.assertIn('-ac', run.call_args.args[0])
+        song.refresh_from_db()
+        # Hai kênh giống hệt nhau (file mono được ffmpeg nhân đôi) đo như mono
+        self.assertAlmostEqual(song.loudness, -9.0, delta=0.5)
+
+    def test_peak_measured_per_channel(self):
+        # Hai kênh ngược pha: downmix mono im lặng một nửa, nhưng gain vẫn phải theo peak -6 dBFS của từng kênh
+        t = np.arange(16000) / 8000
+        tone = 0.5 * np.sin(2 * np.pi * 1000 * t)
+        left = np.where(t < 1, tone, 0.25 * tone)
+        right = np.where(t < 1, -tone, 0.25 * tone)
+        song = Song.objects.create(title='wide', duration=2, url=wav_file('wide.wav', np.stack([left, right], axis=1)))
+        analyze_song(song)
+
+        data = self.client.get(f'/api/songs/{song.id}/').json()
+        self.assertAlmostEqual(data['peak'], -6.0, delta=0.1)
+        self.assertLessEqual(data['gain'], -data['peak'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FingerprintTests(TestCase):
+    def test_reupload_flagged_and_merged(self):
+        rng = np.random.default_rng(1)
+        t = np.arange(8000 * 6) / 8000
+        melody = sum(np.sin(2 * np.pi * f * t) * (np.sin(2 * np.pi * r * t) > 0) for f, r in
+                     ((440, 0.5), (660, 0.7), (990, 0.3), (1500, 1.1), (2200, 0.9)))
+        melody = 0.15 * melody + 0.02 * rng.standard_normal(len(t))
+        other = 0.3 * rng.standard_normal(len(t))
+
+        original = Song.objects.create(title='Exit Sign', duration=6, url=wav_file('Exit_Sign.wav', melody), play_count=3)
+        analyze_song(original)
+        # Re-upload: nhỏ hơn, thêm nhiễu, thêm im lặng ở đầu
+        copy = np.concatenate([np.zeros(800), 0.6 * melody + 0.005 * rng.standard_normal(len(t))])
+        duplicate = Song.objects.create(title='Exit Sign', duration=6, url=wav_file('Exit_Sign_2.wav', copy), play_count=2)
+        with self.assertLogs('api.audio', 'WARNING'):
+            analyze_song(duplicate)
+        unrelated = Song.objects.create(title='Noise', duration=6, url=wav_file('noise.wav', other))
+        analyze_song(unrelated)
+
+        self.assertEqual(Fingerprint.objects.get(song=duplicate).duplicate_of_id, original.id)
+        self.assertIsNone(Fingerprint.objects.get(song=unrelated).duplicate_of_id)
+
+        playlist = Playlist.objects.create(name='Chill', user=User.objects.create(username='fan', role=Role.objects.create(name='user')))
+        playlist.songs.add(duplicate)
+        call_command('dedupe_songs', '--merge', stdout=StringIO())
+
+        self.assertEqual(set(Song.objects.values_list('id', flat=True)), {original.id, unrelated.id})
+        self.assertEqual(Song.objects.get(id=original.id).play_count, 5)
+        self.assertEqual(list(playlist.songs.all()), [original])
+
+
+class PlayQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='fan', role=Role.objects.create(name='user'))
+        self.songs = [Song.objects.create(title=f'song {n}', duration=180) for n in range(8)]
+        self.playlist = Playlist.objects.create(name='Road trip', user=self.user)
+        self.playlist.songs.add(*self.songs)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ids(self, state):
+        return [state['current']['song']['id']] + [entry['song']['id'] for entry in state['next']]
+
+    def test_queue_operations(self):
+        ids = [song.id for song in self.songs]
+        state = self.client.post('/api/me/queue/', {'source': 'playlist', 'id': self.playlist.id}, format='json').json()
+        self.assertEqual(self.ids(state), ids[:6])
+
+        state = self.client.post('/api/me/queue/next/?ahead=2').json()
+        self.assertEqual(self.ids(state), ids[1:4])
+        self.assertEqual(len(state['prefetch']), 0)  # bài không có file
+
+        state = self.client.post('/api/me/queue/insert/?ahead=2', {'song_id': ids[7]}, format='json').json()
+        self.assertEqual(self.ids(state), [ids[1], ids[7], ids[2]])
+
+        last = state['next'][1]['item_id']
+        state = self.client.post('/api/me/queue/move/?ahead=2', {'item_id': last, 'after_item_id': state['current']['item_id']},
+                                 format='json').json()
+        self.assertEqual(self.ids(state), [ids[1], ids[2], ids[7]])
+
+        self.assertEqual(self.client.post('/api/me/queue/previous/').json()['current']['song']['id'], ids[0])
+        self.assertEqual(self.client.post('/api/me/queue/previous/').status_code, 409)
+
+    def test_seeded_shuffle_is_reproducible_and_reversible(self):
+        body = {'source': 'playlist', 'id': self.playlist.id, 'shuffle': True, 'seed': 42,
+                'start_song_id': self.songs[3].id}
+        first = self.ids(self.client.post('/api/me/queue/?ahead=50', body, format='json').json())
+        second = self.ids(self.client.post('/api/me/queue/?ahead=50', body, format='json').json())
+
+        self.assertEqual(first, second)
+        self.assertEqual(first[0], self.songs[3].id)
+        self.assertEqual(sorted(first), [song.id for song in self.songs])
+
+        state = self.client.post('/api/me/queue/shuffle/?ahead=50', {'shuffle': False}, format='json').json()
+        self.assertEqual(self.ids(state), [song.id for song in self.songs[3:]])
+
+        # Giá trị form 'false' là False, không phải chuỗi khác rỗng
+        self.client.post('/api/me/queue/shuffle/', {'shuffle': 'true', 'seed': 7})
+        state = self.client.post('/api/me/queue/shuffle/?ahead=50', {'shuffle': 'false'}).json()
+        self.assertEqual(self.ids(state), [song.id for song in self.songs[3:]])
+        self.assertEqual(self.client.post('/api/me/queue/shuffle/', {'shuffle': 'maybe'}).status_code, 400)
+
+        PlayQueueItem.objects.all().delete()
+        self.assertEqual(self.client.post('/api/me/queue/shuffle/', {'shuffle': True}, format='json').status_code, 200)
+
+
+class LibraryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.artist = User.objects.create(username='mck', role=Role.objects.create(id=1, name='artist'))
+        self.user = User.objects.create(username='fan', role=Role.objects.create(name='user'))
+        self.songs = [Song.objects.create(title=f'song {n}', duration=180) for n in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_likes_annotate_song_lists(self):
+        for song in self.songs[:2]:
+            self.assertEqual(self.client.post(f'/api/songs/{song.id}/like/').status_code, 201)
+        self.assertEqual(self.client.post(f'/api/songs/{self.songs[0].id}/like/').status_code, 200)
+        self.client.delete(f'/api/songs/{self.songs[1].id}/like/')
+        self.client.post(f'/api/artists/{self.artist.id}/follow/')
+
+        liked = {song['id']: song['is_liked'] for song in self.client.get('/api/songs/').json()}
+        self.assertEqual(liked, {self.songs[0].id: True, self.songs[1].id: False, self.songs[2].id: False})
+        # Tập id đã cache: trang sau không tốn thêm query nào so với khách
+        with self.assertNumQueries(4):
+            self.client.get('/api/songs/')
+        self.assertFalse(any(song['is_liked'] for song in APIClient().get('/api/songs/').json()))
+
+        self.assertEqual([song['id'] for song in self.client.get('/api/me/likes/songs/').json()], [self.songs[0].id])
+        self.assertEqual([user['id'] for user in self.client.get('/api/me/likes/artists/').json()], [self.artist.id])
+        self.assertEqual(self.client.post(f'/api/artists/{self.user.id}/follow/').status_code, 404)
+        self.assertEqual(self.client.post('/api/songs/abc/like/').status_code, 404)
+        self.assertEqual(self.client.delete('/api/albums/abc/like/').status_code, 404)
+
+
+    def test_likes_in_own_playlists(self):
+        playlist = Playlist.objects.create(name='mine', user=self.user)
+        playlist.songs.add(*self.songs[:2])
+        self.client.post(f'/api/songs/{self.songs[0].id}/like/')
+
+        songs = self.client.get('/api/auth/me/').json()['playlists'][0]['songs']
+        self.assertEqual({song['id']: song['is_liked'] for song in songs}, {self.songs[0].id: True, self.songs[1].id: False})
+        response = self.client.get('/api/auth/me/library/', {'stream': 'json'})
+        songs = json.loads(b''.join(response.streaming_content))[0]['songs']
+        self.assertEqual({song['id']: song['is_liked'] for song in songs}, {self.songs[0].id: True, self.songs[1].id: False})
+
+class ArtistStatsTests(TestCase):
+    def test_incremental_stats_and_daily_deltas(self):
+        artist = User.objects.create(username='wren', role=Role.objects.create(id=1, name='artist'))
+        Album.objects.create(title='Một Vạn Năm', creator=artist)
+        songs = [Song.objects.create(title=f'song {n}', duration=180, play_count=n * 10) for n in range(4)]
+        for song in songs:
+            song.artists.add(artist)
+        self.assertEqual(self.client.get(f'/api/artists/{artist.id}/stats/').status_code, 404)
+        self.assertEqual(self.client.get('/api/artists/abc/stats/').status_code, 404)
+
+        self.assertEqual(build_artist_stats(), 1)
+        self.assertEqual(build_artist_stats(), 0)
+        Song.objects.filter(id=songs[0].id).update(play_count=100)
+        self.assertEqual(build_artist_stats(), 1)
+
+        data = self.client.get(f'/api/artists/{artist.id}/stats/').json()
+        self.assertEqual((data['total_plays'], data['song_count'], data['album_count']), (160, 4, 1))
+        self.assertEqual([song['id'] for song in data['top_songs']], [songs[0].id, songs[3].id, songs[2].id, songs[1].id])
+        self.assertEqual([day['plays'] for day in data['daily_plays']], [100])
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        seed_catalog(artists=2, listeners=2, songs=10, albums=3, playlists=2)
+        self.user = User.objects.get(username='user1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_matches_individual_requests(self):
+        album_ids = list(Album.objects.values_list('id', flat=True)[:2])
+        paths = ['/api/auth/me/', '/api/genres/', f'/api/albums/{album_ids[0]}/',
+                 f'/api/albums/?ids={",".join(map(str, album_ids))}']
+        response = self.client.post('/api/batch/', {'requests': [{'id': 'me', 'path': paths[0]}, *paths[1:],
+                                                                 '/api/albums/999999/', '/api/nope/'],
+                                                    }, format='json')
+
+        results = response.json()['responses']
+        self.assertEqual(results[0]['id'], 'me')
+        for path, result in zip(paths, results):
+            self.assertEqual(result['status'], 200)
+            self.assertEqual(result['body'], self.client.get(path).json())
+        self.assertEqual(sorted(album['id'] for album in results[3]['body']), sorted(album_ids))
+        self.assertEqual([result['status'] for result in results[4:]], [404, 404])
+
+    def test_rejects_non_get_and_bad_ids(self):
+        response = self.client.post('/api/batch/', [{'path': '/api/songs/', 'method': 'POST'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/songs/', {'ids': 'a,b'}).status_code, 400)
+
+    def test_failing_item_does_not_fail_batch(self):
+        with mock.patch('api.views.GenreViewSet.list', side_effect=RuntimeError('boom')), \
+                self.assertLogs('api.batch', 'ERROR'):
+            response = self.client.post('/api/batch/', ['/api/genres/', '/api/auth/me/'], format='json')
+        self.assertEqual(response.status_code, 200)
+        failed, ok = response.json()['responses']
+        self.assertEqual((failed['status'], failed['body']), (500, {'error': 'Internal server error'}))
+        self.assertEqual(ok['status'], 200)
+
+
+@override_settings(API_REALTIME={'COALESCE_INTERVAL': 0.05, 'KEEPALIVE': 5})
+class RealtimeTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def take(self, messages, count):
+        async def collect():
+            return [await messages.__anext__() for _ in range(count)]
+        return self.loop.run_until_complete(asyncio.wait_for(collect(), 2))
+
+    def test_signals_publish_coalesced_updates(self):
+        user = User.objects.create(username='fan', role=Role.objects.create(name='user'))
+        song = Song.objects.create(title='Exit Sign', duration=200)
+        playlist = Playlist.objects.create(name='Chill', user=user)
+        subscription = hub.subscribe({f'song:{song.id}', f'playlist:{playlist.id}'}, self.loop)
+        self.addCleanup(hub.unsubscribe, subscription)
+        messages = subscription.messages()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                song.play_count += 1
+                song.save(update_fields=['play_count'])
+            playlist.songs.add(song)
+        received = dict(self.take(messages, 2))
+        self.assertEqual(received[f'song:{song.id}'], {'id': song.id, 'play_count': 5})
+        self.assertEqual(received[f'playlist:{playlist.id}']['song_ids'], [song.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            song.play_count += 1
+            song.save(update_fields=['play_count'])
+        self.assertEqual(self.take(messages, 1), [(f'song:{song.id}', {'id': song.id, 'play_count': 6})])
+
+    def test_closed_loop_does_not_break_writes(self):
+        song = Song.objects.create(title='Exit Sign', duration=200)
+        loop = asyncio.new_event_loop()
+        hub.subscribe({f'song:{song.id}'}, loop)
+        loop.close()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/songs/{song.id}/increase-play/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hub.has_subscribers(f'song:{song.id}'))
+
+    def test_events_need_asgi(self):
+        self.assertEqual(self.client.get('/api/events/', {'topics': 'song:1'}).status_code, 501)
+
+    def test_websocket(self):
+        inbox, sent = asyncio.Queue(), []
+
+        async def scenario():
+            await inbox.put({'type': 'websocket.connect'})
+            task = asyncio.ensure_future(websocket_app(
+                {'type': 'websocket', 'path': '/api/ws/', 'query_string': b'topics=song:7', 'headers': []},
+                inbox.get, lambda message: asyncio.sleep(0, sent.append(message)),
+            ))
+            await asyncio.sleep(0.01)
+            hub.publish('song:7', {'id': 7, 'play_count': 1})
+            await asyncio.sleep(0.02)
+            await inbox.put({'type': 'websocket.disconnect'})
+            await task
+
+        self.loop.run_until_complete(scenario())
+        self.assertEqual(sent[0], {'type': 'websocket.accept'})
+        self.assertEqual(json.loads(sent[1]['text']), {'topic': 'song:7', 'data': {'id': 7, 'play_count': 1}})
+        self.assertFalse(hub.has_subscribers('song:7'))
+
+    def test_user_topics_are_private(self):
+        user = User(pk=3)
+        self.assertEqual(parse_topics('user:me,song:1', user), {'user:3', 'song:1'})
+        with self.assertRaises(TopicError):
+            parse_topics('user:4', user)
+        with self.assertRaises(TopicError):
+            parse_topics('user:me', None)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        fragments.clear()
+        self.artist = User.objects.create(username='mck', fullname='MCK', role=Role.objects.create(id=1, name='artist'))
+        self.song = Song.objects.create(title='Chìm Sâu', duration=200)
+        self.song.artists.add(self.artist)
+        self.song.genre.add(Genre.objects.create(name='Rap'))
+
+    def test_nested_fragments_are_cached_and_invalidated(self):
+        self.client.get('/api/songs/')
+        self.assertEqual(SongSerializer(self.song).data['artist'], [{'id': self.artist.id, 'username': 'mck', 'fullname': 'MCK'}])
+        stats = fragments.stats()['fragments']
+        self.assertEqual((stats['artist']['hits'], stats['artist']['misses']), (1, 1))
+        self.assertEqual(stats['genre']['misses'], 1)
+
+        self.artist.fullname = 'RPT MCK'
+        self.artist.save()
+        self.assertEqual(self.client.get('/api/songs/').json()[0]['artist'][0]['fullname'], 'RPT MCK')
+        self.assertEqual(fragments.stats()['fragments']['artist']['misses'], 2)
+        with override_settings(API_METRICS={'TOKEN': 't'}):
+            metrics = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer t').content
+        self.assertIn(b'api_fragment_cache_requests_total{fragment="artist",result="hit"} 1', metrics)
+
+    def test_local_entries_expire(self):
+        build = mock.Mock(side_effect=lambda pks: {pk: {'id': pk} for pk in pks})
+        with mock.patch('api.fragments.time.monotonic', return_value=100.0):
+            fragments.get_many('genre', [5], build)
+            fragments.get_many('genre', [5], build)
+        self.assertEqual(build.call_count, 1)
+        # Process khác đổi genre: không có invalidation ở đây, entry cũ hết hạn sau LOCAL_TIMEOUT
+        with mock.patch('api.fragments.time.monotonic', return_value=131.0):
+            fragments.get_many('genre', [5], build)
+        self.assertEqual(build.call_count, 2)
+
+    @override_settings(API_FRAGMENTS={'MAX_ENTRIES': 2})
+    def test_lru_bound_and_stale_builds(self):
+        build = lambda pks: {pk: {'id': pk} for pk in pks}
+        fragments.get_many('album', [1, 2, 3], build)
+        self.assertEqual(fragments.stats()['entries'], 2)
+
+        # Fragment dựng trước khi invalidate mang version cũ nên không được dùng lại
+        def stale_build(pks):
+            fragments.invalidate('album', 9)
+            return {pk: {'id': pk, 'title': 'old'} for pk in pks}
+        fragments.get_many('album', [9], stale_build)
+        self.assertEqual(fragments.get_many('album', [9], build), {9: {'id': 9}})
+
+
+@override_settings(API_THROTTLE={
+    'BUCKETS': {'default': (100.0, 100), 'play': (0.5, 2), 'search': (1.0, 1)},
+    'ROUTES': {'song-increase-play': ('play', 1), 'song-similar': ('search', 1)},
+    'QUERY_PARAMS': {'search': ('search', 1)},
+})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        throttle_store.clear()
+        self.addCleanup(throttle_store.clear)
+        self.song = Song.objects.create(title='Tràn Bộ Nhớ', duration=200)
+
+    def test_route_costs_and_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post(f'/api/songs/{self.song.id}/increase-play/').status_code, 200)
+        response = self.client.post(f'/api/songs/{self.song.id}/increase-play/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+        self.song.refresh_from_db()
+        self.assertEqual(self.song.play_count, 2)
+
+        # Bucket riêng cho từng user / route: các endpoint khác không bị ảnh hưởng
+        self.assertEqual(self.client.get('/api/songs/').status_code, 200)
+        user = User.objects.create(username='fan', role=Role.objects.create(name='user'))
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.post(f'/api/songs/{self.song.id}/increase-play/').status_code, 200)
+
+    def test_query_param_cost(self):
+        self.assertEqual(self.client.get('/api/songs/', {'search': 'tràn'}).status_code, 200)
+        self.assertEqual(self.client.get('/api/songs/', {'search': 'bộ'}).status_code, 429)
+        self.assertEqual(self.client.get('/api/songs/').status_code, 200)
+
+    def test_batched_requests_pay_route_cost(self):
+        path = f'/api/songs/{self.song.id}/similar/'
+        results = self.client.post('/api/batch/', {'requests': [path, path]}, content_type='application/json')
+        self.assertEqual([result['status'] for result in results.json()['responses']], [200, 429])
+
+    def test_key_limit_is_enforced(self):
+        with override_settings(API_THROTTLE={'MAX_KEYS': 32, 'SHARDS': 4}):
+            store = BucketStore()
+            for n in range(500):
+                store.consume([(f'default:ip-{n}', 0.001, 10, 1)], now=float(n))
+            self.assertLessEqual(sum(len(shard.buckets) for shard in store.shards), 32)
+            # Bucket mới nhất còn giữ, bucket cũ nhất đã bị bỏ
+            self.assertTrue(any('default:ip-499' in shard.buckets for shard in store.shards))
+            self.assertFalse(any('default:ip-0' in shard.buckets for shard in store.shards))
+            # Bucket vừa dùng lại được coi là mới, không bị bỏ trước các bucket khác
+            shard = store.shards[0]
+            used, evicted = list(shard.buckets)[:2]
+            store.consume([(used, 0.001, 10, 1)], now=500.0)
+            new = next(key for key in (f'default:ip-{n}' for n in range(500, 1000))
+                       if store._shard(key) is shard and key not in shard.buckets)
+            store.consume([(new, 0.001, 10, 1)], now=501.0)
+            self.assertIn(used, shard.buckets)
+            self.assertNotIn(evicted, shard.buckets)
+
+    def test_bucket_refills(self):
+        charge = [('play:user-1', 2.0, 2, 1)]
+        self.assertEqual(throttle_store.consume(charge, now=0.0), 0.0)
+        self.assertEqual(throttle_store.consume(charge, now=0.0), 0.0)
+        self.assertEqual(throttle_store.consume(charge, now=0.0), 0.5)
+        self.assertEqual(throttle_store.consume(charge, now=0.5), 0.0)
+
+
+@override_settings(API_PASSWORDS={'WORKERS': 0, 'ITERATIONS': 1000})
+class PasswordTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Role.objects.create(id=1, name='artist')
+        self.role = Role.objects.create(name='user')
+
+    def login(self, password='secret-pass'):
+        return self.client.post('/api/auth/login/', {'username': 'fan', 'password': password})
+
+    def test_register_login_cache_and_rehash(self):
+        response = self.client.post('/api/auth/register/', {'username': 'fan', 'password': 'secret-pass', 'role': self.role.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(User.objects.get(username='fan').password.startswith('pbkdf2_sha256$1000$'))
+
+        with mock.patch.object(passwords, '_check', wraps=passwords._check) as check:
+            token = self.login().json()['token']
+            self.assertEqual(self.login().json()['token'], token)
+            self.assertEqual(self.login('wrong').status_code, 400)
+        self.assertEqual(check.call_count, 2)
+
+        # Tham số mới: login kế tiếp băm lại, token cũ trong cache không còn dùng được
+        with override_settings(API_PASSWORDS={'WORKERS': 0, 'ITERATIONS': 2000}):
+            self.assertEqual(self.login().status_code, 200)
+        self.assertTrue(User.objects.get(username='fan').password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_backpressure(self):
+        User.objects.create_user(username='fan', password='secret-pass', role=self.role)
+        full = mock.Mock(acquire=mock.Mock(return_value=False))
+        with override_settings(API_PASSWORDS={'WORKERS': 2, 'QUEUE_TIMEOUT': 0}), \
+                mock.patch.object(passwords, '_executor', return_value=(None, full)):
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_broken_pool_is_rebuilt(self):
+        def pool(broken):
+            future = Future()
+            future.set_exception(BrokenProcessPool()) if broken else future.set_result('hashed')
+            return mock.Mock(submit=mock.Mock(return_value=future))
+
+        pools = [pool(True), pool(False)]
+        with override_settings(API_PASSWORDS={'WORKERS': 2}), \
+                mock.patch.object(passwords, '_pool', None), \
+                mock.patch.object(passwords, 'ProcessPoolExecutor', side_effect=pools) as executor:
+            self.assertEqual(passwords.make_password('secret-pass'), 'hashed')
+            self.assertEqual(passwords.make_password('secret-pass'), 'hashed')
+        self.assertEqual(executor.call_count, 2)
+        pools[0].shutdown.assert_called_once()
+
+
+calls = []
+
+
+@task(name='test_record', priority=0)
+def record_task(value):
+    calls.append(value)
+
+
+@task(name='test_flaky', max_attempts=2)
+def flaky_task():
+    raise RuntimeError('boom')
+
+
+@override_settings(API_JOBS={'EAGER': False})
+class JobTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_priorities_and_idempotency_keys(self):
+        enqueue('test_record', value='low', priority=-1)
+        first = enqueue('test_record', key='same', value='keyed')
+        self.assertEqual(enqueue('test_record', key='same', value='again').pk, first.pk)
+        enqueue('test_record', value='high', priority=5)
+        enqueue('test_record', value='later', delay=60)
+
+        self.assertEqual(run_worker(threads=1, once=True), 3)
+        self.assertEqual(calls, ['high', 'keyed', 'low'])
+        # Job cùng key đã xong: được xếp lại
+        self.assertNotEqual(enqueue('test_record', key='same', value='new').pk, first.pk)
+
+    def test_key_queues_behind_running_job(self):
+        first = enqueue('test_record', key='song:1', value='old')
+        Job.objects.filter(pk=first.pk).update(status=Job.RUNNING)
+        # Dữ liệu đổi trong lúc job cũ đang chạy: phải có job mới chạy sau
+        second = enqueue('test_record', key='song:1', value='new')
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertEqual(enqueue('test_record', key='song:1', value='again').pk, second.pk)
+
+        Job.objects.filter(pk=first.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 0)
+        self.assertEqual(Job.objects.get(pk=first.pk).status, Job.FAILED)
+        run_worker(threads=1, once=True)
+        self.assertEqual(calls, ['new'])
+
+    def test_retries_with_backoff(self):
+        job = enqueue('test_flaky')
+        with self.assertLogs('api.jobs', 'WARNING'):
+            run_worker(threads=1, once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, job.createAt)
+        self.assertIn('RuntimeError: boom', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=job.createAt)
+        with self.assertLogs('api.jobs', 'ERROR'):
+            run_worker(threads=1, once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_save_hooks_and_dashboard(self):
+        artist = User.objects.create(username='wren', role=Role.objects.create(id=1, name='artist'))
+        song = Song.objects.create(title='Hai Mươi Hai', duration=200)
+        song.artists.add(artist)
+        # Lượt nghe không xếp job, cũng không query bảng Job
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                song.play_count += 1
+                song.save(update_fields=['play_count'])
+        self.assertEqual(len(queries), 3)
+        song.title = 'Hai Mươi Ba'
+        song.save()
+        self.assertEqual(Job.objects.filter(task='song_artist_stats').count(), 1)
+
+        Job.objects.update(run_at=timezone.now())
+        run_worker(threads=1, once=True)
+        self.assertEqual(ArtistStats.objects.get(artist=artist).total_plays, 3)
+
+        admin_user = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(admin_user)
+        response = self.client.get('/admin/jobs/')
+        self.assertContains(response, 'song_artist_stats')
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        seed_catalog(artists=5, listeners=5, songs=60, albums=8, playlists=5)
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+
+    def test_pages_do_not_scale_with_catalog(self):
+        song = Song.objects.filter(artists__isnull=False).first()
+        song.albums.add(Album.objects.first())
+        urls = ('/admin/api/song/', f'/admin/api/song/{song.id}/change/', '/admin/api/user/',
+                '/admin/api/album/', '/admin/api/playlist/')
+
+        def query_counts():
+            counts = []
+            for url in urls:
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                counts.append(len(queries))
+            return counts
+
+        query_counts()   # nạp cache ContentType trước khi đếm
+        before = query_counts()
+        seed_catalog(artists=20, listeners=20, songs=200, albums=30, playlists=20)
+        song.artists.add(*User.objects.filter(role_id=1)[:10])
+        self.assertEqual(query_counts(), before)
+
+        found = self.client.get('/admin/api/song/', {'q': song.title[:3].lower()})
+        self.assertContains(found, song.title)
+
+    def test_reassign_genre_and_merge(self):
+        genre = Genre.objects.create(name='Lo-fi')
+        ids = list(Song.objects.order_by('id').values_list('id', flat=True)[:10])
+        self.client.post('/admin/api/song/', {'action': 'reassign_genre', '_selected_action': ids, 'genre': genre.id,
+                                               'replace': 'on', 'apply': '1'})
+        links = Song.genre.through.objects.filter(song_id__in=ids)
+        self.assertEqual(set(links.values_list('genre_id', flat=True)), {genre.id})
+        self.assertEqual(links.count(), 10)
+
+        listener, other = User.objects.exclude(is_superuser=True)[:2]
+        SongLike.objects.bulk_create([SongLike(user=listener, song_id=ids[0]), SongLike(user=listener, song_id=ids[1]),
+                                      SongLike(user=other, song_id=ids[2])])
+        queue = PlayQueue.objects.create(user=other, source='radio', source_id=0)
+        item = PlayQueueItem.objects.create(queue=queue, song_id=ids[2], rank=1, base_rank=1)
+
+        plays = sum(Song.objects.filter(id__in=ids[:3]).values_list('play_count', flat=True))
+        self.client.post('/admin/api/song/', {'action': 'merge_duplicates', '_selected_action': ids[:3]})
+        self.assertEqual(list(Song.objects.filter(id__in=ids[:3]).values_list('play_count', flat=True)), [plays])
+        # Like và hàng đợi của user chuyển sang bài gốc thay vì bị xoá theo
+        self.assertEqual(sorted(SongLike.objects.filter(song_id=ids[0]).values_list('user_id', flat=True)),
+                         sorted([listener.id, other.id]))
+        item.refresh_from_db()
+        self.assertEqual(item.song_id, ids[0])
+
+    def test_reassign_genre_across_changelist(self):
+        genre = Genre.objects.create(name='Ballad')
+        first = Song.objects.order_by('id').first().id
+        data = {'action': 'reassign_genre', 'select_across': '1', '_selected_action': [first]}
+        self.assertContains(self.client.post('/admin/api/song/', data),
+                            '<input type="hidden" name="select_across" value="1">')
+
+        with mock.patch('api.admin.batched', side_effect=lambda items, size: batched(items, 7)):
+            self.client.post('/admin/api/song/', {**data, 'genre': genre.id, 'replace': 'on', 'apply': '1'})
+        self.assertEqual(Song.genre.through.objects.filter(genre=genre).count(), Song.objects.count())
+        self.assertFalse(Song.genre.through.objects.exclude(genre=genre).exists())
+
+    def test_estimated_count_for_unfiltered_changelists(self):
+        with mock.patch('api.admin.ESTIMATE_THRESHOLD', 10), mock.patch('api.admin.estimated_count', return_value=500):
+            self.assertEqual(EstimatedCountPaginator(Song.objects.order_by('id'), 10).count, 500)
+            self.assertEqual(EstimatedCountPaginator(Song.objects.filter(duration__gt=0).order_by('id'), 10).count,
+                             Song.objects.filter(duration__gt=0).count())
+        # SQLite không có số ước lượng: id bị xoá không làm trang cuối rỗng
+        Song.objects.filter(id__in=Song.objects.order_by('-id').values('id')[:5]).delete()
+        with mock.patch('api.admin.ESTIMATE_THRESHOLD', 10):
+            self.assertEqual(EstimatedCountPaginator(Song.objects.order_by('id'), 10).count, Song.objects.count())
+
+    def test_prefix_search_ignores_case(self):
+        Song.objects.create(title='Đường Về Nhà', duration=1)
+        Song.objects.create(title='MIXED case', duration=1)
+        self.assertContains(self.client.get('/admin/api/song/', {'q': 'mixed C'}), 'MIXED case')
+        self.assertContains(self.client.get('/admin/api/song/', {'q': 'Đường về'}), 'Đường Về Nhà')
+
+
+def fake_segment_file(path, workdir, bitrate):
+    # Thay ffmpeg: hai segment, segment đầu giống nhau ở mọi bitrate
+    for index, data in enumerate([b'intro', f'{bitrate}k {path[-8:]}'.encode()]):
+        with open(f'{workdir}/seg{index:05d}.ts', 'wb') as f:
+            f.write(data)
+    with open(f'{workdir}/index.m3u8', 'w') as f:
+        f.write('#EXTM3U\n#EXT-X-TARGETDURATION:6\n#EXTINF:6.0,\nseg00000.ts\n#EXTINF:2.0,\nseg00001.ts\n#EXT-X-ENDLIST\n')
+    return f'{workdir}/index.m3u8'
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), API_HLS={'BITRATES': (64, 128), 'BASE_URL': 'https://cdn.test/hls/'},
+                   API_JOBS={'EAGER': False})
+class HLSTests(TestCase):
+    def test_manifest_packaged_lazily_into_content_addressed_files(self):
+        song = Song.objects.create(title='tone', duration=2, url=wav_file('hls.wav', np.zeros(8000)))
+        pending = self.client.get(f'/api/songs/{song.id}/hls/')
+        self.assertEqual(pending.status_code, 202)
+        self.assertEqual(pending['Retry-After'], '2')
+        self.assertEqual(pending.json()['url'], song.url.url)
+        self.client.get(f'/api/songs/{song.id}/hls/')
+        self.assertEqual(Job.objects.filter(task='package_hls').count(), 1)
+
+        with mock.patch.object(hls, 'segment_file', side_effect=fake_segment_file) as segment:
+            run_worker(threads=1, once=True)
+            self.assertEqual(segment.call_count, 2)
+
+        response = self.client.get(f'/api/songs/{song.id}/hls/')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        variants = [line for line in response.content.decode().splitlines() if line.startswith('https://')]
+        self.assertIn('BANDWIDTH=64000', response.content.decode())
+        self.assertEqual(len(variants), 2)
+
+        segments = []
+        for url in variants:
+            with open(f"{hls._root()}/{url.removeprefix('https://cdn.test/hls/')}") as f:
+                segments.append([line for line in f.read().splitlines() if line.startswith('https://')])
+        # Segment cùng nội dung chỉ lưu một lần
+        self.assertEqual(segments[0][0], segments[1][0])
+        self.assertNotEqual(segments[0][1], segments[1][1])
+
+        cached = self.client.get(f'/api/songs/{song.id}/hls/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        # File gốc đổi: đóng gói lại, segment của file cũ bị dọn sau GC_GRACE
+        old_segment = f"{hls._root()}/{segments[0][1].removeprefix('https://cdn.test/hls/')}"
+        song.url = wav_file('hls2.wav', np.ones(8000) * 0.1)
+        song.save()
+        self.assertEqual(self.client.get(f'/api/songs/{song.id}/hls/').status_code, 202)
+        with mock.patch.object(hls, 'segment_file', side_effect=fake_segment_file):
+            run_worker(threads=1, once=True)
+        master = self.client.get(f'/api/songs/{song.id}/hls/').content.decode()
+
+        self.assertEqual(hls.collect_garbage(), 0)
+        self.assertGreater(hls.collect_garbage(now=time.time() + 2 * 24 * 60 * 60), 0)
+        self.assertFalse(os.path.exists(old_segment))
+        for name in hls._referenced([hls._master_path(song.id, hls.source_key(song))]):
+            self.assertTrue(os.path.exists(f'{hls._root()}/{name}'))
+        self.assertEqual(self.client.get(f'/api/songs/{song.id}/hls/').content.decode(), master)
+
+    def test_ffmpeg_failure_reported(self):
+        song = Song.objects.create(title='broken', duration=2, url=wav_file('broken.wav', np.zeros(800)))
+        self.client.get(f'/api/songs/{song.id}/hls/')
+        with mock.patch.object(hls, 'segment_file', side_effect=AudioDecodeError('Invalid data found')):
+            run_worker(threads=1, once=True)
+
+        self.assertEqual(Job.objects.get(task='package_hls').status, Job.SUCCEEDED)
+        response = self.client.get(f'/api/songs/{song.id}/hls/')
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('Invalid data found', response.json()['error'])
+        self.assertEqual(Job.objects.filter(task='package_hls').count(), 1)
+
+    @override_settings(API_JOBS={'EAGER': True})
+    def test_eager_packaging_answers_with_manifest(self):
+        song = Song.objects.create(title='tone', duration=2, url=wav_file('eager.wav', np.zeros(8000)))
+        # Ngoài TestCase request chạy autocommit: on_commit gọi ngay trong enqueue
+        with mock.patch.object(hls, 'segment_file', side_effect=fake_segment_file), \
+                mock.patch('api.jobs.transaction.on_commit', side_effect=lambda function: function()):
+            response = self.client.get(f'/api/songs/{song.id}/hls/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), API_DOWNLOADS={'MAX_PER_USER': 2, 'CHUNK_SIZE': 1000})
+class DownloadTests(TestCase):
+    def setUp(self):
+        Role.objects.create(id=1, name='artist')
+        self.user = User.objects.create_user('listener', password='x', role_id=1)
+        self.client.force_login(self.user)
+        self.playlist = Playlist.objects.create(name='Road/Trip', user=self.user)
+        for index in range(3):
+            samples = np.sin(np.arange(4000 * (index + 1)) * (index + 1) / 10)
+            song = Song.objects.create(title=f'Song {index}?', duration=1, url=wav_file(f'd{index}.wav', samples))
+            self.playlist.songs.add(song)
+        self.playlist.songs.add(Song.objects.create(title='no file', duration=1))
+        self.url = f'/api/playlists/{self.playlist.id}/download/'
+
+    def test_zip_is_valid_and_resumable(self):
+        response = self.client.get(self.url)
+        body = b''.join(response.streaming_content)
+        response.close()
+        self.assertEqual(len(body), int(response['Content-Length']))
+
+        archive = zipfile.ZipFile(io.BytesIO(body))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ['manifest.json', '01 - Song 0_.wav', '02 - Song 1_.wav', '03 - Song 2_.wav'])
+        self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist()))
+        manifest = json.loads(archive.read('manifest.json'))
+        self.assertEqual([track['title'] for track in manifest['tracks']], ['Song 0?', 'Song 1?', 'Song 2?'])
+        self.assertEqual(len(manifest['missing']), 1)
+
+        # Cùng bố cục mỗi lần: nối tiếp từ byte bất kỳ
+        resumed = self.client.get(self.url, HTTP_RANGE='bytes=5000-', HTTP_IF_RANGE=response['ETag'])
+        self.assertEqual(resumed.status_code, 206)
+        self.assertEqual(resumed['Content-Range'], f'bytes 5000-{len(body) - 1}/{len(body)}')
+        self.assertEqual(b''.join(resumed.streaming_content), body[5000:])
+        resumed.close()
+
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=5000-', HTTP_IF_RANGE='"old"')
+        self.assertEqual(stale.status_code, 200)
+        stale.close()
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE=f'bytes={len(body)}-').status_code, 416)
+
+    def test_concurrent_downloads_per_user(self):
+        first, second = self.client.get(self.url), self.client.get(self.url)
+        blocked = self.client.get(self.url)
+        self.assertEqual(blocked.status_code, 429)
+        self.assertIn('Retry-After', blocked)
+
+        first.close()
+        third = self.client.get(self.url)
+        self.assertEqual(third.status_code, 200)
+        second.close()
+        third.close()
+
+    def test_batched_download_releases_slot(self):
+        for _ in range(3):
+            response = self.client.post('/api/batch/', {'requests': [self.url]}, content_type='application/json')
+            self.assertEqual(response.json()['responses'][0]['status'], 200)
+        self.assertEqual(download_slots.active, {})
+
+    def test_album_download(self):
+        album = Album.objects.create(title='LP', creator=self.user)
+        album.songs.add(*self.playlist.songs.all())
+        response = self.client.get(f'/api/albums/{album.id}/download/')
+        self.assertIn('LP.zip', response['Content-Disposition'])
+        self.assertEqual(len(zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))).namelist()), 4)
+        response.close()
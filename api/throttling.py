@@ -0,0 +1,158 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import route_name
+
+DEFAULTS = {
+    'ENABLED': True,
+    # tên bucket -> (token nạp lại mỗi giây, dung lượng tối đa) cho mỗi user / IP
+    'BUCKETS': {
+        'default': (20.0, 200),
+    },
+    # route như trong /metrics (tên URL, hoặc đường dẫn view nếu không đặt tên) -> (bucket, cost); route không có ở đây: ('default', 1)
+    'ROUTES': {},
+    # query param -> (bucket, cost), tính thêm khi request có param đó (vd. ?search=)
+    'QUERY_PARAMS': {},
+    'SHARED': False,     # True: trạng thái bucket nằm trong Django cache (nhiều process, gần đúng)
+    'MAX_KEYS': 100000,
+    'SHARDS': 16,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_THROTTLE', {}).get(name, DEFAULTS[name])
+
+
+# ======= TOKEN BUCKETS =======
+
+class _Shard:
+    __slots__ = ('lock', 'buckets')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()     # key -> [tokens, updated], dùng lâu nhất ở đầu
+
+
+def _refill(tokens, updated, now, rate, capacity):
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class BucketStore:
+    """Các bucket chia theo shard (mỗi shard một lock) để request song song ít khi chờ nhau.
+
+    consume() trừ token của nhiều bucket một lúc: hoặc đủ cho tất cả, hoặc không trừ gì.
+    """
+
+    def __init__(self):
+        self.shards = [_Shard() for _ in range(get_setting('SHARDS'))]
+
+    def _shard(self, key):
+        return self.shards[zlib.crc32(key.encode()) % len(self.shards)]
+
+    def consume(self, charges, now=None):
+        """charges: [(key, rate, capacity, cost)] -> 0.0 nếu được phép, ngược lại số giây phải chờ."""
+        if get_setting('SHARED'):
+            # Nhiều process: cần đồng hồ chung, monotonic của mỗi process khác nhau
+            return self._consume_shared(charges, time.time() if now is None else now)
+        now = time.monotonic() if now is None else now
+
+        shards = sorted({id(shard): shard for shard in (self._shard(key) for key, *_ in charges)}.items())
+        for _, shard in shards:
+            shard.lock.acquire()
+        try:
+            wait, states = 0.0, []
+            for key, rate, capacity, cost in charges:
+                bucket = self._shard(key).buckets.get(key)
+                tokens = capacity if bucket is None else _refill(bucket[0], bucket[1], now, rate, capacity)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+                states.append((key, tokens - cost))
+            if wait:
+                return wait
+            for key, tokens in states:
+                buckets = self._shard(key).buckets
+                buckets[key] = [tokens, now]
+                buckets.move_to_end(key)
+            # Quá giới hạn (nhiều IP khác nhau): bỏ bucket lâu không dùng nhất, O(1) mỗi key bị bỏ.
+            # Bucket đó thường đã nạp đầy lại, tức là tương đương chưa từng tồn tại.
+            limit = get_setting('MAX_KEYS') // len(self.shards)
+            for _, shard in shards:
+                while len(shard.buckets) > limit:
+                    shard.buckets.popitem(last=False)
+        finally:
+            for _, shard in shards:
+                shard.lock.release()
+        return 0.0
+
+    def _consume_shared(self, charges, now):
+        # get_many + set_many không nguyên tử: vài request song song có thể cùng lọt, chấp nhận được cho throttle
+        keys = {f'throttle:{key}': (key, rate, capacity, cost) for key, rate, capacity, cost in charges}
+        found = cache.get_many(list(keys))
+        wait, updates = 0.0, {}
+        for cache_key, (key, rate, capacity, cost) in keys.items():
+            tokens, updated = found.get(cache_key, (capacity, now))
+            tokens = _refill(tokens, updated, now, rate, capacity)
+            if tokens < cost:
+                wait = max(wait, (cost - tokens) / rate)
+            # Hết hạn khi bucket đã nạp đầy trở lại: không cần giữ
+            updates[cache_key] = ((tokens - cost, now), int((capacity - tokens + cost) / rate) + 1)
+        if wait:
+            return wait
+        for cache_key, (value, timeout) in updates.items():
+            cache.set(cache_key, value, timeout)
+        return 0.0
+
+    def clear(self):
+        for shard in self.shards:
+            with shard.lock:
+                shard.buckets.clear()
+
+
+store = BucketStore()
+
+
+# ======= DRF THROTTLE =======
+
+def charges_for(request, ident):
+    """Các bucket (và cost) mà request này phải trả, theo route và query param."""
+    buckets = get_setting('BUCKETS')
+    route = route_name(request._request if hasattr(request, '_request') else request)
+    costs = [get_setting('ROUTES').get(route, ('default', 1))]
+    for param, cost in get_setting('QUERY_PARAMS').items():
+        if request.GET.get(param):
+            costs.append(cost)
+
+    charges = {}
+    for bucket, cost in costs:
+        if cost <= 0:
+            continue
+        rate, capacity = buckets[bucket]
+        key = f'{bucket}:{ident}'
+        previous = charges.get(key)
+        charges[key] = (key, rate, capacity, cost + (previous[3] if previous else 0))
+    return list(charges.values())
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle mặc định cho mọi APIView: kiểm tra trong bộ nhớ, không chạm DB."""
+
+    def get_ident_key(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user-{user.pk}'
+        return f'ip-{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        if not get_setting('ENABLED'):
+            return True
+        self.wait_time = store.consume(charges_for(request, self.get_ident_key(request)))
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from .realtime import events_view
 from .serializers import ArtistSerializer
 from .views import *
 
@@ -17,7 +18,14 @@ router.register(r'artists', ArtistViewSet, basename='artist')
 urlpatterns = [
     path('', include(router.urls)),
     path('landing-page/', LandingPageAPIView.as_view()),
+    path('sync/', SyncView.as_view()),
+    path('batch/', BatchView.as_view()),
+    path('events/', events_view),
     path('auth/register/', RegisterView.as_view()),
     path('auth/login/', LoginView.as_view()),
     path('auth/me/', MeView.as_view()),
+    path('auth/me/library/', MeLibraryView.as_view()),
+    path('me/likes/<str:kind>/', MeLikesView.as_view()),
+    path('me/queue/', MeQueueView.as_view()),
+    path('me/queue/<str:action>/', MeQueueActionView.as_view()),
 ]
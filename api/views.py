@@ -1,63 +1,262 @@
+import base64
+import hashlib
 import random
+from datetime import timedelta
 from rest_framework import viewsets, generics, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.fields import BooleanField
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
+from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import Prefetch
-
-from .models import Role, User, Genre, Song, Album, Playlist
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+
+from .batch import BatchError, parse_requests, execute_batch
+from .fast_serializers import iter_serialized_songs, serialize_songs_mini
+from .fragments import fragments
+from . import archives, hls, jobs, library
+from .metrics import can_scrape, registry
+from .play_queue import QueueError, queue_state, start_queue, set_shuffle, insert_next, move, remove, skip
+from .streaming import StreamingListMixin, STREAM_FORMATS, batched, streaming_response
+from .sync import changes_since, MAX_LIMIT
+
+from .models import ARTIST_ROLE_ID, Role, User, Genre, Song, Album, Playlist, SimilarSongs, HomeFeed, Waveform, PlayQueue, ArtistStats
 from .serializers import (
     RoleSerializer, UserSerializer, GenreSerializer,
     SongSerializer, AlbumSerializer, PlaylistSerializer,
-    RegisterSerializer, LoginSerializer, UserPublicSerializer, ArtistSerializer
+    RegisterSerializer, LoginSerializer, UserPublicSerializer, ArtistSerializer,
+    PlaylistMiniSerializer
 )
 
 
 # ======= VIEWSETS =======
 
-class RoleViewSet(viewsets.ModelViewSet):
+class MultiGetMixin:
+    """?ids=1,2,3 trên list endpoint: lấy nhiều object trong một request thay vì gọi detail từng cái."""
+
+    max_ids = 100
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ids = self.request.query_params.get('ids')
+        if ids is None or self.action != 'list':
+            return queryset
+        try:
+            pks = {int(pk) for pk in ids.split(',') if pk.strip()}
+        except ValueError:
+            raise ValidationError({'ids': 'must be a comma-separated list of integers'})
+        if len(pks) > self.max_ids:
+            raise ValidationError({'ids': f'at most {self.max_ids} ids'})
+        return queryset.filter(pk__in=pks)
+
+
+def int_pk(pk):
+    """pk trong URL cho action đọc bảng phụ trước get_object(): không phải số nguyên thì 404 thay vì lỗi DB."""
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        raise NotFound()
+
+
+def library_toggle(request, kind, pk):
+    """POST: like / follow, DELETE: bỏ like / unfollow."""
+    if not request.user.is_authenticated:
+        return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+    pk = int_pk(pk)
+    if request.method == 'DELETE':
+        library.remove(request.user, kind, pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    try:
+        created = library.add(request.user, kind, pk)
+    except ObjectDoesNotExist:
+        return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'message': 'Added to library'}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class RoleViewSet(MultiGetMixin, viewsets.ModelViewSet):
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
 
 
-class ArtistViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.filter(role__id=1)
+class ArtistViewSet(MultiGetMixin, viewsets.ModelViewSet):
+    queryset = User.objects.filter(role__id=ARTIST_ROLE_ID)
     serializer_class = ArtistSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['username', 'fullname']
 
-class UserViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post', 'delete'], url_path='follow')
+    def follow(self, request, pk=None):
+        return library_toggle(request, 'artists', pk)
+
+    @action(detail=True, methods=['get'], url_path='stats')
+    def stats(self, request, pk=None):
+        stats = ArtistStats.objects.filter(artist_id=int_pk(pk), artist__role_id=ARTIST_ROLE_ID).first()
+        if stats is None:
+            self.get_object()
+            return Response({'error': 'Stats not computed yet'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 365)
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        since = timezone.localdate() - timedelta(days=days - 1)
+        daily = stats.artist.daily_plays.filter(date__gte=since).order_by('date').values_list('date', 'plays')
+        songs = {song['id']: song for song in library.mark_liked(
+            serialize_songs_mini(Song.objects.filter(id__in=stats.top_songs)), request.user)}
+        return Response({
+            'artist_id': stats.artist_id,
+            'total_plays': stats.total_plays,
+            'song_count': stats.song_count,
+            'album_count': stats.album_count,
+            'follower_count': stats.follower_count,
+            'top_songs': [songs[song_id] for song_id in stats.top_songs if song_id in songs],
+            'daily_plays': [{'date': date, 'plays': plays} for date, plays in daily],
+            'computed_at': stats.computedAt,
+        }, status=status.HTTP_200_OK)
+
+class UserViewSet(MultiGetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['username', 'fullname']
 
 
-class GenreViewSet(viewsets.ModelViewSet):
+class GenreViewSet(MultiGetMixin, viewsets.ModelViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
 
 
-class SongViewSet(viewsets.ModelViewSet):
+class SongViewSet(MultiGetMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Song.objects.all()
     serializer_class = SongSerializer
     filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'albums__title', 'artists__fullname', 'genre__name'], 
+    search_fields = ['title', 'albums__title', 'artists__fullname', 'genre__name']
     ordering_fields = ['title']
+    stream_chunk_size = 1000
+
+    def stream_chunks(self, queryset):
+        for chunk in iter_serialized_songs(queryset, self.stream_chunk_size):
+            yield library.mark_liked(chunk, self.request.user)
+
+    def perform_create(self, serializer):
+        self.enqueue_analysis(serializer.save())
+
+    def perform_update(self, serializer):
+        song = serializer.save()
+        if 'url' in serializer.validated_data:
+            self.enqueue_analysis(song)
+
+    def enqueue_analysis(self, song):
+        # Decode + phân tích file chạy ở worker (manage.py run_worker), upload trả về ngay
+        jobs.enqueue('analyze_song', key=f'analyze_song:{song.pk}', song_id=song.pk)
     
     @action(detail=True, methods=['post'], url_path='increase-play')
     def increase_play(self, request, pk=None):
         song = self.get_object()
         song.play_count += 1
-        song.save()
+        song.save(update_fields=['play_count'])
         return Response({'message': 'Play count increased'}, status=status.HTTP_200_OK)
 
-
-class AlbumViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], url_path='similar')
+    def similar(self, request, pk=None):
+        neighbours = SimilarSongs.objects.filter(song_id=int_pk(pk)).values_list('song_ids', flat=True).first()
+        if neighbours is None:
+            # Chưa được tính (bài mới hoặc chưa chạy build_similar_songs)
+            self.get_object()
+            return Response([], status=status.HTTP_200_OK)
+
+        songs = serialize_songs_mini(Song.objects.filter(id__in=neighbours))
+        songs = {song['id']: song for song in library.mark_liked(songs, request.user)}
+        return Response([songs[song_id] for song_id in neighbours if song_id in songs], status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post', 'delete'], url_path='like')
+    def like(self, request, pk=None):
+        return library_toggle(request, 'songs', pk)
+
+    @action(detail=True, methods=['get'], url_path='waveform')
+    def waveform(self, request, pk=None):
+        row = Waveform.objects.filter(song_id=int_pk(pk)).values_list('peaks', 'points').first()
+        if row is None:
+            self.get_object()
+            return Response({'error': 'Waveform not computed yet'}, status=status.HTTP_404_NOT_FOUND)
+
+        peaks, points = bytes(row[0]), row[1]
+        etag = f'"{hashlib.md5(peaks).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif request.query_params.get('encoding') == 'base64':
+            response = Response({'points': points, 'peaks': base64.b64encode(peaks).decode()}, status=status.HTTP_200_OK)
+        else:
+            # Mặc định: int8 thô [min0, max0, min1, max1, ...]
+            response = HttpResponse(peaks, content_type='application/octet-stream')
+            response['X-Waveform-Points'] = points
+        response['ETag'] = etag
+        # URL cố định nhưng peaks tính lại khi đổi file: cache ngắn, sau đó revalidate bằng ETag (304)
+        response['Cache-Control'] = 'public, max-age=300'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='hls')
+    def hls_manifest(self, request, pk=None):
+        song = self.get_object()
+        if not song.url:
+            return Response({'error': 'Song has no audio file'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            master = hls.cached_master(song)
+            error = hls.packaging_error(song) if master is None else None
+            if master is None and error is None:
+                # Đóng gói lần đầu ở worker; API_JOBS EAGER thì job đã chạy xong trong enqueue: trả luôn kết quả
+                jobs.enqueue('package_hls', key=f'package_hls:{song.pk}', song_id=song.pk)
+                master = hls.cached_master(song)
+                error = hls.packaging_error(song) if master is None else None
+        except FileNotFoundError:
+            return Response({'error': 'Audio file missing'}, status=status.HTTP_404_NOT_FOUND)
+
+        if error is not None:
+            # ffmpeg không đọc được file: không xếp job nữa cho tới khi file đổi hoặc hết FAILURE_TTL
+            return Response({'error': f'HLS packaging failed: {error}', 'url': song.url.url},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if master is None:
+            # Trong lúc chờ worker, client phát thẳng file gốc
+            response = Response({'status': 'packaging', 'url': song.url.url}, status=status.HTTP_202_ACCEPTED)
+            response['Retry-After'] = hls.get_setting('RETRY_AFTER')
+            return response
+
+        etag = f'"{hls.source_key(song)}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(master, content_type='application/vnd.apple.mpegurl')
+        response['ETag'] = etag
+        # Master đổi khi file gốc đổi; variant playlist và segment có URL theo nội dung nên cache vĩnh viễn được
+        response['Cache-Control'] = 'public, max-age=300'
+        return response
+
+
+def songs_with_artists(lookup):
+    return Prefetch(lookup, queryset=Song.objects.prefetch_related('artists'))
+
+
+def owner_playlists(owner):
+    # Owner được serialize bằng UserPublicSerializer, kèm mọi playlist (và bài hát) của họ
+    return Prefetch(f'{owner}__playlist_set', queryset=Playlist.objects.prefetch_related(songs_with_artists('songs')))
+
+
+class AlbumViewSet(MultiGetMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Album.objects.all()
     serializer_class = AlbumSerializer
+
+    def get_stream_queryset(self, queryset):
+        return queryset.select_related('creator__role').prefetch_related(
+            songs_with_artists('songs'), owner_playlists('creator'),
+        )
+
+    @action(detail=True, methods=['post', 'delete'], url_path='like')
+    def like(self, request, pk=None):
+        return library_toggle(request, 'albums', pk)
     
     @action(detail=True, methods=['post'], url_path='add-song')
     def add_song(self, request, pk=None):
@@ -94,10 +293,21 @@ class AlbumViewSet(viewsets.ModelViewSet):
         album.songs.remove(song)
         return Response({'message': 'Song removed successfully'}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        album = self.get_object()
+        song_ids = list(Song.albums.through.objects.filter(album=album).order_by('id').values_list('song_id', flat=True))
+        return archives.download_response(request, 'album', album, album.title, song_ids)
+
 
-class PlaylistViewSet(viewsets.ModelViewSet):
+class PlaylistViewSet(MultiGetMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Playlist.objects.all()
     serializer_class = PlaylistSerializer
+
+    def get_stream_queryset(self, queryset):
+        return queryset.select_related('user__role').prefetch_related(
+            songs_with_artists('songs'), owner_playlists('user'),
+        )
     
     @action(detail=True, methods=['post'], url_path='add-song')
     def add_song(self, request, pk=None):
@@ -134,6 +344,12 @@ class PlaylistViewSet(viewsets.ModelViewSet):
         playlist.songs.remove(song)
         return Response({'message': 'Song removed successfully'}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        playlist = self.get_object()
+        song_ids = list(Playlist.songs.through.objects.filter(playlist=playlist).order_by('id').values_list('song_id', flat=True))
+        return archives.download_response(request, 'playlist', playlist, playlist.name, song_ids)
+
 
 # ======= AUTH & REGISTER =======
 
@@ -156,12 +372,182 @@ class MeView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        return Response(UserPublicSerializer(request.user).data)
+        return Response(UserPublicSerializer(request.user, context={'request': request}).data)
+
+
+class MeLibraryView(APIView):
+    """Toàn bộ playlist của user hiện tại, stream dạng NDJSON (mặc định) hoặc JSON array."""
+    permission_classes = [IsAuthenticated]
+    chunk_size = 100
+
+    def get(self, request):
+        fmt = request.query_params.get('stream', 'ndjson')
+        if fmt not in STREAM_FORMATS:
+            return Response({'error': f'stream must be one of {", ".join(STREAM_FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        playlists = Playlist.objects.filter(user=request.user).order_by('id')
+        chunks = (
+            PlaylistMiniSerializer(chunk, many=True, context={'request': request}).data
+            for chunk in batched(playlists.iterator(chunk_size=self.chunk_size), self.chunk_size)
+        )
+        return streaming_response(chunks, fmt)
+
+class MeLikesView(APIView):
+    """Bài hát / album đã like, artist đã follow của user hiện tại, mới nhất trước."""
+    permission_classes = [IsAuthenticated]
+    serializers = {'songs': SongSerializer, 'albums': AlbumSerializer, 'artists': UserPublicSerializer}
+
+    def get(self, request, kind):
+        if kind not in library.LIBRARY:
+            return Response({'error': f'kind must be one of {", ".join(library.LIBRARY)}'},
+                            status=status.HTTP_404_NOT_FOUND)
+        model, field, queryset = library.LIBRARY[kind]
+        ids = list(model.objects.filter(user=request.user).order_by('-createAt').values_list(f'{field}_id', flat=True))
+        objects = {obj.pk: obj for obj in queryset.filter(pk__in=ids)}
+        data = self.serializers[kind]([objects[pk] for pk in ids if pk in objects], many=True,
+                                      context={'request': request}).data
+        return Response(data, status=status.HTTP_200_OK)
+
+
+# ======= PLAY QUEUE =======
+
+def _int_param(data, name, default=None):
+    value = data.get(name, default)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise QueueError(f'{name} must be an integer')
+
+
+def _bool_param(data, name, default):
+    # Như BooleanField của DRF: 'false' / '0' / 'off' trong form là False
+    try:
+        return BooleanField().to_internal_value(data.get(name, default))
+    except ValidationError:
+        raise QueueError(f'{name} must be a boolean')
+
+
+def _queue_response(request, queue, status_code=status.HTTP_200_OK):
+    try:
+        ahead = _int_param(request.query_params, 'ahead', 5)
+    except QueueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(queue_state(queue, ahead, request.user), status=status_code)
+
+
+class MeQueueView(APIView):
+    """GET: bài đang phát + vài bài kế tiếp; POST: dựng hàng đợi từ playlist / album / artist / radio."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        queue = PlayQueue.objects.select_related('current').filter(user=request.user).first()
+        if queue is None:
+            return Response({'error': 'Queue is empty'}, status=status.HTTP_404_NOT_FOUND)
+        return _queue_response(request, queue)
+
+    def post(self, request):
+        try:
+            queue = start_queue(
+                request.user,
+                request.data.get('source'),
+                _int_param(request.data, 'id'),
+                shuffle=_bool_param(request.data, 'shuffle', False),
+                start_song_id=_int_param(request.data, 'start_song_id'),
+                seed=_int_param(request.data, 'seed'),
+            )
+        except QueueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except ObjectDoesNotExist:
+            return Response({'error': 'Source not found'}, status=status.HTTP_404_NOT_FOUND)
+        return _queue_response(request, queue, status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        PlayQueue.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MeQueueActionView(APIView):
+    """POST /api/me/queue/<next|previous|shuffle|insert|move|remove>/ — mỗi thao tác chỉ chạm vài dòng."""
+    permission_classes = [IsAuthenticated]
+    actions = ('next', 'previous', 'shuffle', 'insert', 'move', 'remove')
+
+    def post(self, request, action):
+        if action not in self.actions:
+            return Response({'error': f'action must be one of {", ".join(self.actions)}'},
+                            status=status.HTTP_404_NOT_FOUND)
+        queue = PlayQueue.objects.select_related('current').filter(user=request.user).first()
+        if queue is None:
+            return Response({'error': 'Queue is empty'}, status=status.HTTP_404_NOT_FOUND)
+
+        data = request.data
+        try:
+            if action in ('next', 'previous'):
+                if not skip(queue, 1 if action == 'next' else -1):
+                    return Response({'error': f'No {action} song'}, status=status.HTTP_409_CONFLICT)
+            elif action == 'shuffle':
+                set_shuffle(queue, _bool_param(data, 'shuffle', True), seed=_int_param(data, 'seed'))
+            elif action == 'insert':
+                insert_next(queue, _int_param(data, 'song_id'))
+            elif action == 'move':
+                move(queue, _int_param(data, 'item_id'), _int_param(data, 'after_item_id'))
+            else:
+                remove(queue, _int_param(data, 'item_id'))
+        except QueueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except ObjectDoesNotExist:
+            return Response({'error': 'Song or queue item not found'}, status=status.HTTP_404_NOT_FOUND)
+        return _queue_response(request, queue)
+
+
+# ======= BATCH =======
+
+class BatchView(APIView):
+    """Nhiều GET trong một round trip: auth một lần, chạy in-process, trả kết quả theo đúng thứ tự."""
+
+    def post(self, request):
+        try:
+            items = parse_requests(request.data)
+        except BatchError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'responses': execute_batch(request, items)}, status=status.HTTP_200_OK)
+
+
+# ======= DELTA SYNC =======
+
+class SyncView(APIView):
+    """Những gì đã đổi sau ?since=<cursor>; client lưu lại cursor trả về cho lần sau."""
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(int(request.query_params.get('limit', 500)), MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0 or limit < 1:
+            return Response({'error': 'since must be >= 0 and limit >= 1'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Đăng nhập: chỉ thay đổi trong thư viện của user, delta không lớn theo hoạt động của cả catalog
+        user = request.user if request.user.is_authenticated else None
+        return Response(changes_since(since, limit, user), status=status.HTTP_200_OK)
 
 # ======= GET LANGING PLAYLIST =======
 
 class LandingPageAPIView(APIView):
     def get(self, request):
+        # Feed cá nhân đã tính sẵn: một lần đọc theo khoá chính, không chấm điểm trong request
+        if request.user.is_authenticated:
+            payload = HomeFeed.objects.filter(user_id=request.user.pk).values_list('payload', flat=True).first()
+            if payload is not None:
+                library.mark_liked(payload['recommended_songs'] + payload['top_trending_songs'], request.user)
+                for section in payload['playlists_by_genre']:
+                    library.mark_liked(section['songs'], request.user)
+                # Giữ đủ key của trang chung: client cũ đọc random_albums
+                payload['random_albums'] = payload['recommended_albums']
+                return Response(payload, status=status.HTTP_200_OK)
+
         genres = Genre.objects.prefetch_related('song_set')
 
         playlists_by_genre = []
@@ -169,7 +555,7 @@ class LandingPageAPIView(APIView):
             songs = genre.song_set.all()[:10]  # Slice an toàn sau khi prefetch
             playlists_by_genre.append({
                 "genre": genre.name,
-                "songs": SongSerializer(songs, many=True).data
+                "songs": SongSerializer(songs, many=True, context={'request': request}).data
             })
 
         top_trending_songs = Song.objects.order_by('-play_count')[:10]
@@ -180,6 +566,14 @@ class LandingPageAPIView(APIView):
 
         return Response({
             "playlists_by_genre": playlists_by_genre,
-            "top_trending_songs": SongSerializer(top_trending_songs, many=True).data,
-            "random_albums": AlbumSerializer(random_albums, many=True).data
+            "top_trending_songs": SongSerializer(top_trending_songs, many=True, context={'request': request}).data,
+            "random_albums": AlbumSerializer(random_albums, many=True, context={'request': request}).data
         }, status=status.HTTP_200_OK)
+
+
+# ======= METRICS (Prometheus) =======
+
+def metrics_view(request):
+    if not can_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render() + fragments.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
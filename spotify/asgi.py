@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "spotify.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.realtime import websocket_app  # noqa: E402  (cần app registry đã sẵn sàng)
+
+
+async def application(scope, receive, send):
+    # HTTP (kể cả SSE /api/events/) đi qua Django; WebSocket /api/ws/ do api.realtime xử lý
+    if scope["type"] == "websocket":
+        if scope["path"].rstrip("/") == "/api/ws":
+            return await websocket_app(scope, receive, send)
+        await send({"type": "websocket.close"})
+        return
+    await django_application(scope, receive, send)
@@ -48,11 +48,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware",
+    "api.profiling.SlowRequestMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.profiling.ProfilerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -86,6 +89,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Lịch sử migration không dựng lại được DB trống (User được tạo sau admin/auth),
+        # nên DB test tạo bảng thẳng từ models
+        "TEST": {"MIGRATE": False},
     }
 }
 
@@ -93,6 +99,22 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
+# Hasher đầu tiên dùng cho hash mới; các hasher sau chỉ để kiểm tra hash cũ (login sẽ băm lại)
+PASSWORD_HASHERS = [
+    "api.passwords.TunedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+# 🔐 Hash mật khẩu chạy trong process pool riêng, request login / register không giữ worker thread
+API_PASSWORDS = {
+    'WORKERS': int(os.environ.get('API_PASSWORD_WORKERS', min(4, os.cpu_count() or 1))),
+    'MAX_PENDING': 32,
+    'ITERATIONS': int(os.environ.get('PASSWORD_ITERATIONS', 600000)),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -113,6 +135,91 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['rest_framework.filters.SearchFilter'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.TokenBucketThrottle'],
+}
+
+# 🚦 Token bucket theo user (hoặc IP khi chưa đăng nhập): (token nạp lại mỗi giây, dung lượng)
+API_THROTTLE = {
+    'BUCKETS': {
+        'default': (20.0, 200),
+        'play': (0.2, 20),          # increase-play: đủ cho nghe bình thường, không đủ để bơm lượt nghe
+        'search': (2.0, 30),        # ?search= là icontains trên nhiều bảng
+        'auth': (0.1, 10),          # hash mật khẩu tốn CPU
+    },
+    'ROUTES': {
+        'song-increase-play': ('play', 1),
+        'api.views.LoginView': ('auth', 1),
+        'api.views.RegisterView': ('auth', 2),
+        'api.views.BatchView': ('default', 5),
+    },
+    'QUERY_PARAMS': {
+        'search': ('search', 1),
+    },
+    'SHARED': os.environ.get('API_THROTTLE_SHARED') == '1',
+}
+
+# 📊 Đo latency / số query / thời gian serialize, xem tại /metrics
+API_METRICS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': float(os.environ.get('API_METRICS_SAMPLE_RATE', '1.0')),
+    'SERVER_TIMING': True,
+    # /metrics cần "Authorization: Bearer $API_METRICS_TOKEN" (hoặc staff đăng nhập admin)
+    'TOKEN': os.environ.get('API_METRICS_TOKEN') or None,
+}
+
+# 🐢 Staff thêm ?profile=1 (hoặc header X-Profile) để nhận cProfile + danh sách SQL
+API_PROFILING = {
+    'SLOW_REQUEST_THRESHOLD': 0.5,
+    'SLOW_LOG_SIZE': 50,
+}
+
+API_BATCH = {
+    'MAX_REQUESTS': 20,
+    # Chạy song song chỉ nên bật dưới ASGI / server nhiều thread và DB không phải SQLite
+    'WORKERS': int(os.environ.get('API_BATCH_WORKERS', 1)),
+}
+
+API_REALTIME = {
+    'COALESCE_INTERVAL': 1.0,
+    'KEEPALIVE': 15.0,
+}
+
+# Cache dict artist / album / genre lồng trong bài hát; SHARED=True khi chạy nhiều process
+API_FRAGMENTS = {
+    'MAX_ENTRIES': 20000,
+    'SHARED': False,
+}
+
+API_AUDIO = {
+    'FFMPEG': os.environ.get('FFMPEG_BINARY', 'ffmpeg'),
+    'WAVEFORM_POINTS': 1000,
+}
+
+# Segment / playlist HLS nằm trong MEDIA_ROOT/hls, tên theo sha256 nội dung: đặt Cache-Control immutable cho thư mục này ở nginx / CDN
+API_HLS = {
+    'SEGMENT_SECONDS': 6,
+    'BITRATES': (64, 128, 256),
+    'BASE_URL': os.environ.get('HLS_BASE_URL'),
+}
+
+# Job chạy ở process `manage.py run_worker` (service worker trong compose.yml), request chỉ xếp hàng.
+# API_JOBS_EAGER=1 chạy job ngay trong request: chỉ dùng cho test / thử nhanh không có worker.
+API_JOBS = {
+    'EAGER': os.environ.get('API_JOBS_EAGER') == '1',
+}
+
+# Tập id đã like của user; SHARED=True (cache 1 giờ) chỉ khi CACHES là Redis / Memcached dùng chung
+API_LIBRARY = {
+    'SHARED': os.environ.get('API_LIBRARY_SHARED') == '1',
+}
+
+# ZIP playlist / album để nghe offline
+API_DOWNLOADS = {
+    'MAX_PER_USER': 2,
 }
 
 
@@ -3,9 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from api.admin import jobs_dashboard_view, slow_requests_view
+from api.views import metrics_view
+
 urlpatterns = [
+    path('admin/slow-requests/', slow_requests_view, name='slow-requests'),
+    path('admin/jobs/', jobs_dashboard_view, name='jobs-dashboard'),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view),
 ]
 
 if settings.DEBUG: